@@ -2,15 +2,23 @@
 SmishGuard - SMS Phishing Detection System
 Main Flask Application (Clean & Simple)
 """
+import json
+import logging
+import os
 import warnings
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
 from flask_cors import CORS
 from dotenv import load_dotenv
 
-# Import our classes
-from translator import MessageTranslator
-from virus_total import VirusTotalChecker
-from detector import SmishingDetector
+# Import our classes (heavy ones are imported by their factories below)
+from result_cache import create_analysis_cache
+from near_duplicates import adapt_explanation, create_near_duplicate_index
+from jobs import JobManager
+from verdict_store import normalize_url
+from startup import ComponentRegistry, ComponentUnavailable
+from telemetry import collect_timings, configure_logging, span
+from vt_scheduler import create_rate_limiter, create_scheduler
 from config import Config
 
 warnings.filterwarnings('ignore')
@@ -18,28 +26,60 @@ warnings.filterwarnings('ignore')
 # Load environment variables
 load_dotenv()
 
+configure_logging(Config.LOG_LEVEL, Config.LOG_FORMAT)
+logger = logging.getLogger('smishguard')
+
 # Create Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
 CORS(app)
 
 # Initialize components
-print("\n" + "="*60)
-print("Starting SmishGuard System")
-print("="*60)
+logger.info("Starting SmishGuard System")
+
+components = ComponentRegistry(
+    mode=Config.STARTUP_MODE,
+    warmup=Config.STARTUP_WARMUP,
+    wait_timeout=Config.STARTUP_WAIT_TIMEOUT
+)
+
+
+def load_translator():
+    from translator import MessageTranslator
+    return MessageTranslator()
+
+
+def load_vt_checker():
+    from virus_total import VirusTotalChecker
+    return VirusTotalChecker(Config.VIRUSTOTAL_API_KEY, rate_limiter=vt_rate_limiter)
+
+
+def load_detector():
+    from detector import SmishingDetector
+    return SmishingDetector()
+
+
+# Stand-ins that resolve once the component is built
+vt_rate_limiter = create_rate_limiter()
+translator = components.register('translator', load_translator)
+vt_checker = components.register('vt_checker', load_vt_checker)
+detector = components.register('detector', load_detector)
+components.add_warmup('translator', lambda: translator.warmup())
+components.add_warmup('detector', lambda: detector.warmup())
+
+# All URL scans go through one quota-aware, deduplicating queue
+vt_scheduler = create_scheduler(vt_checker, vt_rate_limiter)
+
+analysis_cache = create_analysis_cache()
+logger.info("Result cache: %s", Config.RESULT_CACHE_BACKEND)
 
-translator = MessageTranslator()
-print("Translator ready")
+near_duplicates = create_near_duplicate_index()
 
-vt_checker = VirusTotalChecker(Config.VIRUSTOTAL_API_KEY)
-print("VirusTotal checker ready")
+job_manager = JobManager(max_workers=Config.JOB_WORKERS, ttl=Config.JOB_TTL)
 
-detector = SmishingDetector()
-print("Smishing detector ready")
+components.start()
 
-print("="*60)
-print("SmishGuard is ready!")
-print("="*60 + "\n")
+logger.info("SmishGuard is up (startup mode: %s) - see /ready", Config.STARTUP_MODE)
 
 
 # =============================================================================
@@ -71,97 +111,536 @@ def learn():
 
 
 # =============================================================================
-# API ROUTES
+# ANALYSIS PIPELINE
 # =============================================================================
 
-@app.route('/analyze', methods=['POST'])
-def analyze_message():
-    """Analyze message for smishing threats"""
-    try:
-        data = request.get_json()
-        message = data.get('message', '').strip()
-        include_lime = data.get('include_lime', True)
-        
-        # Validate input
-        if not message:
-            return jsonify({'error': 'Please enter a message to analyze'}), 400
-        
-        if len(message) < Config.MIN_MESSAGE_LENGTH:
-            return jsonify({'error': f'Message must be at least {Config.MIN_MESSAGE_LENGTH} characters'}), 400
-        
-        if len(message) > Config.MAX_MESSAGE_LENGTH:
-            return jsonify({'error': f'Message too long. SMS messages are typically under {Config.MAX_MESSAGE_LENGTH} characters ({int(Config.MAX_MESSAGE_LENGTH/160)} SMS parts)'}), 400
+def validate_message(message):
+    """Return an error message if the SMS is outside the allowed length, else None"""
+    if not message:
+        return 'Please enter a message to analyze'
+    
+    if len(message) < Config.MIN_MESSAGE_LENGTH:
+        return f'Message must be at least {Config.MIN_MESSAGE_LENGTH} characters'
+    
+    if len(message) > Config.MAX_MESSAGE_LENGTH:
+        return f'Message too long. SMS messages are typically under {Config.MAX_MESSAGE_LENGTH} characters ({int(Config.MAX_MESSAGE_LENGTH/160)} SMS parts)'
+    
+    return None
+
+
+def run_analysis(message, include_lime=True, emit=None, include_timings=False):
+    """
+    Full analysis pipeline for one validated message
+    
+    Args:
+        message: SMS text
+        include_lime: Add a LIME explanation
+        emit: Optional callback emit(event, data) receiving partial results
+              in order: 'verdict', 'urls', 'explanation'
+        include_timings: Add a 'timings' block with milliseconds per stage
+    
+    Returns:
+        dict: Complete analysis response
+    """
+    with collect_timings() as timings:
+        with span('analyze'):
+            analysis = _run_analysis(message, include_lime, emit or (lambda event, data: None))
+    
+    if include_timings:
+        analysis = dict(analysis, timings=timings.as_dict())
+    return analysis
+
+
+def _run_analysis(message, include_lime, emit):    
+    # Repeated messages are served from the result cache
+    if analysis_cache:
+        cached = analysis_cache.get(message, include_lime)
+        if cached is not None:
+            cached['cache_hit'] = True
+            logger.info("Analysis served from cache", extra={'prediction': cached['prediction']})
+            emit_cached_stages(cached, include_lime, emit)
+            return cached
+    
+    # Step 1: Start URL scans in the background - they are the slowest stage
+    urls = vt_checker.extract_urls(message)
+    url_futures = [vt_scheduler.submit(url, 'interactive') for url in urls]
+    
+    # Step 2: Language detection and translation
+    detected_lang = translator.detect_language(message)
+    translation_result = None
+    analysis_text = message
+    
+    if detected_lang == 'ar':
+        translation_result = translator.translate(message)
+        if translation_result:
+            analysis_text = translation_result['translated']
+    
+    # Step 3: Model inference while the scans are in flight - unless a
+    # recent near-duplicate (campaign variant) already has a verdict
+    near_duplicate = near_duplicates.lookup(message) if near_duplicates else None
+    if near_duplicate:
+        model_result = near_duplicate.payload['model_result']
+    else:
+        model_result = detector.classify(analysis_text)
+    
+    verdict = dict(model_result, urls_found=len(urls), urls_pending=bool(urls), explanation_pending=bool(include_lime))
+    if near_duplicate:
+        verdict['near_duplicate'] = near_duplicate_info(near_duplicate)
+    if translation_result:
+        verdict['translation'] = translation_result
+    emit('verdict', verdict)
+    
+    # Step 4: Wait for URL scans with validation
+    scan_results = []
+    for future in url_futures:
+        with span('vt_wait'):
+            scan_results.append(future.result())
+    url_results, validation_errors = split_validation_errors(urls, scan_results)
+    
+    # Step 5: Merge URL override
+    analysis = detector.predict(
+        analysis_text,
+        include_lime=False,
+        url_scan_results=url_results,
+        model_result=model_result
+    )
+    
+    # Add metadata to response
+    analysis['url_scan_results'] = url_results
+    analysis['urls_found'] = len(urls)
+    
+    # Add validation errors if any
+    add_validation_errors(analysis, validation_errors)
+    
+    if translation_result:
+        analysis['translation'] = translation_result
+    
+    emit('urls', dict(analysis, explanation_pending=bool(include_lime)))
+    
+    # Step 6: Explain the final prediction
+    lime_result = None
+    if include_lime:
+        lime_result = explain(message, analysis_text, analysis, near_duplicate)
+        emit('explanation', {'lime_explanation': lime_result})
+    record_near_duplicate(message, analysis, model_result, lime_result, near_duplicate)
+    
+    # Only cache complete results - VT errors and pending scans are transient
+    if analysis_cache and not any('error' in r for r in url_results):
+        analysis_cache.set(message, include_lime, analysis)
+    analysis['cache_hit'] = False
+    
+    logger.info("Analysis complete", extra={
+        'prediction': analysis['prediction'],
+        'confidence': round(analysis['confidence'], 4),
+        'message_length': len(message),
+        'language': detected_lang,
+        'urls': len(urls),
+        'url_validation_errors': len(validation_errors)
+    })
+    
+    return analysis
+
+
+def split_validation_errors(urls, scan_results):
+    """
+    Separate scan results from URLs that failed format validation
+    
+    Returns:
+        tuple: (url_results, validation_errors)
+    """
+    url_results = []
+    validation_errors = []
+    for url, result in zip(urls, scan_results):
+        if result.get('validation_failed'):
+            validation_errors.append({
+                'url': url,
+                'error': result.get('error')
+            })
+        else:
+            url_results.append(result)
+    return url_results, validation_errors
+
+
+def add_validation_errors(analysis, validation_errors):
+    """Report URLs that were not scanned because of their format"""
+    if validation_errors:
+        analysis['url_validation_errors'] = validation_errors
+        analysis['validation_warning'] = f"{len(validation_errors)} URL(s) had invalid format and were not scanned"
+
+
+def emit_cached_stages(analysis, include_lime, emit):
+    """Emit the 'verdict', 'urls' and 'explanation' events of a cached analysis, all complete"""
+    without_explanation = {key: value for key, value in analysis.items() if key != 'lime_explanation'}
+    verdict = {key: value for key, value in without_explanation.items() if key != 'url_scan_results'}
+    emit('verdict', dict(verdict, urls_pending=False, explanation_pending=bool(include_lime)))
+    emit('urls', dict(without_explanation, explanation_pending=bool(include_lime)))
+    if include_lime:
+        emit('explanation', {'lime_explanation': analysis.get('lime_explanation')})
+
+
+def near_duplicate_info(near_duplicate):
+    return {
+        'similarity': near_duplicate.similarity,
+        'campaign': near_duplicate.campaign,
+        'age_seconds': near_duplicate.age_seconds,
+        'reused': ['model']
+    }
+
+
+def explain(message, analysis_text, analysis, near_duplicate):
+    """
+    Attach an explanation of the final prediction, reusing the near-duplicate's when it still fits
+    
+    Returns:
+        dict: The explanation, or None if none was added
+    """
+    if near_duplicate:
+        lime_result = adapt_explanation(near_duplicate.payload.get('lime_explanation'), message, analysis['prediction'])
+        if lime_result:
+            analysis['lime_explanation'] = lime_result
+            return lime_result
+    return detector.add_lime_explanation(analysis_text, analysis)
+
+
+def record_near_duplicate(message, analysis, model_result, lime_result, near_duplicate):
+    """Mark reused results on the response and index the message (a variant joins its match's campaign)"""
+    if near_duplicate:
+        info = near_duplicate_info(near_duplicate)
+        if lime_result and lime_result.get('reused'):
+            info['reused'].append('explanation')
+        analysis['near_duplicate'] = info
+    if near_duplicates and not model_result['model_used'].startswith('Rule-based Fallback'):
+        campaign = near_duplicate.campaign if near_duplicate else None
+        near_duplicates.add(message, {'model_result': model_result, 'lime_explanation': lime_result}, campaign=campaign)
+
+
+def parse_batch_items():
+    """
+    Yield (index, item) pairs from a JSON array or an NDJSON request body
+    
+    Each item is either a message string or an object with 'message' and
+    optional 'id' and 'include_lime' fields. A line that is not valid JSON,
+    or an item of any other type, becomes {'error': ...} for its index so
+    the rest of the batch still runs.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = parse_ndjson_lines(request.stream)
+    else:
+        items = request.get_json()
+        if isinstance(items, dict):
+            items = items.get('messages', [])
+        if not isinstance(items, list):
+            items = [items]
+    
+    for index, item in enumerate(items):
+        if isinstance(item, InvalidBatchLine):
+            item = {'error': item.error}
+        elif isinstance(item, str):
+            item = {'message': item}
+        elif isinstance(item, dict):
+            item = {key: item[key] for key in ('message', 'id', 'include_lime') if key in item}
+        else:
+            item = {'error': 'Item must be a message string or an object with a message field'}
+        yield index, item
+
+
+class InvalidBatchLine:
+    """Stand-in for an NDJSON line that could not be parsed"""
+    
+    def __init__(self, error):
+        self.error = error
+
+
+def parse_ndjson_lines(stream):
+    """Yield one parsed value (or InvalidBatchLine) per non-empty line"""
+    for line in stream:
+        line = line.decode('utf-8', errors='replace').strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidBatchLine(f'Invalid JSON: {e}')
+
+
+def run_batch_analysis(items):
+    """
+    Analyze many messages, yielding one result dict per item as each chunk finishes
+    
+    Identical messages and URLs are analyzed once per batch; model inference
+    runs in padded batches and LIME only for items that ask for it.
+    """
+    url_futures = {}
+    analyzed = {}  # (message, include_lime) -> analysis, across chunks
+    chunk = []
+    
+    def scan(url):
+        key = normalize_url(url)
+        if key not in url_futures:
+            url_futures[key] = vt_scheduler.submit(url, 'bulk')
+        return url_futures[key]
+    
+    def flush(chunk):
+        # Dedupe identical messages within the chunk
+        unique = {}
+        for index, item in chunk:
+            if 'error' not in item:
+                unique.setdefault((item['message'], item['include_lime']), []).append((index, item))
         
-        print(f"\n{'='*60}")
-        print("📨 NEW ANALYSIS")
-        print(f"{'='*60}")
-        print(f"Message: {message[:100]}...")
-        print(f"Length: {len(message)} characters (~{len(message)//160 + 1} SMS)")
+        results = {}
+        pending = []
+        for (message, include_lime), members in unique.items():
+            if (message, include_lime) in analyzed:
+                results[(message, include_lime)] = analyzed[(message, include_lime)]
+                continue
+            cached = analysis_cache.get(message, include_lime) if analysis_cache else None
+            if cached is not None:
+                cached['cache_hit'] = True
+                results[(message, include_lime)] = cached
+                continue
+            
+            pending.append([message, include_lime, [], [], message, None])
         
-        # Step 1: Language detection and translation
-        detected_lang = translator.detect_language(message)
-        translation_result = None
-        analysis_text = message
+        # Extract the chunk's URLs in one pass and start their scans
+        for entry, urls in zip(pending, vt_checker.extract_urls_batch([entry[0] for entry in pending])):
+            entry[2] = urls
+            entry[3] = [scan(url) for url in urls]
         
-        if detected_lang == 'ar':
-            print("Arabic detected - translating...")
-            translation_result = translator.translate(message)
+        # Translate the chunk's Arabic messages in one engine batch
+        arabic = [entry for entry in pending if translator.detect_language(entry[0]) == 'ar']
+        for entry, translation_result in zip(arabic, translator.translate_batch([entry[0] for entry in arabic])):
             if translation_result:
-                analysis_text = translation_result['translated']
-        
-        # Step 2: URL scanning with validation
-        urls = vt_checker.extract_urls(message)
-        url_results = []
-        validation_errors = []
+                entry[4] = translation_result['translated']
+                entry[5] = translation_result
         
-        if urls:
-            print(f"Scanning {len(urls)} URL(s)...")
-            for url in urls:
-                result = vt_checker.check_url(url)
-                
-                # Track validation errors separately
-                if result.get('validation_failed'):
-                    validation_errors.append({
-                        'url': url,
-                        'error': result.get('error')
-                    })
-                else:
-                    url_results.append(result)
+        # Near-duplicates of recent messages reuse their verdicts; the rest
+        # go through the model in one padded batch
+        matches = [near_duplicates.lookup(entry[0]) if near_duplicates else None for entry in pending]
+        to_classify = [entry[4] for entry, match in zip(pending, matches) if match is None]
+        classified = iter(detector.classify_batch(to_classify) if to_classify else [])
+        model_results = [match.payload['model_result'] if match else next(classified) for match in matches]
         
-        # Step 3: AI analysis
-        print("Running AI analysis...")
-        analysis = detector.predict(
-            analysis_text,
-            include_lime=include_lime,
-            url_scan_results=url_results
-        )
+        for (message, include_lime, urls, futures, analysis_text, translation_result), model_result, near_duplicate in zip(pending, model_results, matches):
+            url_results, validation_errors = split_validation_errors(urls, [future.result() for future in futures])
+            analysis = detector.predict(
+                analysis_text,
+                include_lime=False,
+                url_scan_results=url_results,
+                model_result=model_result
+            )
+            lime_result = explain(message, analysis_text, analysis, near_duplicate) if include_lime else None
+            record_near_duplicate(message, analysis, model_result, lime_result, near_duplicate)
+            analysis['url_scan_results'] = url_results
+            analysis['urls_found'] = len(urls)
+            add_validation_errors(analysis, validation_errors)
+            if translation_result:
+                analysis['translation'] = translation_result
+            
+            if analysis_cache and not any('error' in r for r in url_results):
+                analysis_cache.set(message, include_lime, analysis)
+            analysis['cache_hit'] = False
+            results[(message, include_lime)] = analysis
+        analyzed.update(results)
         
-        # Add metadata to response
-        analysis['url_scan_results'] = url_results
-        analysis['urls_found'] = len(urls)
+        for index, item in chunk:
+            line = {'index': index}
+            if 'id' in item:
+                line['id'] = item['id']
+            if 'error' in item:
+                line['error'] = item['error']
+            else:
+                line.update(results[(item['message'], item['include_lime'])])
+            yield line
+    
+    for count, (index, item) in enumerate(items):
+        if count >= Config.BATCH_MAX_ITEMS:
+            yield {'index': index, 'error': f'Batch limit of {Config.BATCH_MAX_ITEMS} messages reached'}
+            break
         
-        # Add validation errors if any
-        if validation_errors:
-            analysis['url_validation_errors'] = validation_errors
-            analysis['validation_warning'] = f"{len(validation_errors)} URL(s) had invalid format and were not scanned"
+        message = str(item.get('message', '')).strip()
+        error = item.get('error') or validate_message(message)
+        if error:
+            chunk.append((index, {**item, 'error': error}))
+        else:
+            chunk.append((index, {**item, 'message': message, 'include_lime': bool(item.get('include_lime', False))}))
         
-        if translation_result:
-            analysis['translation'] = translation_result
+        if len(chunk) >= Config.BATCH_CHUNK_SIZE:
+            yield from flush(chunk)
+            chunk = []
+    
+    if chunk:
+        yield from flush(chunk)
+
+
+# =============================================================================
+# API ROUTES
+# =============================================================================
+
+@app.route('/analyze', methods=['POST'])
+def analyze_message():
+    """Analyze message for smishing threats"""
+    try:
+        data = request.get_json()
+        message = data.get('message', '').strip()
+        include_lime = data.get('include_lime', True)
+        include_timings = Config.RESPONSE_TIMINGS or bool(data.get('timings')) or request.args.get('timings') == '1'
         
-        print(f"Result: {analysis['prediction'].upper()}")
-        print(f"   Confidence: {analysis['confidence']:.1%}")
-        if validation_errors:
-            print(f"   ⚠️  {len(validation_errors)} URL validation error(s)")
-        print(f"{'='*60}\n")
+        # Validate input
+        error = validate_message(message)
+        if error:
+            return jsonify({'error': error}), 400
         
-        return jsonify(analysis)
+        return jsonify(run_analysis(message, include_lime, include_timings=include_timings))
         
+    except ComponentUnavailable:
+        raise
     except Exception as e:
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Analysis failed: %s", e)
         return jsonify({'error': 'Analysis failed'}), 500
 
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze a JSON array or NDJSON stream of messages, streaming NDJSON results"""
+    def stream():
+        try:
+            for result in run_batch_analysis(parse_batch_items()):
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            logger.exception("Batch analysis failed: %s", e)
+            yield json.dumps({'error': 'Batch analysis failed'}) + '\n'
+    
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+
+@app.route('/analyze/jobs', methods=['POST'])
+def create_analysis_job():
+    """Start a background analysis and return its job id immediately"""
+    data = request.get_json(silent=True) or {}
+    message = data.get('message', '').strip()
+    include_lime = data.get('include_lime', True)
+    
+    error = validate_message(message)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    job = job_manager.submit(run_analysis, message, include_lime)
+    return jsonify({
+        'job_id': job.id,
+        'status_url': f'/analyze/jobs/{job.id}',
+        'events_url': f'/analyze/jobs/{job.id}/events'
+    }), 202
+
+
+@app.route('/analyze/jobs/<job_id>')
+def get_analysis_job(job_id):
+    """Poll a job: events after index `after`, plus the result once complete"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    
+    after = request.args.get('after', 0, type=int)
+    events = job.wait_for_events(after, timeout=0)
+    response = {
+        'job_id': job.id,
+        'status': job.status,
+        'events': events,
+        'next': after + len(events)
+    }
+    if job.done:
+        response['result'] = job.result
+    return jsonify(response)
+
+
+@app.route('/analyze/jobs/<job_id>/events')
+def stream_analysis_job(job_id):
+    """Server-Sent Events stream of a job's partial results"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    
+    def stream():
+        index = 0
+        while True:
+            events = job.wait_for_events(index, timeout=15)
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            
+            for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            index += len(events)
+            
+            if job.done and index >= len(job.events):
+                break
+    
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.errorhandler(ComponentUnavailable)
+def component_unavailable(e):
+    """Requests that arrive before the model is loaded"""
+    return jsonify({'error': 'Service is starting up, try again shortly', 'detail': str(e)}), 503, {'Retry-After': '5'}
+
+
+@app.route('/ready')
+def ready():
+    """Readiness probe with per-component startup timings"""
+    status = components.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: stage latency histograms, cache lookups, VT retries, batch sizes"""
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+@app.route('/inference/stats')
+def inference_stats():
+    """Micro-batching queue depth and batch-size metrics"""
+    if detector.scheduler is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **detector.scheduler.stats()})
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Result cache hit/miss counters"""
+    if not analysis_cache:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **analysis_cache.stats()})
+
+
+@app.route('/translation/stats')
+def translation_stats():
+    """Translation cache hit/miss and coalescing counters"""
+    return jsonify(translator.stats())
+
+
+@app.route('/campaigns')
+def campaigns():
+    """Largest recent message campaigns found by the near-duplicate index"""
+    if not near_duplicates:
+        return jsonify({'enabled': False})
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'enabled': True, **near_duplicates.stats(), 'top': near_duplicates.top_campaigns(limit)})
+
+
+@app.route('/vt/stats')
+def vt_stats():
+    """VirusTotal scheduler queue and remaining request budget"""
+    return jsonify(vt_scheduler.stats())
+
 # =============================================================================
 # RUN APPLICATION
 # =============================================================================
@@ -0,0 +1,418 @@
+"""
+SmishGuard Benchmark
+End-to-end latency and throughput with local stand-ins for VirusTotal and translation
+
+Starts a fake VirusTotal v3 API and a fake LibreTranslate-compatible server
+on localhost (each with configurable latency), points SmishGuard at them and
+measures every stage on messages from the test split:
+
+    translate    MessageTranslator.translate (Arabic share of messages)
+    url_extract  VirusTotalChecker.extract_urls
+    vt           VirusTotalChecker.check_url, per URL
+    model        SmishingDetector.classify
+    lime         SmishingDetector.get_explanation (first --lime-limit messages)
+    predict      SmishingDetector.predict with explanation
+    analyze      POST /analyze through the Flask test client
+
+Caches, the verdict store and the near-duplicate index are disabled unless
+--warm-cache is given, so every run measures the uncached path.
+
+Usage:
+    python benchmark.py --limit 200 --output bench.json
+    python benchmark.py --limit 200 --baseline bench.json   # exit 1 on regression
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import numpy as np
+
+DEFAULT_CSV = os.path.join('DistilBERT Model Implementation', 'prep_out', 'test.csv')
+STAGES = ['translate', 'url_extract', 'vt', 'model', 'lime', 'predict', 'analyze']
+ARABIC_PREFIX = 'تنبيه: '
+HARMFUL_WORDS = ('verify', 'secure', 'login', 'account', 'bank', 'update', 'prize')
+
+# Used when the test split is missing (e.g. a checkout without Git LFS files)
+SAMPLE_MESSAGES = [
+    "Hey, are we still on for lunch tomorrow?",
+    "Your package could not be delivered. Confirm your address at http://parcel-track.info/confirm",
+    "URGENT: Your bank account has been suspended. Verify now at http://secure-bank-update.net/verify",
+    "Congratulations! You have won a $1000 gift card. Claim at www.prize-claims.co/win",
+    "Mom, I'll be home late tonight, don't wait up for dinner",
+    "Your OTP is 482913. Do not share it with anyone.",
+    "Reminder: your dentist appointment is on Monday at 10am",
+    "Netflix: your payment failed. Update your details at netflix-billing-help.com/login",
+]
+
+
+# =============================================================================
+# FAKE SERVERS
+# =============================================================================
+
+class FakeServer:
+    """Threaded HTTP server on a free localhost port with simulated latency"""
+
+    def __init__(self, handler, latency_ms, jitter_ms):
+        handler.server_latency = (latency_ms / 1000, jitter_ms / 1000)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    server_latency = (0.0, 0.0)
+
+    def log_message(self, format, *args):
+        pass
+
+    def delay(self):
+        latency, jitter = self.server_latency
+        time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+
+class FakeVirusTotalHandler(FakeHandler):
+    """
+    Minimal VirusTotal v3: URL reports, URL submission and analyses
+
+    A fixed share of URLs (by hash) already has a report; the rest go
+    through submit + analysis. URLs with phishing-style words are flagged.
+    """
+
+    known_share = 0.7
+
+    @staticmethod
+    def stats_for(text):
+        malicious = 4 if any(word in text.lower() for word in HARMFUL_WORDS) else 0
+        return {'harmless': 60, 'malicious': malicious, 'suspicious': 0, 'undetected': 20}
+
+    def do_GET(self):
+        self.delay()
+        if self.path.startswith('/urls/'):
+            url_id = self.path.split('/')[2]
+            digest = int(hashlib.sha1(url_id.encode()).hexdigest(), 16)
+            if digest % 100 >= self.known_share * 100:
+                return self.send_json(404, {'error': {'code': 'NotFoundError'}})
+            return self.send_json(200, {'data': {'attributes': {
+                'last_analysis_stats': self.stats_for(url_id),
+                'last_analysis_date': int(time.time()) - 3600
+            }}})
+
+        if self.path.startswith('/analyses/'):
+            submitted = bytes.fromhex(self.path.split('/')[2][2:]).decode(errors='ignore')
+            return self.send_json(200, {'data': {'attributes': {
+                'status': 'completed',
+                'stats': self.stats_for(submitted)
+            }}})
+
+        self.send_json(404, {'error': {'code': 'NotFoundError'}})
+
+    def do_POST(self):
+        self.delay()
+        url = parse_qs(self.read_body().decode()).get('url', [''])[0]
+        self.send_json(200, {'data': {'id': 'u-' + url.encode().hex()}})
+
+
+class FakeTranslateHandler(FakeHandler):
+    """LibreTranslate-style POST /translate that strips Arabic characters"""
+
+    arabic = re.compile(r'[\u0600-\u06FF]+:?\s*')
+
+    def do_POST(self):
+        self.delay()
+        payload = json.loads(self.read_body() or b'{}')
+        texts = payload.get('q', '')
+        translated = [self.arabic.sub('', text) for text in texts] if isinstance(texts, list) else self.arabic.sub('', texts)
+        self.send_json(200, {'translatedText': translated})
+
+
+class FakeTranslateEngine:
+    """Translation engine that sends each batch to the fake translation server"""
+
+    name = 'fake'
+    base_url = None
+
+    def __init__(self):
+        import requests
+
+        self.endpoint = f"{self.base_url}/translate"
+        self.session = requests.Session()
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        payload = {'q': texts, 'source': source_lang, 'target': target_lang, 'format': 'text'}
+        response = self.session.post(self.endpoint, json=payload, timeout=10)
+        response.raise_for_status()
+        translated = response.json()['translatedText']
+        return translated if isinstance(translated, list) else [translated]
+
+
+# =============================================================================
+# MEASUREMENT
+# =============================================================================
+
+class StageTimer:
+    """Collects per-call latencies for each stage"""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.walls = {}
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.samples[stage].append(time.perf_counter() - started)
+
+    def report(self):
+        """
+        Returns:
+            dict: Per stage: count, throughput, mean and p50/p95/p99/max in ms
+        """
+        report = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            values = np.array(samples) * 1000
+            wall = self.walls.get(stage, values.sum() / 1000)
+            report[stage] = {
+                'count': len(values),
+                'throughput_per_s': len(values) / wall if wall else 0.0,
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p95_ms': float(np.percentile(values, 95)),
+                'p99_ms': float(np.percentile(values, 99)),
+                'max_ms': float(values.max())
+            }
+        return report
+
+
+def load_messages(csv_path, limit, arabic_share, seed):
+    """Messages from the test split, with a share turned into Arabic-routed ones"""
+    import pandas as pd
+
+    try:
+        messages = pd.read_csv(csv_path)['text'].astype(str).tolist()
+    except Exception as e:
+        print(f"Could not read {csv_path} ({e}) - using built-in sample messages")
+        messages = SAMPLE_MESSAGES
+
+    rng = random.Random(seed)
+    messages = [messages[i % len(messages)] for i in range(limit or len(messages))]
+    return [ARABIC_PREFIX + message if rng.random() < arabic_share else message for message in messages]
+
+
+def configure_environment(vt_url, translate_url, warm_cache, verbose):
+    """Point SmishGuard at the fake servers; must run before app is imported"""
+    os.environ.update({
+        'LOG_LEVEL': 'INFO' if verbose else 'WARNING',
+        'VIRUSTOTAL_API_KEY': 'benchmark',
+        'VIRUSTOTAL_BASE_URL': vt_url,
+        'VT_RATE_PER_MINUTE': '0',  # The fake server has no quota
+        'TRANSLATION_ENGINE': FakeTranslateEngine.name,
+        'STARTUP_MODE': 'eager',
+        'FLASK_DEBUG': 'False'
+    })
+    if not warm_cache:
+        os.environ.update({
+            'RESULT_CACHE_BACKEND': 'none',
+            'TRANSLATION_CACHE_BACKEND': 'none',
+            'VT_VERDICT_STORE_PATH': '',
+            'NEAR_DUPLICATE_ENABLED': 'False'
+        })
+
+    # Register the fake engine so translator.py builds it like any other
+    import translator
+    FakeTranslateEngine.base_url = translate_url
+    translator.TRANSLATION_ENGINES[FakeTranslateEngine.name] = FakeTranslateEngine
+
+
+def run_benchmark(messages, lime_limit, concurrency, verbose):
+    """
+    Measure each stage, then the /analyze route under concurrency
+
+    Returns:
+        dict: StageTimer report
+    """
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with quiet:
+        import app as smishguard
+        translator = smishguard.translator
+        vt_checker = smishguard.vt_checker
+        detector = smishguard.detector
+        client = smishguard.app.test_client()
+
+    timer = StageTimer()
+    with quiet:
+        for index, message in enumerate(messages):
+            text = message
+            if translator.detect_language(message) == 'ar':
+                with timer.time('translate'):
+                    translation = translator.translate(message)
+                text = translation['translated'] if translation else message
+
+            with timer.time('url_extract'):
+                urls = vt_checker.extract_urls(message)
+            for url in urls:
+                with timer.time('vt'):
+                    vt_checker.check_url(url)
+
+            with timer.time('model'):
+                result = detector.classify(text)
+
+            if index < lime_limit:
+                with timer.time('lime'):
+                    detector.get_explanation(text, result['prediction'])
+                with timer.time('predict'):
+                    detector.predict(text, include_lime=True)
+
+        def analyze(message):
+            with timer.time('analyze'):
+                response = client.post('/analyze', json={'message': message[:1600], 'include_lime': False})
+            return response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            statuses = list(pool.map(analyze, messages))
+        timer.walls['analyze'] = time.perf_counter() - started
+
+    failed = sum(1 for status in statuses if status != 200)
+    if failed:
+        print(f"Warning: {failed} /analyze requests did not return 200")
+    return timer.report()
+
+
+def compare(report, baseline, tolerance, min_delta_ms=1.0):
+    """
+    Compare latency percentiles against a saved baseline
+
+    Slowdowns smaller than min_delta_ms are ignored so sub-millisecond
+    stages do not flag on timer noise.
+
+    Returns:
+        list: (stage, metric, baseline_ms, current_ms, ratio) rows beyond tolerance
+    """
+    regressions = []
+    for stage, current in report.items():
+        previous = baseline.get('stages', baseline).get(stage)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if previous[metric] > 0:
+                ratio = current[metric] / previous[metric]
+                if ratio > 1 + tolerance and current[metric] - previous[metric] >= min_delta_ms:
+                    regressions.append((stage, metric, previous[metric], current[metric], ratio))
+    return regressions
+
+
+def print_report(report, settings):
+    print("\n" + "="*88)
+    print(f"BENCHMARK: {settings['messages']} messages, VT {settings['vt_latency_ms']}ms, "
+          f"translate {settings['translate_latency_ms']}ms, concurrency {settings['concurrency']}")
+    print("="*88)
+    print(f"{'stage':<12}{'count':>7}{'per s':>10}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for stage in STAGES:
+        if stage in report:
+            row = report[stage]
+            print(f"{stage:<12}{row['count']:>7}{row['throughput_per_s']:>10.1f}{row['mean_ms']:>10.1f}"
+                  f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    print("(latencies in ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end SmishGuard benchmark with fake VirusTotal and translation servers')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--limit', type=int, default=200, help='Number of messages (0 = whole file)')
+    parser.add_argument('--lime-limit', type=int, default=20, help='Messages that also get an explanation')
+    parser.add_argument('--arabic-share', type=float, default=0.2, help='Share of messages routed through translation')
+    parser.add_argument('--concurrency', type=int, default=8, help='Parallel /analyze requests')
+    parser.add_argument('--vt-latency-ms', type=float, default=150)
+    parser.add_argument('--vt-known-share', type=float, default=0.7, help='Share of URLs VirusTotal already has a report for')
+    parser.add_argument('--translate-latency-ms', type=float, default=120)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--warm-cache', action='store_true', help='Keep result/translation caches, the verdict store and near-duplicate reuse on')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the report as JSON (use as a later --baseline)')
+    parser.add_argument('--baseline', help='Baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed slowdown before a stage counts as regressed')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore slowdowns smaller than this')
+    parser.add_argument('--verbose', action='store_true', help='Keep SmishGuard console output')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    FakeVirusTotalHandler.known_share = args.vt_known_share
+    vt_server = FakeServer(FakeVirusTotalHandler, args.vt_latency_ms, args.jitter_ms)
+    translate_server = FakeServer(FakeTranslateHandler, args.translate_latency_ms, args.jitter_ms)
+    configure_environment(vt_server.base_url, translate_server.base_url, args.warm_cache, args.verbose)
+
+    messages = load_messages(args.csv, args.limit, args.arabic_share, args.seed)
+    settings = {
+        'messages': len(messages),
+        'lime_limit': args.lime_limit,
+        'arabic_share': args.arabic_share,
+        'concurrency': args.concurrency,
+        'vt_latency_ms': args.vt_latency_ms,
+        'vt_known_share': args.vt_known_share,
+        'translate_latency_ms': args.translate_latency_ms,
+        'jitter_ms': args.jitter_ms,
+        'warm_cache': args.warm_cache
+    }
+
+    report = run_benchmark(messages, args.lime_limit, args.concurrency, args.verbose)
+    vt_server.close()
+    translate_server.close()
+    print_report(report, settings)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': settings, 'stages': report}, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        print(f"\nBaseline comparison ({args.baseline}, tolerance {args.tolerance:.0%}):")
+        if not regressions:
+            print("  No regressions")
+            return 0
+        for stage, metric, previous, current, ratio in regressions:
+            print(f"  REGRESSION {stage} {metric}: {previous:.1f}ms -> {current:.1f}ms ({ratio:.2f}x)")
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,429 @@
+"""
+Bulk Scoring
+Resumable offline scoring of large CSV or NDJSON message archives
+
+Input matches combined_cleaned_original_datasets.csv (columns label, text,
+label_num); any other file with a text column works too. The input is read
+in chunks and never loaded whole. Chunks are scored on a process pool and
+the results are appended to the output in input order.
+
+After every written chunk a checkpoint records the input byte offset and
+output size. --resume truncates the output to the last checkpoint and
+continues from that offset, so a crash loses at most the chunks in flight.
+
+Scoring never waits on VirusTotal, whose rate limit is far below model
+throughput. With --vt the finished output is rewritten in a second pass
+that checks its URLs and fills in harmful_urls and prediction. If scans
+are still pending at the end, the run stays incomplete and --resume
+repeats only that pass (stored verdicts make it cheap).
+
+Usage:
+    python bulk_score.py archive.csv scored.csv
+    python bulk_score.py archive.ndjson scored.ndjson --workers 4 --vt
+    python bulk_score.py archive.csv scored.csv --resume
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+from telemetry import configure_logging
+
+logger = logging.getLogger('bulk_score')
+
+KEEP_COLUMNS = ['id', 'label', 'label_num']
+RESULT_FIELDS = ['prediction', 'model_prediction', 'smishing_probability', 'confidence', 'urls', 'harmful_urls']
+
+_detector = None
+
+
+# =============================================================================
+# INPUT / OUTPUT
+# =============================================================================
+
+def read_records(path, offset=0, header=None):
+    """
+    Stream records from a CSV or NDJSON file
+
+    Args:
+        path: Input file
+        offset: Byte offset to start from (a previous checkpoint)
+        header: CSV header when resuming past it
+
+    Yields:
+        (record dict, byte offset just after the record, CSV header or None)
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        lines = iter(f.readline, b'')
+
+        if is_ndjson(path):
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line), f.tell(), None
+            return
+
+        # csv.reader pulls exactly the lines of one record, so f.tell() after
+        # each row is the start of the next (quoted newlines included)
+        reader = csv.reader(line.decode('utf-8') for line in lines)
+        if header is None:
+            header = next(reader, None)
+            if header is None:
+                return
+            header[0] = header[0].lstrip('\ufeff')
+        for row in reader:
+            if row:
+                yield dict(zip(header, row)), f.tell(), header
+
+
+def is_ndjson(path):
+    return path.lower().endswith(('.ndjson', '.jsonl'))
+
+
+class ResultWriter:
+    """Appends result rows as CSV or NDJSON and reports the byte size written"""
+
+    def __init__(self, path, fields, offset):
+        """
+        Args:
+            path: Output file
+            fields: Output columns
+            offset: Size to truncate to before appending (0 starts over)
+        """
+        self.ndjson = is_ndjson(path)
+        self.fields = fields
+        self.file = open(path, 'r+b' if offset and os.path.exists(path) else 'wb')
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        if offset == 0 and not self.ndjson:
+            self._write_csv(fields)
+
+    def _write_csv(self, row):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerow(row)
+        self.file.write(buffer.getvalue().encode('utf-8'))
+
+    def write(self, rows):
+        for row in rows:
+            if self.ndjson:
+                self.file.write((json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8'))
+            else:
+                self._write_csv([
+                    ' '.join(row[field]) if isinstance(row.get(field), list) else row.get(field, '')
+                    for field in self.fields
+                ])
+
+    def flush(self):
+        """Flush to disk and return the output size"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    """Write atomically so a crash never leaves a half-written checkpoint"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# =============================================================================
+# SCORING
+# =============================================================================
+
+def init_worker(threads):
+    """Process pool initializer: one single-threaded detector per worker"""
+    global _detector
+    import torch
+    from detector import SmishingDetector
+
+    torch.set_num_threads(threads)
+    Config.MICRO_BATCHING = False  # Whole chunks are already batched
+    _detector = SmishingDetector()
+
+
+def score_chunk(texts):
+    """
+    Returns:
+        list: (model_prediction, smishing_probability, confidence) per text
+    """
+    return [
+        (result['prediction'], result['probabilities']['smishing'], result['confidence'])
+        for result in _detector.classify_batch(texts)
+    ]
+
+
+def chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class URLChecker:
+    """URL extraction and optional VirusTotal checks at bulk priority"""
+
+    def __init__(self, scan):
+        from virus_total import VirusTotalChecker
+        from vt_scheduler import create_rate_limiter, create_scheduler
+
+        rate_limiter = create_rate_limiter()
+        self.checker = VirusTotalChecker(Config.VIRUSTOTAL_API_KEY, rate_limiter=rate_limiter)
+        self.scheduler = create_scheduler(self.checker, rate_limiter) if scan else None
+
+    def extract(self, texts):
+        """
+        Returns:
+            list: URLs per text
+        """
+        return self.checker.extract_urls_batch(texts)
+
+    def submit(self, urls):
+        """Queue VirusTotal scans of the URLs and return their futures"""
+        return [self.scheduler.submit(url, 'bulk') for url in urls]
+
+
+def fill_vt_columns(path, fields, url_checker, window):
+    """
+    Rewrite a scored output with VirusTotal verdicts for its URLs
+
+    Scans for up to `window` rows are queued while the oldest row waits for
+    its results. The output is replaced only once every row is written.
+
+    Args:
+        path: Output file from the scoring pass
+        fields: Output columns
+        url_checker: URLChecker with scanning enabled
+        window: Rows with scans in flight
+
+    Returns:
+        int: Rows with a scan still pending (their URLs count as not harmful)
+    """
+    tmp_path = f"{path}.vt.tmp"
+    writer = ResultWriter(tmp_path, fields, 0)
+    in_flight = deque()
+    pending = 0
+
+    def write_oldest():
+        nonlocal pending
+        row, futures = in_flight.popleft()
+        results = [future.result() for future in futures]
+        harmful = [url for url, result in zip(row['urls'], results) if result.get('is_harmful')]
+        row.update({
+            'prediction': 'smishing' if harmful else row['model_prediction'],
+            'harmful_urls': harmful
+        })
+        writer.write([row])
+        pending += any(result.get('pending') for result in results)
+
+    try:
+        for row, _, _ in read_records(path):
+            if not isinstance(row['urls'], list):
+                row['urls'] = row['urls'].split()
+            in_flight.append((row, url_checker.submit(row['urls'])))
+            if len(in_flight) > window:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+        writer.flush()
+    finally:
+        writer.close()
+    os.replace(tmp_path, path)
+    return pending
+
+
+class _Done:
+    """Already-computed stand-in for a Future when scoring runs in-process"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+def run(args):
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.json"
+    checkpoint = load_checkpoint(checkpoint_path) if args.resume else None
+
+    if checkpoint and checkpoint.get('done'):
+        logger.info("Nothing to do - %s is complete", args.output)
+        return 0
+    if checkpoint is None and os.path.exists(args.output) and not args.overwrite:
+        logger.error("%s exists; use --resume to continue or --overwrite to start over", args.output)
+        return 1
+
+    checkpoint = checkpoint or {'input_offset': 0, 'output_offset': 0, 'records': 0, 'header': None}
+    if not checkpoint.get('scored'):
+        status = score(args, checkpoint, checkpoint_path)
+        if not checkpoint.get('scored'):
+            return status
+
+    if args.vt:
+        logger.info("Checking URLs with VirusTotal")
+        pending = fill_vt_columns(args.output, checkpoint['fields'], URLChecker(scan=True), 2 * Config.VT_SCAN_WORKERS)
+        if pending:
+            logger.warning("%d rows have VirusTotal scans still pending; rerun with --resume to collect them", pending)
+            return 0
+
+    checkpoint['done'] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    logger.info("Done: %d records in %s", checkpoint['records'], args.output)
+    return 0
+
+
+def score(args, checkpoint, checkpoint_path):
+    """
+    Scoring pass: model results and extracted URLs, checkpointed per chunk
+
+    Sets checkpoint['scored'] once the whole input is written.
+
+    Returns:
+        int: Exit status
+    """
+    records = read_records(args.input, checkpoint['input_offset'], checkpoint['header'])
+
+    # Peek at the first record to settle the output columns
+    first = next(records, None)
+    if first is None:
+        if checkpoint['records']:
+            # Every chunk was written before the run stopped
+            checkpoint['scored'] = True
+            save_checkpoint(checkpoint_path, checkpoint)
+        else:
+            logger.info("No records to score")
+        return 0
+    record, _, header = first
+    if args.text_column not in record:
+        logger.error("Input has no '%s' column (found: %s)", args.text_column, ', '.join(record))
+        return 1
+    checkpoint['header'] = header
+
+    keep = [column for column in (args.keep or KEEP_COLUMNS) if column in record]
+    fields = keep + RESULT_FIELDS
+    checkpoint['fields'] = fields
+    writer = ResultWriter(args.output, fields, checkpoint['output_offset'])
+
+    workers = args.workers if args.workers is not None else (os.cpu_count() or 1)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // max(1, workers))
+
+    if workers:
+        context = None
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # Load the weights once and share them with the workers copy-on-write
+            import detector
+            detector.preload()
+            context = multiprocessing.get_context('fork')
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker, initargs=(threads,))
+        # The first task forks every worker; wait for it so none is forked
+        # after the URL checker's scheduler threads and session exist
+        pool.submit(os.getpid).result()
+        submit = pool.submit
+    else:
+        init_worker(threads)
+        pool = None
+        submit = lambda func, *call_args: _Done(func(*call_args))
+
+    url_checker = URLChecker(scan=False) if args.urls or args.vt else None
+
+    def records_with_first():
+        yield first
+        yield from records
+
+    started = time.perf_counter()
+    scored = 0
+    in_flight = deque()
+
+    def write_oldest():
+        nonlocal scored
+        chunk, texts, future = in_flight.popleft()
+        url_lists = url_checker.extract(texts) if url_checker else [[]] * len(texts)
+
+        rows = []
+        for (record, _, _), (model_prediction, probability, confidence), urls in zip(chunk, future.result(), url_lists):
+            row = {column: record.get(column) for column in keep}
+            row.update({
+                'prediction': model_prediction,
+                'model_prediction': model_prediction,
+                'smishing_probability': round(float(probability), 6),
+                'confidence': round(float(confidence), 6),
+                'urls': urls,
+                'harmful_urls': []
+            })
+            rows.append(row)
+        writer.write(rows)
+
+        checkpoint['output_offset'] = writer.flush()
+        checkpoint['input_offset'] = chunk[-1][1]
+        checkpoint['records'] += len(chunk)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+        scored += len(chunk)
+        elapsed = time.perf_counter() - started
+        logger.info("Scored %d records (%d total, %.0f/s)", scored, checkpoint['records'], scored / elapsed if elapsed else 0.0)
+
+    try:
+        for chunk in chunks(records_with_first(), args.chunk_size):
+            texts = [str(record.get(args.text_column, '')) for record, _, _ in chunk]
+            in_flight.append((chunk, texts, submit(score_chunk, texts)))
+            if len(in_flight) > 2 * max(1, workers):
+                write_oldest()
+        while in_flight:
+            write_oldest()
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    checkpoint['scored'] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a CSV or NDJSON archive of SMS messages')
+    parser.add_argument('input', help='CSV (text column) or .ndjson/.jsonl file')
+    parser.add_argument('output', help='Output .csv or .ndjson/.jsonl file')
+    parser.add_argument('--text-column', default='text')
+    parser.add_argument('--keep', type=lambda value: value.split(','), help=f"Input columns copied to the output (default: {','.join(KEEP_COLUMNS)})")
+    parser.add_argument('--chunk-size', type=int, default=1024, help='Records per worker task')
+    parser.add_argument('--workers', type=int, default=None, help='Scoring processes (default: CPU count, 0 = in-process)')
+    parser.add_argument('--threads', type=int, default=0, help='Torch threads per worker (0 = cores / workers)')
+    parser.add_argument('--urls', action='store_true', help='Extract URLs from each message')
+    parser.add_argument('--vt', action='store_true', help='Check extracted URLs with VirusTotal in a second pass; harmful URLs override the model')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <output>.checkpoint.json)')
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint')
+    parser.add_argument('--overwrite', action='store_true', help='Replace an existing output file')
+    args = parser.parse_args()
+
+    configure_logging(Config.LOG_LEVEL, Config.LOG_FORMAT)
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
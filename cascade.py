@@ -0,0 +1,343 @@
+"""
+Cascade
+Hashed n-gram logistic regression in front of DistilBERT
+
+Word 1-2 grams and character 3-5 grams are hashed into fixed-size sparse
+vectors (no vocabulary to store), and a logistic regression scores them
+in microseconds. A message whose lexical smishing probability is outside
+the uncertain band (low, high) is decided here; only the rest go to the
+transformer.
+
+The band is fitted on the validation set so that decided messages reach
+CASCADE_TARGET_ACCURACY on each side. CASCADE_LOW / CASCADE_HIGH override
+it. When the transformer is unavailable the same model stands in for the
+keyword rules, which remain the fallback if it could not be loaded.
+
+The model is trained only by `python cascade.py --train`, which saves it
+to CASCADE_MODEL_PATH. The stage is off unless CASCADE_ENABLED is set, and
+skipped when that file is missing.
+
+Usage:
+    python cascade.py --train            # (re)train on train.csv, fit the band on val.csv
+    python cascade.py --report           # skip rate, accuracy and latency on test.csv
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+
+import numpy as np
+import scipy.sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_MODEL_USED = 'Lexical Pre-filter (hashed n-grams)'
+LEXICAL_FALLBACK_USED = 'Lexical Fallback (hashed n-grams)'
+
+_WORD = re.compile(r'\w+')
+
+
+class LexicalModel:
+    """Hashed word/char n-gram logistic regression with an uncertainty band"""
+
+    name = 'lexical'
+
+    def __init__(self, coef, intercept, low=0.05, high=0.95, n_features=2 ** 18, metadata=None):
+        """
+        Initialize model
+
+        Args:
+            coef: Weights for the word then char hashed features (2 * n_features)
+            intercept: Bias term
+            low: Smishing probability at or below which ham is decided
+            high: Smishing probability at or above which smishing is decided
+            n_features: Hash buckets per vectorizer
+            metadata: Training summary kept with the weights
+        """
+        self.coef = np.asarray(coef, dtype=np.float32)
+        self.intercept = float(intercept)
+        self.low = low
+        self.high = high
+        self.n_features = n_features
+        self.metadata = metadata or {}
+        self.vectorizers = build_vectorizers(n_features)
+
+    def features(self, texts):
+        return featurize(self.vectorizers, texts)
+
+    def predict_proba(self, texts):
+        """
+        Returns:
+            np.ndarray: Smishing probability per text
+        """
+        scores = self.features(texts) @ self.coef + self.intercept
+        return 1 / (1 + np.exp(-scores))
+
+    def is_confident(self, probs):
+        """Mask of probabilities outside the uncertain band"""
+        probs = np.asarray(probs)
+        return (probs <= self.low) | (probs >= self.high)
+
+    def explain(self, text, class_index, num_features):
+        """
+        Word occlusion on the linear model (all variants in one sparse product)
+
+        Returns:
+            list: (word, weight) pairs sorted by absolute weight
+        """
+        spans = [match.span() for match in _WORD.finditer(text)]
+        variants = [text] + [text[:start] + text[end:] for start, end in spans]
+        probs = self.predict_proba(variants)
+        if class_index == 0:
+            probs = 1 - probs
+
+        weights = {}
+        for (start, end), prob in zip(spans, probs[1:]):
+            word = text[start:end]
+            weight = float(probs[0] - prob)
+            if abs(weight) > abs(weights.get(word, 0.0)):
+                weights[word] = weight
+        ranked = sorted(weights.items(), key=lambda item: abs(item[1]), reverse=True)
+        return ranked[:num_features]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            coef=self.coef,
+            intercept=self.intercept,
+            band=np.array([self.low, self.high]),
+            n_features=self.n_features,
+            metadata=np.array(json.dumps(self.metadata))
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            low, high = data['band']
+            return cls(
+                data['coef'],
+                float(data['intercept']),
+                float(low),
+                float(high),
+                int(data['n_features']),
+                json.loads(str(data['metadata']))
+            )
+
+
+def build_vectorizers(n_features):
+    """Stateless word and character n-gram hashers"""
+    return (
+        HashingVectorizer(analyzer='word', ngram_range=(1, 2), token_pattern=r'(?u)\b\w+\b',
+                          n_features=n_features, alternate_sign=False, norm='l2', dtype=np.float32),
+        HashingVectorizer(analyzer='char_wb', ngram_range=(3, 5),
+                          n_features=n_features, alternate_sign=False, norm='l2', dtype=np.float32)
+    )
+
+
+def featurize(vectorizers, texts):
+    texts = [str(text) for text in texts]
+    return scipy.sparse.hstack([vectorizer.transform(texts) for vectorizer in vectorizers], format='csr')
+
+
+def load_labelled(csv_path, limit=None):
+    """
+    Texts and 0/1 smishing labels from a labelled CSV
+
+    Uses label_num when present (prep_out files), otherwise label, which
+    may be numeric or a class name.
+
+    Returns:
+        (list, np.ndarray): Texts and labels
+    """
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    if limit:
+        df = df.head(limit)
+    column = 'label_num' if 'label_num' in df else 'label'
+    labels = df[column]
+    if labels.dtype == object:
+        labels = labels.astype(str).str.lower().isin(['1', 'smish', 'smishing', 'spam'])
+    return df['text'].astype(str).tolist(), labels.astype(int).to_numpy()
+
+
+def fit_band(probs, labels, target_accuracy):
+    """
+    Widest decision regions whose accuracy on labelled data reaches the target
+
+    Messages are ranked by probability from each end; the region grows while
+    the cumulative accuracy of everything in it stays at or above target and
+    stops at the first message that takes it below.
+
+    Returns:
+        (float, float): low <= 0.5 <= high (-inf / inf when a side never qualifies)
+    """
+    high = _region_edge(probs, labels, np.argsort(-probs), 1, target_accuracy)
+    low = _region_edge(probs, labels, np.argsort(probs), 0, target_accuracy)
+    high = float('inf') if high is None else high
+    low = float('-inf') if low is None else low
+
+    # Each side only ever decides its own class
+    return min(low, 0.5), max(high, 0.5)
+
+
+def _region_edge(probs, labels, order, label, target_accuracy):
+    """Probability of the last message before cumulative accuracy first drops below target"""
+    precision = np.cumsum(labels[order] == label) / np.arange(1, len(order) + 1)
+    qualified = precision >= target_accuracy
+    size = len(qualified) if qualified.all() else int(np.argmin(qualified))
+    return float(probs[order[size - 1]]) if size else None
+
+
+def train(train_csv, val_csv, target_accuracy=0.995, n_features=2 ** 18, C=4.0):
+    """
+    Train the lexical model and fit its uncertainty band
+
+    Returns:
+        LexicalModel
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    started = time.perf_counter()
+    texts, labels = load_labelled(train_csv)
+    vectorizers = build_vectorizers(n_features)
+    classifier = LogisticRegression(C=C, solver='liblinear', max_iter=1000)
+    classifier.fit(featurize(vectorizers, texts), labels)
+
+    model = LexicalModel(classifier.coef_[0], classifier.intercept_[0], n_features=n_features)
+    val_texts, val_labels = load_labelled(val_csv)
+    probs = model.predict_proba(val_texts)
+    model.low, model.high = fit_band(probs, val_labels, target_accuracy)
+
+    decided = model.is_confident(probs)
+    model.metadata = {
+        'train_messages': len(texts),
+        'val_messages': len(val_texts),
+        'val_accuracy': float(((probs >= 0.5) == val_labels).mean()),
+        'val_decided': float(decided.mean()),
+        'val_decided_accuracy': float(((probs[decided] >= 0.5) == val_labels[decided]).mean()) if decided.any() else None,
+        'target_accuracy': target_accuracy
+    }
+    logger.info("Trained lexical cascade model", extra={**model.metadata, 'low': model.low, 'high': model.high,
+                                                       'seconds': round(time.perf_counter() - started, 1)})
+    return model
+
+
+def create_cascade():
+    """
+    Load the lexical model saved by `python cascade.py --train`
+
+    Never trains: this runs while the detector is built.
+
+    Returns:
+        LexicalModel or None when disabled or unavailable
+    """
+    if not Config.CASCADE_ENABLED:
+        return None
+    if not os.path.exists(Config.CASCADE_MODEL_PATH):
+        logger.warning("No lexical cascade model at %s (run python cascade.py --train) - every message goes to the transformer", Config.CASCADE_MODEL_PATH)
+        return None
+    try:
+        model = LexicalModel.load(Config.CASCADE_MODEL_PATH)
+    except Exception as e:
+        logger.warning("Lexical cascade unavailable (%s) - every message goes to the transformer", e)
+        return None
+
+    if Config.CASCADE_LOW is not None:
+        model.low = Config.CASCADE_LOW
+    if Config.CASCADE_HIGH is not None:
+        model.high = Config.CASCADE_HIGH
+    logger.info("Lexical cascade loaded", extra={'low': model.low, 'high': model.high})
+    return model
+
+
+def cascade_report(csv_path, limit=None):
+    """
+    Compare the cascade with the transformer alone on a labelled CSV
+
+    Returns:
+        dict: Skip rate, accuracy of each stage and of the cascade, and latency
+    """
+    from detector import SmishingDetector
+
+    texts, labels = load_labelled(csv_path, limit)
+    # The detector only reads these settings when built
+    settings = Config.CASCADE_ENABLED, Config.MICRO_BATCHING
+    Config.CASCADE_ENABLED, Config.MICRO_BATCHING = True, False
+    try:
+        detector = SmishingDetector()
+    finally:
+        Config.CASCADE_ENABLED, Config.MICRO_BATCHING = settings
+    if detector.cascade is None or not detector.model_loaded:
+        raise RuntimeError("Cascade report needs both the lexical model and the transformer")
+    lexical = detector.cascade
+
+    started = time.perf_counter()
+    lexical_probs = lexical.predict_proba(texts)
+    lexical_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    transformer_probs = detector.predict_proba_batch(texts)[:, 1]
+    transformer_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = detector.classify_batch(texts)
+    cascade_seconds = time.perf_counter() - started
+
+    decided = lexical.is_confident(lexical_probs)
+    cascade_labels = np.array([result['prediction'] == 'smishing' for result in results], dtype=int)
+    return {
+        'messages': len(texts),
+        'band': f"({lexical.low:.4f}, {lexical.high:.4f})",
+        'skip_rate': float(decided.mean()),
+        'accuracy_lexical': float(((lexical_probs >= 0.5) == labels).mean()),
+        'accuracy_lexical_decided': float(((lexical_probs[decided] >= 0.5) == labels[decided]).mean()) if decided.any() else float('nan'),
+        'accuracy_transformer': float(((transformer_probs >= 0.5) == labels).mean()),
+        'accuracy_cascade': float((cascade_labels == labels).mean()),
+        'us_per_message_lexical': 1e6 * lexical_seconds / len(texts),
+        'ms_per_message_transformer': 1000 * transformer_seconds / len(texts),
+        'ms_per_message_cascade': 1000 * cascade_seconds / len(texts),
+        'speedup': transformer_seconds / cascade_seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train and evaluate the lexical cascade stage')
+    parser.add_argument('--train', action='store_true', help='Retrain and save the lexical model')
+    parser.add_argument('--report', action='store_true', help='Print the cascade trade-off on --csv')
+    parser.add_argument('--train-csv', default=Config.CASCADE_TRAIN_CSV)
+    parser.add_argument('--val-csv', default=Config.CASCADE_VALIDATION_CSV)
+    parser.add_argument('--csv', default=os.path.join('DistilBERT Model Implementation', 'prep_out', 'test.csv'))
+    parser.add_argument('--target-accuracy', type=float, default=Config.CASCADE_TARGET_ACCURACY)
+    parser.add_argument('--limit', type=int, default=None, help='Only use the first N test messages')
+    args = parser.parse_args()
+
+    if args.train:
+        model = train(args.train_csv, args.val_csv, args.target_accuracy)
+        model.save(Config.CASCADE_MODEL_PATH)
+        print("\n" + "="*60)
+        print(f"LEXICAL MODEL: {Config.CASCADE_MODEL_PATH}")
+        print("="*60)
+        print(f"{'band':>24}: ({model.low:.4f}, {model.high:.4f})")
+        for key, value in model.metadata.items():
+            print(f"{key:>24}: {value:.4f}" if isinstance(value, float) else f"{key:>24}: {value}")
+
+    if args.report or not args.train:
+        report = cascade_report(args.csv, args.limit)
+        print("\n" + "="*60)
+        print(f"CASCADE REPORT: {args.csv}")
+        print("="*60)
+        for key, value in report.items():
+            print(f"{key:>28}: {value:.4f}" if isinstance(value, float) else f"{key:>28}: {value}")
+
+
+if __name__ == '__main__':
+    main()
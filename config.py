@@ -17,16 +17,133 @@ class Config:
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 5000))
     
+    # Logging and instrumentation
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text or json
+    RESPONSE_TIMINGS = os.getenv('RESPONSE_TIMINGS', 'False').lower() == 'true'  # Always add /analyze timings
+    
+    # Multi-process serving (serve.py)
+    WORKERS = int(os.getenv('WORKERS', 2))
+    TORCH_NUM_THREADS = int(os.getenv('TORCH_NUM_THREADS', 0))  # Per worker; 0 = cores / workers
+    
+    # Startup: 'background' (default), 'eager' or 'lazy' - see startup.py
+    STARTUP_MODE = os.getenv('STARTUP_MODE', 'background')
+    STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', 'True').lower() == 'true'
+    STARTUP_WAIT_TIMEOUT = float(os.getenv('STARTUP_WAIT_TIMEOUT', 30))
+    
     # VirusTotal
     VIRUSTOTAL_API_KEY = os.getenv('VIRUSTOTAL_API_KEY')
+    VIRUSTOTAL_BASE_URL = os.getenv('VIRUSTOTAL_BASE_URL', 'https://www.virustotal.com/api/v3')
+    VT_SCAN_WORKERS = int(os.getenv('VT_SCAN_WORKERS', 8))
+    VT_REPORT_MAX_AGE = int(os.getenv('VT_REPORT_MAX_AGE', 259200))  # Rescan reports older than 3 days
+    
+    # VirusTotal request budget per process (public API: 4/min, 500/day; 0 = unlimited)
+    VT_RATE_PER_MINUTE = float(os.getenv('VT_RATE_PER_MINUTE', 4))
+    VT_RATE_BURST = int(os.getenv('VT_RATE_BURST', 4))
+    VT_DAILY_QUOTA = int(os.getenv('VT_DAILY_QUOTA', 500))
+    VT_QUEUE_TIMEOUT_INTERACTIVE = float(os.getenv('VT_QUEUE_TIMEOUT_INTERACTIVE', 3))  # Then PENDING
+    VT_QUEUE_TIMEOUT_BULK = float(os.getenv('VT_QUEUE_TIMEOUT_BULK', 120))
+    
+    # VirusTotal verdict store (empty path disables it)
+    VT_VERDICT_STORE_PATH = os.getenv('VT_VERDICT_STORE_PATH', 'cache/vt_verdicts.sqlite3')
+    VT_HARMFUL_TTL = int(os.getenv('VT_HARMFUL_TTL', 86400))
+    VT_SAFE_TTL = int(os.getenv('VT_SAFE_TTL', 21600))
+    VT_ERROR_TTL = int(os.getenv('VT_ERROR_TTL', 120))
+    VT_PENDING_TTL = int(os.getenv('VT_PENDING_TTL', 600))  # Submitted analyses polled on retry
+    
+    # URL extraction (comma-separated domain lists; subdomains match too)
+    URL_SKIP_DOMAINS = os.getenv('URL_SKIP_DOMAINS', 'example.com,example.net,example.org,test.com')
+    URL_ALLOW_DOMAINS = os.getenv('URL_ALLOW_DOMAINS', '')  # Trusted - never sent to VirusTotal
+    URL_EXTRA_TLDS = os.getenv('URL_EXTRA_TLDS', '')  # Accepted on top of the built-in TLD table
+    
+    # Local reputation lists (comma-separated file paths) checked before VirusTotal
+    REPUTATION_BLOCKLISTS = os.getenv('REPUTATION_BLOCKLISTS', '')
+    REPUTATION_ALLOWLISTS = os.getenv('REPUTATION_ALLOWLISTS', '')
+    REPUTATION_INDEX_DIR = os.getenv('REPUTATION_INDEX_DIR', 'cache/reputation')
+    REPUTATION_RELOAD_INTERVAL = float(os.getenv('REPUTATION_RELOAD_INTERVAL', 30))  # 0 disables hot reload
     
     # Model settings
     MODEL_PATH = os.getenv('MODEL_PATH', 'distilbert-smishing-final')
     MIN_WORD_LENGTH = int(os.getenv('MIN_WORD_LENGTH', 3))
     
+    # Batched inference settings
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'torch')  # torch, torch-int8, onnx, onnx-int8, torch-early-exit
+    INFERENCE_BATCH_SIZE = int(os.getenv('INFERENCE_BATCH_SIZE', 64))
+    INFERENCE_LENGTH_BUCKET = int(os.getenv('INFERENCE_LENGTH_BUCKET', 16))
+    
+    # Token budget: longer texts are scored in overlapping windows, combined with 'max' or 'mean'
+    INFERENCE_MAX_TOKENS = int(os.getenv('INFERENCE_MAX_TOKENS', 128))  # Per window, special tokens included (model limit 512)
+    INFERENCE_WINDOW_OVERLAP = int(os.getenv('INFERENCE_WINDOW_OVERLAP', 32))
+    INFERENCE_MAX_WINDOWS = int(os.getenv('INFERENCE_MAX_WINDOWS', 8))
+    INFERENCE_WINDOW_AGGREGATION = os.getenv('INFERENCE_WINDOW_AGGREGATION', 'max')
+    
+    # Early exit (INFERENCE_BACKEND=torch-early-exit): stop at the first confident layer head
+    EARLY_EXIT_THRESHOLD = float(os.getenv('EARLY_EXIT_THRESHOLD', 0.95))  # Calibrated head probability
+    EARLY_EXIT_MIN_LAYER = int(os.getenv('EARLY_EXIT_MIN_LAYER', 2))  # First layer allowed to exit
+    EARLY_EXIT_CALIBRATION_CSV = os.getenv('EARLY_EXIT_CALIBRATION_CSV', os.path.join('DistilBERT Model Implementation', 'prep_out', 'val.csv'))
+    
+    # Cascade: a hashed n-gram model decides confident messages before DistilBERT
+    CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'False').lower() == 'true'
+    CASCADE_MODEL_PATH = os.getenv('CASCADE_MODEL_PATH', 'cache/cascade_lexical.npz')  # Built by python cascade.py --train
+    CASCADE_TRAIN_CSV = os.getenv('CASCADE_TRAIN_CSV', os.path.join('DistilBERT Model Implementation', 'prep_out', 'train.csv'))
+    CASCADE_VALIDATION_CSV = os.getenv('CASCADE_VALIDATION_CSV', os.path.join('DistilBERT Model Implementation', 'prep_out', 'val.csv'))
+    CASCADE_TARGET_ACCURACY = float(os.getenv('CASCADE_TARGET_ACCURACY', 0.995))  # Sets the band when training
+    CASCADE_LOW = float(os.getenv('CASCADE_LOW')) if os.getenv('CASCADE_LOW') else None  # Override the fitted band
+    CASCADE_HIGH = float(os.getenv('CASCADE_HIGH')) if os.getenv('CASCADE_HIGH') else None
+    
+    # Cross-request micro-batching
+    MICRO_BATCHING = os.getenv('MICRO_BATCHING', 'True').lower() == 'true'
+    MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', 32))
+    MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', 5))
+    
+    # Explainer: 'lime', or a single-pass 'occlusion' / 'gradient'
+    EXPLAINER = os.getenv('EXPLAINER', 'lime')
+    
     # LIME settings
     LIME_NUM_FEATURES = int(os.getenv('LIME_NUM_FEATURES', 10))
     LIME_NUM_SAMPLES = int(os.getenv('LIME_NUM_SAMPLES', 500))
+    
+    # Adaptive LIME: sample in rounds until the top features converge
+    LIME_ADAPTIVE = os.getenv('LIME_ADAPTIVE', 'False').lower() == 'true'
+    LIME_ROUND_SIZE = int(os.getenv('LIME_ROUND_SIZE', 25))
+    LIME_BUDGET_MS = float(os.getenv('LIME_BUDGET_MS', 1500))
+    LIME_CONVERGENCE_TOP_K = int(os.getenv('LIME_CONVERGENCE_TOP_K', 5))
+    LIME_CONVERGENCE_TOL = float(os.getenv('LIME_CONVERGENCE_TOL', 0.1))
+
+    # Analysis result cache ('memory', 'sqlite' or 'none')
+    RESULT_CACHE_BACKEND = os.getenv('RESULT_CACHE_BACKEND', 'memory')
+    RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', 3600))
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 10000))
+    RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', 'cache/analysis_cache.sqlite3')
+
+    # Near-duplicate index: campaign variants reuse a recent verdict (per process)
+    NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', 'True').lower() == 'true'
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', 0.8))  # Estimated Jaccard similarity
+    NEAR_DUPLICATE_TTL = int(os.getenv('NEAR_DUPLICATE_TTL', 3600))
+    NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv('NEAR_DUPLICATE_MAX_ENTRIES', 20000))
+    NEAR_DUPLICATE_NUM_PERM = int(os.getenv('NEAR_DUPLICATE_NUM_PERM', 64))
+    NEAR_DUPLICATE_BANDS = int(os.getenv('NEAR_DUPLICATE_BANDS', 16))
+
+    # Translation engine: remote 'google' or local 'marian' (offline)
+    TRANSLATION_ENGINE = os.getenv('TRANSLATION_ENGINE', 'google')
+    TRANSLATION_MODEL_PATH = os.getenv('TRANSLATION_MODEL_PATH', 'Helsinki-NLP/opus-mt-ar-en')
+    TRANSLATION_MAX_LENGTH = int(os.getenv('TRANSLATION_MAX_LENGTH', 256))
+    TRANSLATION_BATCH_SIZE = int(os.getenv('TRANSLATION_BATCH_SIZE', 16))
+    TRANSLATION_NUM_BEAMS = int(os.getenv('TRANSLATION_NUM_BEAMS', 1))
+
+    # Translation cache ('memory', 'sqlite' or 'none')
+    TRANSLATION_CACHE_BACKEND = os.getenv('TRANSLATION_CACHE_BACKEND', 'sqlite')
+    TRANSLATION_CACHE_TTL = int(os.getenv('TRANSLATION_CACHE_TTL', 604800))
+    TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', 50000))
+    TRANSLATION_CACHE_PATH = os.getenv('TRANSLATION_CACHE_PATH', 'cache/translations.sqlite3')
+
+    # Background analysis jobs (/analyze/jobs)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+    JOB_TTL = int(os.getenv('JOB_TTL', 300))
+
+    # Bulk analysis (/analyze/batch)
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 10000))
+    BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 64))
 
     # SMS message limits 
     MIN_MESSAGE_LENGTH = 5           # Minimum characters
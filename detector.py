@@ -2,40 +2,184 @@
 Smishing Detection Module
 ML-based smishing detection with LIME explainability
 """
+import logging
+import time
 import numpy as np
-from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
-from lime.lime_text import LimeTextExplainer
+import torch
+from sklearn.metrics.pairwise import pairwise_distances
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from lime.lime_text import IndexedString, LimeTextExplainer
+from cascade import LEXICAL_FALLBACK_USED, LEXICAL_MODEL_USED, create_cascade
 from config import Config
+from inference_scheduler import InferenceScheduler
+from inference_backends import TorchBackend, create_backend
+from explainers import create_explainer
+from telemetry import CASCADE_DECISIONS, MODEL_BATCH_SIZE, span
+
+logger = logging.getLogger(__name__)
+
+
+# Representative messages of increasing length, so warmup touches several
+# padded batch shapes and both classes
+WARMUP_MESSAGES = [
+    "Hey, are we still on for lunch tomorrow?",
+    "Your package could not be delivered. Confirm your address at http://parcel-track.example.com",
+    "URGENT: Your bank account has been suspended due to unusual activity. "
+    "Verify your identity within 24 hours at http://secure-bank-update.example.com/verify "
+    "or your card will be permanently blocked. Reply STOP to opt out.",
+]
+
+
+# How per-window smishing probabilities of a long message combine
+WINDOW_AGGREGATIONS = {
+    'max': np.max,
+    'mean': np.mean,
+}
+
+
+# Models loaded by preload(), shared by every detector in this process and,
+# after fork, by every worker process (see serve.py)
+PRELOADED = {}
+
+
+def preload(model_path=None, backend=None):
+    """
+    Load model weights once so detectors built later reuse them
+    
+    Call in the parent before forking workers: the weights are never
+    written during inference, so copy-on-write keeps one physical copy.
+    Only torch backends are built here; ONNX Runtime sessions own thread
+    pools that do not survive fork, so those are built per worker.
+    
+    Args:
+        model_path: Model directory (default: Config.MODEL_PATH)
+        backend: Inference backend to prebuild (default: Config.INFERENCE_BACKEND)
+    """
+    model_path = model_path or Config.MODEL_PATH
+    backend = backend or Config.INFERENCE_BACKEND
+    
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    shared = {
+        'model': model,
+        'tokenizer': AutoTokenizer.from_pretrained(model_path)
+    }
+    if backend.startswith('torch'):
+        try:
+            shared['engine'] = create_backend(backend, model, model_path)
+        except Exception as e:
+            logger.warning("Could not prebuild '%s' backend (%s)", backend, e)
+    PRELOADED[model_path] = shared
+    return shared
+
+
+def token_windows(tokenizer, ids, max_tokens, overlap, max_windows):
+    """
+    Split token ids into model inputs of at most max_tokens tokens
+    
+    A text within the budget is a single window. A longer one gets evenly
+    spaced windows overlapping by at least overlap tokens, the first at the
+    start and the last at the end. At most max_windows are used; past that
+    they are spread over the text with gaps, which keeps the worst-case cost
+    of one text bounded.
+    
+    Args:
+        tokenizer: Tokenizer that adds the special tokens
+        ids: Token ids without special tokens
+        max_tokens: Window length, special tokens included
+        overlap: Minimum tokens shared by neighbouring windows
+        max_windows: Most windows per text
+    
+    Returns:
+        list: Token id lists with special tokens added
+    """
+    budget = max_tokens - tokenizer.num_special_tokens_to_add()
+    return [
+        tokenizer.build_inputs_with_special_tokens(ids[start:end])
+        for start, end in window_spans(len(ids), budget, overlap, max_windows)
+    ]
+
+
+def window_spans(length, budget, overlap, max_windows):
+    """
+    Token ranges of the windows token_windows builds
+    
+    Returns:
+        list: (start, end) pairs into the ids without special tokens
+    """
+    if length <= budget:
+        return [(0, length)]
+    
+    step = max(1, budget - overlap)
+    count = min(max_windows, -(-(length - budget) // step) + 1)
+    starts = np.linspace(0, length - budget, count).round().astype(int)
+    return [(int(start), int(start) + budget) for start in starts]
 
 
 class SmishingDetector:
     """ML-based smishing detector with explainability"""
     
-    def __init__(self, model_path=None, min_word_length=None):
+    def __init__(self, model_path=None, min_word_length=None, backend=None, explainer=None):
         """Initialize smishing detector"""
         self.model_path = model_path or Config.MODEL_PATH
+        self.backend_name = backend or Config.INFERENCE_BACKEND
+        self.explainer_name = explainer or Config.EXPLAINER
+        self.explainer = None
         self.MIN_WORD_LENGTH = min_word_length or Config.MIN_WORD_LENGTH
+        self.batch_size = Config.INFERENCE_BATCH_SIZE
+        self.length_bucket = Config.INFERENCE_LENGTH_BUCKET
+        self.window_overlap = Config.INFERENCE_WINDOW_OVERLAP
+        self.max_windows = Config.INFERENCE_MAX_WINDOWS
+        self.window_aggregation = Config.INFERENCE_WINDOW_AGGREGATION
+        if self.window_aggregation not in WINDOW_AGGREGATIONS:
+            logger.warning("Unknown window aggregation '%s' - using max", self.window_aggregation)
+            self.window_aggregation = 'max'
+        self.scheduler = None
         self.model_loaded = False
+        self.cascade = create_cascade()
         
         try:
-            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            self.classifier = pipeline(
-                "text-classification",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device=-1
-            )
+            shared = PRELOADED.get(self.model_path, {})
+            if shared:
+                self.model = shared['model']
+                self.tokenizer = shared['tokenizer']
+            else:
+                self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            self.model.eval()
+            self.smishing_index = self._find_smishing_index()
+            self.max_tokens = min(Config.INFERENCE_MAX_TOKENS, self.tokenizer.model_max_length)
+            
+            try:
+                engine = shared.get('engine')
+                if engine is None or engine.name != self.backend_name:
+                    engine = create_backend(self.backend_name, self.model, self.model_path)
+                self.engine = engine
+            except Exception as e:
+                logger.warning("Could not load '%s' backend (%s) - using torch", self.backend_name, e)
+                self.engine = TorchBackend(self.model, self.model_path)
             self.lime_explainer = LimeTextExplainer(
                 class_names=['ham', 'smishing'],
                 split_expression=r'\W+',
                 bow=False
             )
-            print("Fine-tuned DistilBERT model loaded successfully!")
+            try:
+                self.explainer = create_explainer(self.explainer_name, self)
+            except Exception as e:
+                logger.warning("Could not load '%s' explainer (%s) - using LIME", self.explainer_name, e)
+                self.explainer_name = 'lime'
+            logger.info("Fine-tuned DistilBERT model loaded", extra={'model_path': self.model_path, 'backend': self.engine.name})
             self.model_loaded = True
+            
+            # All scoring goes through one micro-batching worker thread
+            if Config.MICRO_BATCHING:
+                self.scheduler = InferenceScheduler(
+                    self._score_rows,
+                    max_batch_size=Config.MICRO_BATCH_MAX_SIZE,
+                    max_wait_ms=Config.MICRO_BATCH_MAX_WAIT_MS
+                )
         except Exception as e:
-            print(f"Error loading model: {e}")
-            self.classifier = None
+            logger.error("Error loading model: %s", e)
     
     def categorize_confidence(self, confidence):
         """Categorize confidence level"""
@@ -48,33 +192,128 @@ class SmishingDetector:
         else:
             return "LOW"
     
+    def _find_smishing_index(self):
+        """Find the logit column of the smishing class from the model's id2label"""
+        for index, label in self.model.config.id2label.items():
+            if str(label).lower() in ['smish', 'smishing', '1', 'label_1']:
+                return int(index)
+        return 1
+    
+    def predict_proba_batch(self, texts):
+        """
+        Score many texts with batched forward passes
+        
+        Texts longer than the token budget are split into overlapping
+        windows (see _windows). Windows are sorted by token length and padded
+        per batch to a multiple of the length bucket, so short perturbations
+        never pay for long ones. Logits come from the configured inference
+        backend; window probabilities are combined per text with
+        INFERENCE_WINDOW_AGGREGATION.
+        
+        Returns:
+            np.ndarray: (n, 2) array of [ham_prob, smishing_prob] rows
+        """
+        return self._score_rows(texts)[:, :2]
+    
+    def _score_rows(self, texts):
+        """
+        Returns:
+            np.ndarray: (n, 3) array of [ham_prob, smishing_prob, exit_layer] rows;
+                        exit_layer is the transformer layer that decided (the
+                        last one unless the backend exits early)
+        """
+        texts = [str(text) for text in texts]
+        probs = np.full((len(texts), 3), 0.5)
+        probs[:, 2] = self.model.config.num_hidden_layers
+        if not texts:
+            return probs
+        early_exit = hasattr(self.engine, 'logits_with_exits')
+        
+        # Without special tokens or truncation; _windows adds both per window
+        encodings = self.tokenizer(texts, add_special_tokens=False, padding=False, verbose=False)
+        windows, owners = [], []
+        for index, ids in enumerate(encodings['input_ids']):
+            for window in self._windows(ids):
+                windows.append(window)
+                owners.append(index)
+        owners = np.array(owners)
+        
+        window_probs = np.empty(len(windows))
+        window_layers = np.empty(len(windows))
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+        for start in range(0, len(order), self.batch_size):
+            batch_index = order[start:start + self.batch_size]
+            batch = self._pad_batch([windows[i] for i in batch_index])
+            MODEL_BATCH_SIZE.observe(len(batch_index))
+            if early_exit:
+                logits, exit_layers = self.engine.logits_with_exits(**batch)
+                window_layers[batch_index] = exit_layers
+            else:
+                logits = self.engine.logits(**batch)
+                window_layers[batch_index] = probs[0, 2]
+            exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+            scores = exp / exp.sum(axis=1, keepdims=True)
+            window_probs[batch_index] = scores[:, self.smishing_index]
+        
+        if len(windows) == len(texts):
+            smishing_prob, probs[:, 2] = window_probs, window_layers
+        else:
+            aggregate = WINDOW_AGGREGATIONS[self.window_aggregation]
+            smishing_prob = np.array([aggregate(window_probs[owners == index]) for index in range(len(texts))])
+            probs[:, 2] = [window_layers[owners == index].max() for index in range(len(texts))]
+        probs[:, 0] = 1 - smishing_prob
+        probs[:, 1] = smishing_prob
+        
+        return probs
+    
+    def _windows(self, ids):
+        """Split token ids into model inputs (see token_windows)"""
+        return token_windows(self.tokenizer, ids, self.max_tokens, self.window_overlap, self.max_windows)
+    
+    def _pad_batch(self, sequences):
+        """Pad token id sequences up to the next length bucket"""
+        longest = max(len(ids) for ids in sequences)
+        length = -(-longest // self.length_bucket) * self.length_bucket
+        length = min(length, self.tokenizer.model_max_length)
+        
+        input_ids = torch.full((len(sequences), length), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), length), dtype=torch.long)
+        for row, ids in enumerate(sequences):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+        
+        return {'input_ids': input_ids, 'attention_mask': attention_mask}
+    
+    def score(self, texts, priority=InferenceScheduler.INTERACTIVE, exit_layers=False):
+        """
+        Class probabilities for texts, via the micro-batching scheduler when enabled
+        
+        Args:
+            texts: List of texts
+            priority: InferenceScheduler.INTERACTIVE or InferenceScheduler.BULK
+            exit_layers: Also return the layer each text exited at
+        
+        Returns:
+            np.ndarray: (n, 2) probabilities, or (probabilities, exit layers)
+        """
+        if self.scheduler is not None:
+            rows = self.scheduler.predict_proba(texts, priority)
+        else:
+            rows = self._score_rows(texts)
+        if exit_layers:
+            return rows[:, :2], rows[:, 2].astype(int)
+        return rows[:, :2]
+    
     def predict_proba_for_lime(self, texts):
         """Prediction function for LIME"""
         if not self.model_loaded:
             return np.array([[0.5, 0.5]] * len(texts))
         
-        results = []
-        for text in texts:
-            try:
-                output = self.classifier(text)[0]
-                label = output['label']
-                confidence = output['score']
-                
-                # Map to probabilities
-                if label.lower() in ['smish', 'smishing', '1', 'label_1']:
-                    ham_prob = 1 - confidence
-                    smishing_prob = confidence
-                else:
-                    ham_prob = confidence
-                    smishing_prob = 1 - confidence
-                
-                results.append([ham_prob, smishing_prob])
-                
-            except Exception as e:
-                print(f"Error in LIME prediction: {e}")
-                results.append([0.5, 0.5])
-        
-        return np.array(results)
+        try:
+            return self.score(texts, InferenceScheduler.BULK)
+        except Exception as e:
+            logger.error("Error in LIME prediction: %s", e)
+            return np.array([[0.5, 0.5]] * len(texts))
     
     def get_lime_explanation(self, text, final_prediction, num_features=None):
         """Generate LIME explanation"""
@@ -83,13 +322,21 @@ class SmishingDetector:
         
         # Check if text is too long for LIME processing
         if len(text) > Config.MAX_MESSAGE_LENGTH:
-            print(f"Text too long for LIME ({len(text)} chars). Skipping explanation.")
+            logger.info("Text too long for LIME (%d chars) - skipping explanation", len(text))
             return {'explanation_available': False, 'error': 'Text too long for explanation'}
         
         num_features = num_features or Config.LIME_NUM_FEATURES
         
         try:
-            print(f"Generating LIME explanation for: {final_prediction.upper()}")
+            
+            # Map prediction to class index
+            predicted_class_index = 1 if final_prediction.lower() == 'smishing' else 0
+            
+            if Config.LIME_ADAPTIVE:
+                explanation, sampling = self._adaptive_lime(text, predicted_class_index, num_features)
+                result = self._format_explanation(explanation, final_prediction, 'lime')
+                result.update(sampling)
+                return result
                 
             # Generate explanation for both classes
             exp = self.lime_explainer.explain_instance(
@@ -100,52 +347,157 @@ class SmishingDetector:
                 labels=(0, 1)  # Force explanation for both classes
             )
             
-            # Map prediction to class index
-            predicted_class_index = 1 if final_prediction.lower() == 'smishing' else 0
-            
             # Verify class exists
             available_classes = list(exp.local_exp.keys())
             
             if predicted_class_index not in exp.local_exp:
-                print(f"Warning: Class {predicted_class_index} not found")
+                logger.warning("Class %d not found in LIME explanation", predicted_class_index)
                 if len(available_classes) > 0:
                     predicted_class_index = available_classes[0]
                 else:
                     raise ValueError("No labels available in LIME explanation")
             
-            class_name = 'SMISHING' if predicted_class_index == 1 else 'HAM'
-            print(f"Explaining class {predicted_class_index} ({class_name})")
-            
             # Extract explanation
             explanation = exp.as_list(label=predicted_class_index)
+            return self._format_explanation(explanation, final_prediction, 'lime')
             
-            # Store positive weights only
-            predicted_weights = {}
-            for feature, weight in explanation:
-                cleaned_feature = feature.strip('<>=').lower()
-                
-                if len(cleaned_feature) < self.MIN_WORD_LENGTH:
-                    continue
-                
-                if weight > 0:
-                    predicted_weights[cleaned_feature] = float(weight)
+        except Exception as e:
+            logger.error("LIME error: %s", e)
+            return {'explanation_available': False, 'error': str(e)}
+    
+    def _adaptive_lime(self, text, class_index, num_features):
+        """
+        LIME with perturbations drawn in rounds
+        
+        Stops once the top-k features and their ranking are unchanged between
+        rounds and the weights moved less than LIME_CONVERGENCE_TOL, when the
+        LIME_BUDGET_MS latency budget is spent, or at LIME_NUM_SAMPLES.
+        
+        Returns:
+            tuple: ((word, weight) pairs, sampling report dict)
+        """
+        started = time.perf_counter()
+        explainer = self.lime_explainer
+        indexed_string = IndexedString(
+            text,
+            bow=explainer.bow,
+            split_expression=explainer.split_expression,
+            mask_string=explainer.mask_string
+        )
+        doc_size = indexed_string.num_words()
+        if doc_size == 0:
+            raise ValueError("No words to explain")
+        
+        top_k = min(Config.LIME_CONVERGENCE_TOP_K, num_features, doc_size)
+        rows = [np.ones(doc_size)]
+        texts = [indexed_string.raw_string()]
+        labels = np.empty((0, 2))
+        previous = None
+        stop_reason = 'max_samples'
+        
+        round_size = Config.LIME_ROUND_SIZE
+        while True:
+            round_started = time.perf_counter()
+            for size in explainer.random_state.randint(1, doc_size + 1, round_size):
+                inactive = explainer.random_state.choice(range(doc_size), size, replace=False)
+                row = np.ones(doc_size)
+                row[inactive] = 0
+                rows.append(row)
+                texts.append(indexed_string.inverse_removing(inactive))
+            
+            labels = np.vstack([labels, self.predict_proba_for_lime(texts[len(labels):])])
+            data = np.array(rows)
+            distances = pairwise_distances(data, data[:1], metric='cosine').ravel() * 100
+            _, local_exp, _, _ = explainer.base.explain_instance_with_data(
+                data, labels, distances, class_index, num_features,
+                feature_selection=explainer.feature_selection
+            )
             
-            max_weight = max(predicted_weights.values()) if predicted_weights else 1
+            current = dict(local_exp[:top_k])
+            if previous is not None and list(current) == list(previous):
+                drift = max(abs(current[f] - previous[f]) for f in current)
+                scale = max(abs(w) for w in current.values()) or 1
+                if drift / scale <= Config.LIME_CONVERGENCE_TOL:
+                    stop_reason = 'converged'
+                    break
+            previous = current
             
-            print(f"Extracted {len(predicted_weights)} words (max: {max_weight:.4f})")
-
-            return {
-                'predicted_class': final_prediction,
-                'predicted_weights': predicted_weights,
-                'max_weight': max_weight,
-                'explanation_available': True,
-                'min_word_length': self.MIN_WORD_LENGTH
-            }
+            if len(rows) >= Config.LIME_NUM_SAMPLES:
+                break
             
+            # Size the next round to what the remaining budget can afford
+            sample_ms = 1000 * (time.perf_counter() - round_started) / round_size
+            remaining_ms = Config.LIME_BUDGET_MS - 1000 * (time.perf_counter() - started)
+            round_size = min(Config.LIME_ROUND_SIZE, Config.LIME_NUM_SAMPLES - len(rows), int(remaining_ms / sample_ms))
+            if round_size < 1:
+                stop_reason = 'budget'
+                break
+        
+        explanation = [(indexed_string.word(feature), weight) for feature, weight in local_exp]
+        sampling = {
+            'samples_used': len(rows),
+            'converged': stop_reason == 'converged',
+            'stop_reason': stop_reason,
+            'elapsed_ms': round(1000 * (time.perf_counter() - started), 1)
+        }
+        logger.debug("Adaptive LIME", extra=sampling)
+        return explanation, sampling
+    
+    def get_explanation(self, text, final_prediction, num_features=None, explainer=None):
+        """
+        Explain a prediction with the configured explainer
+        
+        LIME is used when no fast explainer is configured; otherwise a
+        single-pass explainer from explainers.py produces the same shape.
+        """
+        with span('explanation'):
+            return self._get_explanation(text, final_prediction, num_features, explainer)
+    
+    def _get_explanation(self, text, final_prediction, num_features, explainer):
+        explainer = explainer or self.explainer
+        if explainer is None:
+            return self.get_lime_explanation(text, final_prediction, num_features)
+        
+        if not self.model_loaded:
+            return None
+        
+        if len(text) > Config.MAX_MESSAGE_LENGTH:
+            return {'explanation_available': False, 'error': 'Text too long for explanation'}
+        
+        num_features = num_features or Config.LIME_NUM_FEATURES
+        predicted_class_index = 1 if final_prediction.lower() == 'smishing' else 0
+        
+        try:
+            explanation = explainer.explain(text, predicted_class_index, num_features)
+            return self._format_explanation(explanation, final_prediction, explainer.name)
         except Exception as e:
-            print(f"LIME error: {e}")
+            logger.error("%s explainer error: %s", explainer.name, e)
             return {'explanation_available': False, 'error': str(e)}
     
+    def _format_explanation(self, explanation, final_prediction, method):
+        """Keep positive word weights above the minimum length in the shape the UI renders"""
+        # Store positive weights only
+        predicted_weights = {}
+        for feature, weight in explanation:
+            cleaned_feature = feature.strip('<>=').lower()
+            
+            if len(cleaned_feature) < self.MIN_WORD_LENGTH:
+                continue
+            
+            if weight > 0:
+                predicted_weights[cleaned_feature] = float(weight)
+        
+        max_weight = max(predicted_weights.values()) if predicted_weights else 1
+
+        return {
+            'predicted_class': final_prediction,
+            'predicted_weights': predicted_weights,
+            'max_weight': max_weight,
+            'explanation_available': True,
+            'min_word_length': self.MIN_WORD_LENGTH,
+            'explainer': method
+        }
+    
     def check_harmful_urls(self, url_scan_results):
         """Check if any URLs are flagged as harmful"""
         if not url_scan_results:
@@ -158,15 +510,23 @@ class SmishingDetector:
         
         return len(harmful_urls) > 0, harmful_urls
     
-    def predict(self, text, include_lime=True, url_scan_results=None):
-        """Main prediction method with URL priority"""
+    def predict(self, text, include_lime=True, url_scan_results=None, model_result=None):
+        """
+        Main prediction method with URL priority
+        
+        Args:
+            text: Message text (translated to English if needed)
+            include_lime: Add a LIME explanation
+            url_scan_results: VirusTotal results for the message URLs
+            model_result: Precomputed classify() output, e.g. run while
+                          URL scans were in flight
+        """
         
         # PRIORITY CHECK: Harmful URLs override everything
         has_harmful_urls, harmful_url_list = self.check_harmful_urls(url_scan_results)
         
         if has_harmful_urls:
-            print(f"⚠️  HARMFUL URL DETECTED - Overriding model prediction")
-            print(f"   Found {len(harmful_url_list)} harmful URL(s)")
+            logger.info("Harmful URL detected - overriding model prediction", extra={'harmful_urls': len(harmful_url_list)})
             
             # Calculate confidence based on threat severity
             total_malicious = sum(url.get('malicious_count', 0) for url in harmful_url_list)
@@ -198,60 +558,181 @@ class SmishingDetector:
             }
             
             # Still provide LIME if requested (for the text content)
-            if include_lime and self.model_loaded:
-                lime_result = self.get_lime_explanation(text, 'smishing')
-                if lime_result and lime_result.get('explanation_available'):
-                    response['lime_explanation'] = lime_result
+            if include_lime:
+                self.add_lime_explanation(text, response)
             
             return response
         
-        # No harmful URLs - proceed with normal model prediction
+        # No harmful URLs - use the model prediction
+        response = dict(model_result) if model_result is not None else self.classify(text)
+        
+        # Add LIME explanation
+        if include_lime:
+            self.add_lime_explanation(text, response)
+        
+        return response
+    
+    def add_lime_explanation(self, text, response):
+        """
+        Attach a LIME (or configured fast explainer) explanation of the response's prediction
+        
+        Lexical cascade verdicts are explained by the lexical model itself.
+        Skipped when the model is unavailable and the rule-based fallback decided.
+        
+        Returns:
+            dict: The LIME result, or None if no explanation was added
+        """
+        if response['model_used'].startswith('Lexical') and self.cascade is not None:
+            lime_result = self.get_lexical_explanation(text, response['prediction'])
+        elif not self.model_loaded or response['model_used'].startswith('Rule-based Fallback'):
+            return None
+        else:
+            lime_result = self.get_explanation(text, response['prediction'])
+        if lime_result and lime_result.get('explanation_available'):
+            response['lime_explanation'] = lime_result
+            return lime_result
+        return None
+    
+    def classify(self, text):
+        """
+        Model-only prediction, independent of URL scan results
+        
+        Safe to run while URL scans are still in flight; predict() merges
+        the URL override on top of it.
+        """
+        return self.classify_batch([text], InferenceScheduler.INTERACTIVE)[0]
+    
+    def classify_batch(self, texts, priority=InferenceScheduler.BULK):
+        """
+        Model-only predictions for many texts
+        
+        The lexical cascade decides texts outside its uncertain band; the
+        rest are scored by the transformer in padded batches.
+        
+        Returns:
+            list: One classify() response dict per text
+        """
+        if self.cascade is None:
+            return self._transformer_batch(texts, priority)
+        
+        with span('lexical'):
+            lexical_probs = self.cascade.predict_proba(texts)
+        confident = self.cascade.is_confident(lexical_probs)
+        responses = [
+            self._lexical_response(prob, LEXICAL_MODEL_USED) if decided else None
+            for prob, decided in zip(lexical_probs, confident)
+        ]
+        CASCADE_DECISIONS.labels('lexical').inc(int(confident.sum()))
+        
+        remaining = np.flatnonzero(~confident)
+        if len(remaining):
+            CASCADE_DECISIONS.labels('transformer').inc(len(remaining))
+            for index, response in zip(remaining, self._transformer_batch([texts[i] for i in remaining], priority)):
+                responses[index] = response
+        return responses
+    
+    def _transformer_batch(self, texts, priority):
+        """DistilBERT responses for texts (fallback responses if it is unavailable)"""
         if not self.model_loaded:
-            return self.fallback_predict(text, url_scan_results)
+            return [self.fallback_predict(text) for text in texts]
         
         try:
-            # Get model prediction
-            result = self.classifier(text)[0]
-            label = result['label']
-            confidence = result['score']
-            
-            # Determine prediction class
-            if label.lower() in ['smish', 'smishing', '1', 'label_1']:
-                prediction = 'smishing'
-                smishing_prob = confidence
-                ham_prob = 1 - confidence
-            else:
-                prediction = 'ham'
-                ham_prob = confidence
-                smishing_prob = 1 - confidence
-            
-            confidence_level = self.categorize_confidence(confidence)
-            
-            # Build response
-            response = {
-                'prediction': prediction,
-                'confidence': float(confidence),
-                'confidence_level': confidence_level,
-                'probabilities': {
-                    'ham': float(ham_prob),
-                    'smishing': float(smishing_prob)
-                },
-                'model_label': label,
-                'model_used': 'Fine-tuned DistilBERT',
-                'url_override': False
-            }
-            
-            # Add LIME explanation
-            if include_lime:
-                lime_result = self.get_lime_explanation(text, prediction)
-                if lime_result and lime_result.get('explanation_available'):
-                    response['lime_explanation'] = lime_result
-            
-            return response
-            
+            with span('model'):
+                probs, exit_layers = self.score(texts, priority, exit_layers=True)
         except Exception as e:
-            print(f"Prediction error: {e}")
-            return self.fallback_predict(text, url_scan_results)
+            logger.error("Prediction error: %s", e)
+            return [self.fallback_predict(text) for text in texts]
+        
+        return [
+            self._model_response(ham_prob, smishing_prob, exit_layer)
+            for (ham_prob, smishing_prob), exit_layer in zip(probs, exit_layers)
+        ]
+    
+    def warmup(self, messages=None):
+        """
+        Run representative messages through the classifier and explainer
+        
+        The first forward pass pays for torch's one-time kernel and allocator
+        setup; doing it at startup keeps that off the first user request.
+        
+        Returns:
+            dict: Seconds spent warming each stage
+        """
+        if not self.model_loaded:
+            return {}
+        
+        messages = messages or WARMUP_MESSAGES
+        timings = {}
+        
+        started = time.perf_counter()
+        result = self.classify_batch(messages)[0]
+        timings['classifier'] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        self.get_explanation(messages[0], result['prediction'])
+        timings['explainer'] = time.perf_counter() - started
+        
+        return timings
+    
+    def _model_response(self, ham_prob, smishing_prob, exit_layer=None):
+        """Build the model response dict from class probabilities"""
+        id2label = self.model.config.id2label
+        
+        # Determine prediction class
+        if smishing_prob > ham_prob:
+            prediction = 'smishing'
+            confidence = smishing_prob
+            label = id2label[self.smishing_index]
+        else:
+            prediction = 'ham'
+            confidence = ham_prob
+            label = id2label[1 - self.smishing_index]
+        
+        response = {
+            'prediction': prediction,
+            'confidence': float(confidence),
+            'confidence_level': self.categorize_confidence(confidence),
+            'probabilities': {
+                'ham': float(ham_prob),
+                'smishing': float(smishing_prob)
+            },
+            'model_label': label,
+            'model_used': 'Fine-tuned DistilBERT',
+            'inference_backend': self.engine.name,
+            'url_override': False
+        }
+        if exit_layer is not None and hasattr(self.engine, 'logits_with_exits'):
+            response['exit_layer'] = int(exit_layer)
+        return response
+    
+    def _lexical_response(self, smishing_prob, model_used):
+        """Build a response dict from the lexical model's smishing probability"""
+        smishing_prob = float(smishing_prob)
+        prediction = 'smishing' if smishing_prob >= 0.5 else 'ham'
+        confidence = smishing_prob if prediction == 'smishing' else 1 - smishing_prob
+        return {
+            'prediction': prediction,
+            'confidence': confidence,
+            'confidence_level': self.categorize_confidence(confidence),
+            'probabilities': {
+                'ham': 1 - smishing_prob,
+                'smishing': smishing_prob
+            },
+            'model_used': model_used,
+            'url_override': False
+        }
+    
+    def get_lexical_explanation(self, text, final_prediction, num_features=None):
+        """Explain a lexical cascade verdict by word occlusion on the lexical model"""
+        num_features = num_features or Config.LIME_NUM_FEATURES
+        predicted_class_index = 1 if final_prediction.lower() == 'smishing' else 0
+        try:
+            with span('explanation'):
+                explanation = self.cascade.explain(text, predicted_class_index, num_features)
+            return self._format_explanation(explanation, final_prediction, self.cascade.name)
+        except Exception as e:
+            logger.error("Lexical explanation error: %s", e)
+            return {'explanation_available': False, 'error': str(e)}
     
     def fallback_predict(self, text, url_scan_results=None):
         """Fallback prediction when model unavailable"""
@@ -262,6 +743,8 @@ class SmishingDetector:
             prediction = 'smishing'
             confidence = 0.85
             model_used = 'Rule-based Fallback (Harmful URL Detected)'
+        elif self.cascade is not None:
+            return self._lexical_response(self.cascade.predict_proba([text])[0], LEXICAL_FALLBACK_USED)
         else:
             text_lower = text.lower()
             suspicious_keywords = ['urgent', 'verify', 'suspended', 'click', 'confirm', 'immediately']
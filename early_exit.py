@@ -0,0 +1,351 @@
+"""
+Early Exit
+Calibrated classification heads on intermediate DistilBERT layers
+
+Each intermediate layer gets a logistic-regression head over the masked
+mean of its hidden states, fitted on the validation set split into the
+same token windows the detector scores (INFERENCE_MAX_TOKENS). A
+temperature per head is fitted on out-of-fold scores, so a head
+probability of 0.95 means about 95% of such windows are labelled that
+way. The torch-early-exit
+backend (inference_backends.py) stops at the first layer whose head clears
+EARLY_EXIT_THRESHOLD.
+
+Heads are fitted only by --calibrate and saved next to MODEL_PATH
+(<model>-early-exit/heads.pt). Without them, or when they were fitted
+under other window settings, the backend falls back to torch.
+
+Usage:
+    python early_exit.py --calibrate                 # (re)fit heads on val.csv
+    python early_exit.py --report                    # accuracy/latency per threshold on test.csv
+    python early_exit.py --report --thresholds 0.9,0.95,0.99 --limit 500
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import torch
+
+from cascade import load_labelled
+from config import Config
+from inference_backends import artifact_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS = (0.8, 0.9, 0.95, 0.98, 0.99)
+
+
+class ExitHead(torch.nn.Module):
+    """Linear head over masked mean-pooled hidden states, with a fitted temperature"""
+
+    def __init__(self, dim, num_labels, temperature=1.0):
+        super().__init__()
+        self.linear = torch.nn.Linear(dim, num_labels)
+        self.register_buffer('temperature', torch.tensor(float(temperature)))
+
+    def forward(self, hidden, attention_mask):
+        return self.linear(mean_pool(hidden, attention_mask)) / self.temperature
+
+
+def mean_pool(hidden, attention_mask):
+    """Mean of the hidden states over real (unpadded) tokens"""
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+
+def heads_path(model_path):
+    return os.path.join(artifact_dir(model_path, 'early-exit'), 'heads.pt')
+
+
+def smishing_column(model):
+    """Logit column of the smishing class (same rule as SmishingDetector)"""
+    for index, label in model.config.id2label.items():
+        if str(label).lower() in ['smish', 'smishing', '1', 'label_1']:
+            return int(index)
+    return 1
+
+
+def windowing():
+    """Window settings the detector scores with; heads fitted under others are stale"""
+    return {
+        'max_tokens': Config.INFERENCE_MAX_TOKENS,
+        'overlap': Config.INFERENCE_WINDOW_OVERLAP,
+        'max_windows': Config.INFERENCE_MAX_WINDOWS
+    }
+
+
+def text_windows(tokenizer, texts, labels):
+    """
+    Split texts into the windows SmishingDetector scores, each with its text's label
+
+    Returns:
+        (list, np.ndarray): Token id lists with special tokens, and labels
+    """
+    from detector import token_windows
+
+    settings = windowing()
+    max_tokens = min(settings['max_tokens'], tokenizer.model_max_length)
+    encodings = tokenizer(list(texts), add_special_tokens=False, padding=False, verbose=False)
+    windows, window_labels = [], []
+    for ids, label in zip(encodings['input_ids'], labels):
+        for window in token_windows(tokenizer, ids, max_tokens, settings['overlap'], settings['max_windows']):
+            windows.append(window)
+            window_labels.append(label)
+    return windows, np.asarray(window_labels)
+
+
+def layer_features(model, tokenizer, windows, batch_size=64):
+    """
+    Mean-pooled hidden states of every transformer layer
+
+    Args:
+        windows: Token id lists with special tokens (see text_windows)
+
+    Returns:
+        list: One (n, dim) array per layer, layer 1 first
+    """
+    order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+    features = None
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch_index = order[start:start + batch_size]
+            batch = tokenizer.pad(
+                {'input_ids': [windows[i] for i in batch_index]},
+                padding=True,
+                return_tensors='pt'
+            )
+            hidden_states = model.distilbert(
+                input_ids=batch['input_ids'],
+                attention_mask=batch['attention_mask'],
+                output_hidden_states=True
+            ).hidden_states[1:]
+            if features is None:
+                features = [np.zeros((len(windows), hidden.shape[-1]), dtype=np.float32) for hidden in hidden_states]
+            for layer, hidden in enumerate(hidden_states):
+                features[layer][batch_index] = mean_pool(hidden, batch['attention_mask']).numpy()
+    return features
+
+
+def fit_temperature(scores, labels):
+    """Temperature minimizing the negative log-likelihood of sigmoid(score / T)"""
+    best, best_loss = 1.0, float('inf')
+    for temperature in np.geomspace(0.1, 10, 81):
+        z = scores / temperature
+        # log(1 + e^-z) for positives, log(1 + e^z) for negatives
+        loss = np.mean(np.logaddexp(0, np.where(labels == 1, -z, z)))
+        if loss < best_loss:
+            best, best_loss = float(temperature), loss
+    return best
+
+
+def calibrate(model, tokenizer, texts, labels, C=1.0):
+    """
+    Fit one calibrated exit head per intermediate layer
+
+    Heads are fitted on the same token windows the detector scores at
+    inference, so the exit threshold gates the inputs it was calibrated on.
+
+    Args:
+        model: DistilBertForSequenceClassification
+        tokenizer: Its tokenizer
+        texts: Validation messages
+        labels: 0/1 smishing labels
+
+    Returns:
+        dict: Checkpoint with per-layer head weights, temperatures and
+              validation accuracy
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import cross_val_predict
+
+    windows, labels = text_windows(tokenizer, texts, labels)
+    column = smishing_column(model)
+    # Fit in the model's logit space: class 1 is logit column 1
+    targets = labels if column == 1 else 1 - labels
+    folds = min(5, int(np.bincount(targets, minlength=2).min()))
+
+    started = time.perf_counter()
+    features = layer_features(model, tokenizer, windows)
+    heads = {}
+    for layer, X in enumerate(features[:-1], start=1):
+        classifier = LogisticRegression(C=C, max_iter=2000)
+        classifier.fit(X, targets)
+
+        temperature = 1.0
+        if folds >= 2:
+            scores = cross_val_predict(LogisticRegression(C=C, max_iter=2000), X, targets, cv=folds, method='decision_function')
+            temperature = fit_temperature(scores, targets)
+
+        weight = np.zeros((2, X.shape[1]), dtype=np.float32)
+        weight[1] = classifier.coef_[0]
+        bias = np.array([0.0, classifier.intercept_[0]], dtype=np.float32)
+        heads[layer] = {
+            'weight': torch.from_numpy(weight),
+            'bias': torch.from_numpy(bias),
+            'temperature': temperature,
+            'val_accuracy': float(classifier.score(X, targets))
+        }
+        logger.info("Fitted exit head", extra={'layer': layer, 'temperature': round(temperature, 3), 'val_accuracy': round(heads[layer]['val_accuracy'], 4)})
+
+    logger.info("Early-exit calibration done", extra={'messages': len(texts), 'windows': len(windows), 'seconds': round(time.perf_counter() - started, 1)})
+    return {'num_layers': len(features), 'messages': len(texts), 'windows': len(windows), 'windowing': windowing(), 'heads': heads}
+
+
+def build_heads(checkpoint):
+    """ExitHead modules keyed by 1-based layer"""
+    heads = {}
+    for layer, state in checkpoint['heads'].items():
+        head = ExitHead(state['weight'].shape[1], state['weight'].shape[0], state['temperature'])
+        head.linear.weight.data.copy_(state['weight'])
+        head.linear.bias.data.copy_(state['bias'])
+        head.eval()
+        heads[int(layer)] = head
+    return heads
+
+
+def load_heads(model_path):
+    """
+    Load the exit heads fitted by `python early_exit.py --calibrate`
+
+    Heads are never fitted here: this runs while the detector is built, so
+    a missing or stale checkpoint makes the backend fall back to torch.
+
+    Args:
+        model_path: Model directory (heads are cached next to it)
+
+    Returns:
+        dict: {layer: ExitHead}
+
+    Raises:
+        FileNotFoundError: No heads have been fitted
+        ValueError: The heads were fitted under other window settings
+    """
+    path = heads_path(model_path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No early-exit heads at {path} - run python early_exit.py --calibrate")
+    checkpoint = torch.load(path, weights_only=True)
+    if checkpoint.get('windowing') != windowing():
+        raise ValueError(f"Early-exit heads at {path} were fitted for other window settings - run python early_exit.py --calibrate")
+    return build_heads(checkpoint)
+
+
+def fit_heads(model, model_path, csv_path=None):
+    """
+    Fit exit heads on the calibration set and save them next to the model
+
+    Args:
+        model: Loaded DistilBertForSequenceClassification
+        model_path: Model directory
+        csv_path: Labelled calibration CSV (default: Config.EARLY_EXIT_CALIBRATION_CSV)
+
+    Returns:
+        dict: The saved checkpoint (see calibrate)
+    """
+    from transformers import AutoTokenizer
+
+    texts, labels = load_labelled(csv_path or Config.EARLY_EXIT_CALIBRATION_CSV)
+    checkpoint = calibrate(model, AutoTokenizer.from_pretrained(model_path), texts, labels)
+    path = heads_path(model_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.save(checkpoint, path)
+    logger.info("Saved early-exit heads to %s", path)
+    return checkpoint
+
+
+def tradeoff_report(csv_path, thresholds=DEFAULT_THRESHOLDS, limit=None, repeat=3):
+    """
+    Accuracy and latency of early exit at several thresholds
+
+    The full model (no early exit) is the baseline for agreement and speedup.
+
+    Returns:
+        list: One dict per threshold, baseline first
+    """
+    from detector import SmishingDetector
+
+    texts, labels = load_labelled(csv_path, limit)
+    # Time the backend directly; the detector only reads the setting when built
+    micro_batching, Config.MICRO_BATCHING = Config.MICRO_BATCHING, False
+    try:
+        detector = SmishingDetector(backend='torch-early-exit')
+    finally:
+        Config.MICRO_BATCHING = micro_batching
+    engine = detector.engine
+    if engine.name != 'torch-early-exit':
+        raise RuntimeError("Early-exit backend could not be loaded")
+    configured = engine.threshold, engine.min_layer
+
+    def run(threshold, min_layer):
+        engine.threshold, engine.min_layer = threshold, min_layer
+        detector.predict_proba_batch(texts[:32])  # Warm up allocator for this setting
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            probs, layers = detector.score(texts, exit_layers=True)
+            best = min(best, time.perf_counter() - started)
+        return probs, layers, best
+
+    baseline_probs, _, baseline_seconds = run(1.0, engine.num_layers + 1)
+    baseline = baseline_probs.argmax(axis=1)
+
+    rows = []
+    for threshold in [None] + list(thresholds):
+        if threshold is None:
+            probs, layers, seconds = baseline_probs, np.full(len(texts), engine.num_layers), baseline_seconds
+        else:
+            probs, layers, seconds = run(threshold, configured[1])
+        predictions = probs.argmax(axis=1)
+        rows.append({
+            'threshold': 'full' if threshold is None else threshold,
+            'accuracy': float((predictions == labels).mean()),
+            'agreement': float((predictions == baseline).mean()),
+            'mean_exit_layer': float(layers.mean()),
+            'exits': {int(layer): int(count) for layer, count in zip(*np.unique(layers, return_counts=True))},
+            'ms_per_message': 1000 * seconds / len(texts),
+            'speedup': baseline_seconds / seconds
+        })
+
+    engine.threshold, engine.min_layer = configured
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate and evaluate early-exit DistilBERT inference')
+    parser.add_argument('--calibrate', action='store_true', help='Refit the exit heads')
+    parser.add_argument('--report', action='store_true', help='Print the accuracy/latency trade-off')
+    parser.add_argument('--val', default=Config.EARLY_EXIT_CALIBRATION_CSV, help='Calibration CSV')
+    parser.add_argument('--csv', default=os.path.join('DistilBERT Model Implementation', 'prep_out', 'test.csv'), help='Evaluation CSV')
+    parser.add_argument('--thresholds', default=','.join(map(str, DEFAULT_THRESHOLDS)))
+    parser.add_argument('--limit', type=int, default=None, help='Only use the first N test messages')
+    args = parser.parse_args()
+
+    if args.calibrate:
+        from transformers import AutoModelForSequenceClassification
+
+        model = AutoModelForSequenceClassification.from_pretrained(Config.MODEL_PATH)
+        model.eval()
+        checkpoint = fit_heads(model, Config.MODEL_PATH, args.val)
+        print("\n" + "="*60)
+        print(f"EXIT HEADS: {len(checkpoint['heads'])} layers, {checkpoint['messages']} validation messages ({checkpoint['windows']} windows)")
+        print("="*60)
+        for layer, state in sorted(checkpoint['heads'].items()):
+            print(f"  layer {layer}: val accuracy {state['val_accuracy']:.4f}, temperature {state['temperature']:.3f}")
+
+    if args.report or not args.calibrate:
+        thresholds = [float(value) for value in args.thresholds.split(',')]
+        rows = tradeoff_report(args.csv, thresholds, args.limit)
+        print("\n" + "="*60)
+        print(f"EARLY-EXIT TRADE-OFF: {args.csv}")
+        print("="*60)
+        print(f"{'threshold':>9} {'accuracy':>9} {'agree':>7} {'exit':>5} {'ms/msg':>7} {'speedup':>8}  exits per layer")
+        for row in rows:
+            threshold = row['threshold'] if isinstance(row['threshold'], str) else f"{row['threshold']:.2f}"
+            exits = ' '.join(f"{layer}:{count}" for layer, count in row['exits'].items())
+            print(f"{threshold:>9} {row['accuracy']:9.4f} {row['agreement']:7.4f} {row['mean_exit_layer']:5.2f} "
+                  f"{row['ms_per_message']:7.2f} {row['speedup']:7.2f}x  {exits}")
+
+
+if __name__ == '__main__':
+    main()
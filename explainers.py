@@ -0,0 +1,234 @@
+"""
+Explainers
+Fast single-pass alternatives to LIME for word-level explanations
+
+Explainers:
+    lime        LimeTextExplainer (SmishingDetector.get_lime_explanation)
+    occlusion   Drop each word once and score all variants in one batch
+    gradient    Gradient x input over the token embeddings of each scoring
+                window (one backward pass)
+
+Every explainer returns (word, weight) pairs for the explained class, which
+SmishingDetector formats into the predicted_weights/max_weight shape that
+the analysis page renders.
+
+Agreement report against LIME:
+    python explainers.py --method occlusion --limit 50
+"""
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import torch
+
+from inference_scheduler import InferenceScheduler
+
+
+class OcclusionExplainer:
+    """Word occlusion: weight = drop in class probability when the word is removed"""
+
+    name = 'occlusion'
+    word_pattern = re.compile(r'\w+')
+
+    def __init__(self, detector):
+        self.detector = detector
+
+    def explain(self, text, class_index, num_features):
+        """
+        Args:
+            text: Text to explain
+            class_index: 0 for ham, 1 for smishing
+            num_features: Number of words to return
+
+        Returns:
+            list: (word, weight) pairs sorted by absolute weight
+        """
+        spans = [match.span() for match in self.word_pattern.finditer(text)]
+        variants = [text] + [text[:start] + text[end:] for start, end in spans]
+        probs = self.detector.score(variants, InferenceScheduler.BULK)
+        base = probs[0, class_index]
+
+        weights = {}
+        for (start, end), row in zip(spans, probs[1:]):
+            word = text[start:end]
+            weight = float(base - row[class_index])
+            if abs(weight) > abs(weights.get(word, 0.0)):
+                weights[word] = weight
+
+        ranked = sorted(weights.items(), key=lambda item: abs(item[1]), reverse=True)
+        return ranked[:num_features]
+
+
+class GradientExplainer:
+    """Gradient x input on the word embeddings of the fp32 model"""
+
+    name = 'gradient'
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.model = detector.model
+        self.tokenizer = detector.tokenizer
+
+    def explain(self, text, class_index, num_features):
+        """
+        The text is split into the same token windows the detector scores,
+        all windows go through one forward and backward pass, and a token
+        covered by several windows gets its mean score.
+
+        Args:
+            text: Text to explain
+            class_index: 0 for ham, 1 for smishing
+            num_features: Number of words to return
+
+        Returns:
+            list: (word, weight) pairs sorted by absolute weight
+        """
+        from detector import window_spans
+
+        detector = self.detector
+        encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        ids = encoding['input_ids']
+        if not ids:
+            return []
+        offsets = encoding['offset_mapping']
+        word_ids = encoding.word_ids(0)
+
+        budget = detector.max_tokens - self.tokenizer.num_special_tokens_to_add()
+        spans = window_spans(len(ids), budget, detector.window_overlap, detector.max_windows)
+        windows = [self.tokenizer.build_inputs_with_special_tokens(ids[start:end]) for start, end in spans]
+        batch = detector._pad_batch(windows)
+
+        # Gradients w.r.t. the embeddings only: the model's parameters are
+        # shared with the serving path and are left untouched
+        with torch.enable_grad():
+            embeddings = self.model.get_input_embeddings()(batch['input_ids']).detach()
+            embeddings.requires_grad_(True)
+            logits = self.model(inputs_embeds=embeddings, attention_mask=batch['attention_mask']).logits
+
+            # Log-odds of the explained class against the other one, per window
+            target = detector.smishing_index if class_index == 1 else 1 - detector.smishing_index
+            objective = (logits[:, target] - logits[:, 1 - target]).sum()
+            gradient, = torch.autograd.grad(objective, embeddings)
+
+        window_scores = (gradient * embeddings).sum(dim=-1).detach().numpy()
+
+        # Map window positions back to the text's tokens (special tokens have no source)
+        token_scores = np.zeros(len(ids))
+        coverage = np.zeros(len(ids))
+        for row, ((start, end), window) in enumerate(zip(spans, windows)):
+            special = self.tokenizer.get_special_tokens_mask(window, already_has_special_tokens=True)
+            positions = [index for index, flag in enumerate(special) if not flag]
+            token_scores[start:end] += window_scores[row, positions]
+            coverage[start:end] += 1
+        covered = coverage > 0
+        token_scores[covered] /= coverage[covered]
+
+        # Sum word-piece scores back into whole words
+        word_spans = {}
+        word_scores = {}
+        for index, word_id in enumerate(word_ids):
+            if word_id is None or not covered[index]:
+                continue
+            start, end = offsets[index]
+            first_start, _ = word_spans.get(word_id, (start, end))
+            word_spans[word_id] = (first_start, end)
+            word_scores[word_id] = word_scores.get(word_id, 0.0) + float(token_scores[index])
+
+        weights = {}
+        for word_id, score in word_scores.items():
+            start, end = word_spans[word_id]
+            word = text[start:end]
+            if abs(score) > abs(weights.get(word, 0.0)):
+                weights[word] = score
+
+        ranked = sorted(weights.items(), key=lambda item: abs(item[1]), reverse=True)
+        return ranked[:num_features]
+
+
+EXPLAINERS = {
+    explainer.name: explainer
+    for explainer in (OcclusionExplainer, GradientExplainer)
+}
+
+
+def create_explainer(name, detector):
+    """
+    Build a fast explainer by name
+
+    Returns:
+        Explainer instance, or None for 'lime' (handled by the detector itself)
+    """
+    if name == 'lime':
+        return None
+    if name not in EXPLAINERS:
+        raise ValueError(f"Unknown explainer '{name}' (choose from lime, {', '.join(EXPLAINERS)})")
+    return EXPLAINERS[name](detector)
+
+
+def agreement_report(texts, method, top_k=5):
+    """
+    Compare a fast explainer with LIME on the same predictions
+
+    Returns:
+        dict: Mean top-k overlap, Jaccard similarity of the highlighted
+              word sets, and per-message latency of both methods
+    """
+    from detector import SmishingDetector
+
+    detector = SmishingDetector(explainer='lime')
+    fast = create_explainer(method, detector)
+
+    overlaps, jaccards = [], []
+    lime_time = fast_time = 0.0
+    for text in texts:
+        prediction = detector.classify(text)['prediction']
+
+        started = time.perf_counter()
+        lime_result = detector.get_lime_explanation(text, prediction)
+        lime_time += time.perf_counter() - started
+
+        started = time.perf_counter()
+        fast_result = detector.get_explanation(text, prediction, explainer=fast)
+        fast_time += time.perf_counter() - started
+
+        if not (lime_result.get('explanation_available') and fast_result.get('explanation_available')):
+            continue
+
+        lime_words = lime_result['predicted_weights']
+        fast_words = fast_result['predicted_weights']
+        lime_top = set(sorted(lime_words, key=lime_words.get, reverse=True)[:top_k])
+        fast_top = set(sorted(fast_words, key=fast_words.get, reverse=True)[:top_k])
+        if lime_top or fast_top:
+            overlaps.append(len(lime_top & fast_top) / max(len(lime_top), len(fast_top)))
+            jaccards.append(len(set(lime_words) & set(fast_words)) / len(set(lime_words) | set(fast_words)))
+
+    return {
+        'method': method,
+        'messages': len(texts),
+        f'top{top_k}_overlap': float(np.mean(overlaps)) if overlaps else 0.0,
+        'word_set_jaccard': float(np.mean(jaccards)) if jaccards else 0.0,
+        'ms_per_message_lime': 1000 * lime_time / len(texts),
+        f'ms_per_message_{method}': 1000 * fast_time / len(texts),
+        'speedup': lime_time / fast_time if fast_time else 0.0
+    }
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Agreement between a fast explainer and LIME')
+    parser.add_argument('--method', default='occlusion', choices=list(EXPLAINERS))
+    parser.add_argument('--csv', default=os.path.join('DistilBERT Model Implementation', 'prep_out', 'test.csv'))
+    parser.add_argument('--limit', type=int, default=50, help='Number of messages to explain')
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.csv)['text'].astype(str).head(args.limit).tolist()
+    report = agreement_report(texts, args.method, args.top_k)
+    print("\n" + "="*60)
+    print(f"EXPLAINER AGREEMENT: {report['method']} vs LIME")
+    print("="*60)
+    for key, value in report.items():
+        print(f"{key:>24}: {value:.4f}" if isinstance(value, float) else f"{key:>24}: {value}")
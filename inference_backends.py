@@ -0,0 +1,281 @@
+"""
+Inference Backends
+Interchangeable engines that turn padded token batches into class logits
+
+Backends:
+    torch       PyTorch fp32 (default)
+    torch-int8  PyTorch with dynamically int8-quantized Linear layers
+    onnx        ONNX Runtime fp32
+    onnx-int8   ONNX Runtime with dynamically int8-quantized weights
+    torch-early-exit
+                PyTorch fp32 that stops at the first intermediate layer whose
+                calibrated head is confident enough (see early_exit.py)
+
+ONNX exports are cached next to MODEL_PATH and rebuilt when the model
+files are newer; torch-int8 quantizes at load.
+
+Parity check against the fp32 model:
+    python inference_backends.py --backend onnx-int8
+"""
+import argparse
+import inspect
+import logging
+import os
+import time
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class TorchBackend:
+    """PyTorch fp32 model"""
+
+    name = 'torch'
+
+    def __init__(self, model, model_path):
+        self.model = model
+        self.model.eval()
+
+    def logits(self, input_ids, attention_mask):
+        with torch.inference_mode():
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).logits.numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch model with int8 dynamic quantization of Linear layers"""
+
+    name = 'torch-int8'
+
+    def __init__(self, model, model_path):
+        # Quantizing a copy takes seconds, so it is redone at load instead of cached
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized, model_path)
+
+
+class OnnxBackend:
+    """ONNX Runtime session over an exported (optionally int8-quantized) model"""
+
+    name = 'onnx'
+    quantize = False
+
+    def __init__(self, model, model_path):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("ONNX backends need onnxruntime: pip install onnxruntime")
+
+        directory = artifact_dir(model_path, 'onnx')
+        fp32_path = os.path.join(directory, 'model.onnx')
+        if is_stale(fp32_path, model_path):
+            export_onnx(model, fp32_path)
+
+        path = fp32_path
+        if self.quantize:
+            path = os.path.join(directory, 'model.int8.onnx')
+            if is_stale(path, fp32_path):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+                logger.info("Saved int8 ONNX model to %s", path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def logits(self, input_ids, attention_mask):
+        return self.session.run(['logits'], {
+            'input_ids': input_ids.numpy(),
+            'attention_mask': attention_mask.numpy()
+        })[0]
+
+
+class QuantizedOnnxBackend(OnnxBackend):
+    """ONNX Runtime with int8 dynamic quantization"""
+
+    name = 'onnx-int8'
+    quantize = True
+
+
+class EarlyExitBackend(TorchBackend):
+    """
+    PyTorch fp32 model with classification heads on intermediate layers
+
+    Layers run one at a time. After each layer with a head, rows whose
+    calibrated head probability reaches the threshold leave the batch; the
+    rest continue, and rows that never clear it get the model's own
+    classifier. Heads are fitted by `python early_exit.py --calibrate` and
+    saved next to MODEL_PATH; without them this backend cannot be built.
+    """
+
+    name = 'torch-early-exit'
+
+    def __init__(self, model, model_path, threshold=None, min_layer=None):
+        from config import Config
+        from early_exit import load_heads
+
+        super().__init__(model, model_path)
+        self.threshold = Config.EARLY_EXIT_THRESHOLD if threshold is None else threshold
+        self.min_layer = Config.EARLY_EXIT_MIN_LAYER if min_layer is None else min_layer
+        self.heads = load_heads(model_path)
+        self.num_layers = len(model.distilbert.transformer.layer)
+
+    def logits(self, input_ids, attention_mask):
+        return self.logits_with_exits(input_ids, attention_mask)[0]
+
+    def logits_with_exits(self, input_ids, attention_mask):
+        """
+        Returns:
+            (np.ndarray, np.ndarray): Logits, and the 1-based layer each row exited at
+        """
+        model = self.model
+        logits = np.zeros((len(input_ids), model.config.num_labels), dtype=np.float32)
+        exit_layers = np.full(len(input_ids), self.num_layers, dtype=np.int64)
+
+        with torch.inference_mode():
+            rows = torch.arange(len(input_ids))
+            hidden = model.distilbert.embeddings(input_ids)
+            for index, layer in enumerate(model.distilbert.transformer.layer):
+                hidden = layer(hidden, attention_mask)[-1]
+                head = self.heads.get(index + 1)
+                if head is None or index + 1 < self.min_layer or index + 1 == self.num_layers:
+                    continue
+
+                head_logits = head(hidden, attention_mask)
+                confident = torch.softmax(head_logits, dim=-1).max(dim=-1).values >= self.threshold
+                if confident.any():
+                    logits[rows[confident].numpy()] = head_logits[confident].numpy()
+                    exit_layers[rows[confident].numpy()] = index + 1
+                    keep = ~confident
+                    if not keep.any():
+                        return logits, exit_layers
+                    rows, hidden, attention_mask = rows[keep], hidden[keep], attention_mask[keep]
+
+            pooled = torch.relu(model.pre_classifier(hidden[:, 0]))
+            logits[rows.numpy()] = model.classifier(model.dropout(pooled)).numpy()
+        return logits, exit_layers
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (TorchBackend, QuantizedTorchBackend, OnnxBackend, QuantizedOnnxBackend, EarlyExitBackend)
+}
+
+
+def artifact_dir(model_path, suffix):
+    """Cache directory for derived artifacts, e.g. distilbert-smishing-final-onnx"""
+    return f"{os.path.normpath(model_path)}-{suffix}"
+
+
+def is_stale(artifact, source):
+    """Whether a derived artifact is missing or older than its source file or directory"""
+    if not os.path.exists(artifact):
+        return True
+    if os.path.isdir(source):
+        sources = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        sources = [source]
+    newest = max((os.path.getmtime(path) for path in sources if os.path.isfile(path)), default=0)
+    return os.path.getmtime(artifact) < newest
+
+
+def export_onnx(model, path):
+    """Export a sequence classification model with dynamic batch and sequence axes"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model.eval()
+    dummy = {
+        'input_ids': torch.ones((2, 16), dtype=torch.long),
+        'attention_mask': torch.ones((2, 16), dtype=torch.long)
+    }
+
+    # Newer torch defaults to the dynamo exporter; keep the TorchScript one
+    kwargs = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(
+        model,
+        (dummy['input_ids'], dummy['attention_mask']),
+        path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch'}
+        },
+        opset_version=14,
+        **kwargs
+    )
+    logger.info("Exported ONNX model to %s", path)
+
+
+def create_backend(name, model, model_path):
+    """
+    Build an inference backend by name
+
+    Args:
+        name: One of BACKENDS
+        model: Loaded fp32 AutoModelForSequenceClassification
+        model_path: Model directory (artifacts are cached next to it)
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](model, model_path)
+
+
+def parity_check(backend_name, csv_path, limit=None):
+    """
+    Compare a backend against the fp32 model on a labelled CSV (text, label)
+
+    Returns:
+        dict: Probability drift, label agreement, accuracy and latency
+    """
+    import pandas as pd
+    from detector import SmishingDetector
+
+    df = pd.read_csv(csv_path)
+    if limit:
+        df = df.head(limit)
+    texts = df['text'].astype(str).tolist()
+    labels = df['label'].astype(int).to_numpy()
+
+    reference = SmishingDetector(backend='torch')
+    candidate = SmishingDetector(backend=backend_name)
+
+    timings = {}
+    probs = {}
+    for name, detector in (('torch', reference), (backend_name, candidate)):
+        started = time.perf_counter()
+        probs[name] = detector.predict_proba_batch(texts)
+        timings[name] = time.perf_counter() - started
+
+    drift = np.abs(probs['torch'][:, 1] - probs[backend_name][:, 1])
+    reference_labels = probs['torch'].argmax(axis=1)
+    candidate_labels = probs[backend_name].argmax(axis=1)
+
+    return {
+        'backend': backend_name,
+        'messages': len(texts),
+        'max_prob_drift': float(drift.max()),
+        'mean_prob_drift': float(drift.mean()),
+        'label_agreement': float((reference_labels == candidate_labels).mean()),
+        'label_flips': int((reference_labels != candidate_labels).sum()),
+        'accuracy_fp32': float((reference_labels == labels).mean()),
+        'accuracy_backend': float((candidate_labels == labels).mean()),
+        'ms_per_message_fp32': 1000 * timings['torch'] / len(texts),
+        'ms_per_message_backend': 1000 * timings[backend_name] / len(texts),
+        'speedup': timings['torch'] / timings[backend_name]
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare an inference backend against the fp32 model')
+    parser.add_argument('--backend', default='onnx-int8', choices=list(BACKENDS))
+    parser.add_argument('--csv', default=os.path.join('DistilBERT Model Implementation', 'prep_out', 'test.csv'))
+    parser.add_argument('--limit', type=int, default=None, help='Only use the first N messages')
+    args = parser.parse_args()
+
+    report = parity_check(args.backend, args.csv, args.limit)
+    print("\n" + "="*60)
+    print(f"PARITY REPORT: {report['backend']} vs torch fp32")
+    print("="*60)
+    for key, value in report.items():
+        print(f"{key:>24}: {value:.4f}" if isinstance(value, float) else f"{key:>24}: {value}")
@@ -0,0 +1,151 @@
+"""
+Inference Scheduler
+Dynamic micro-batching of model scoring requests across Flask threads
+"""
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from telemetry import SCHEDULER_BATCH_SIZE, SCHEDULER_QUEUE_WAIT
+
+
+class InferenceScheduler:
+    """
+    Single worker thread that owns model scoring
+
+    Request threads queue their texts as one unit and wait on a future.
+    Small interactive units are coalesced into one forward pass once either
+    max_batch_size texts are collected or max_wait_ms has passed since the
+    first one. Bulk units (LIME perturbations, batch chunks) and units that
+    fill a batch by themselves are scored alone, in the padded batches
+    score_fn already builds.
+    """
+
+    # Priorities: interactive verdicts run ahead of LIME/bulk scoring
+    INTERACTIVE = 0
+    BULK = 1
+
+    def __init__(self, score_fn, max_batch_size=32, max_wait_ms=5):
+        """
+        Initialize scheduler
+
+        Args:
+            score_fn: Callable mapping a list of texts to an (n, k) array of
+                      rows starting with [ham_prob, smishing_prob]
+            max_batch_size: Most interactive texts coalesced into one forward pass
+            max_wait_ms: Longest time the first queued text waits for company
+        """
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.PriorityQueue()
+        self.sequence = itertools.count()
+
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.total_wait = 0.0
+        self.batch_size_counts = {}
+
+        self.worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self.worker.start()
+
+    def submit(self, texts, priority=INTERACTIVE):
+        """
+        Queue texts for scoring as one unit
+
+        Returns:
+            Future: Resolves to the (n, k) array of score_fn rows for texts
+        """
+        future = Future()
+        self.queue.put((priority, next(self.sequence), time.monotonic(), list(texts), future))
+        return future
+
+    def predict_proba(self, texts, priority=INTERACTIVE):
+        """
+        Score texts through the shared queue and wait for the results
+
+        Returns:
+            np.ndarray: (n, k) array of score_fn rows
+        """
+        return self.submit(texts, priority).result()
+
+    def _alone(self, item):
+        return item[0] != self.INTERACTIVE or len(item[3]) >= self.max_batch_size
+
+    def _collect(self):
+        """Block for the first unit; coalesce interactive ones until the batch is full or the wait expires"""
+        first = self.queue.get()
+        batch = [first]
+        if self._alone(first):
+            return batch
+
+        size = len(first[3])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self.queue.get(timeout=remaining)
+                else:
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if self._alone(item):
+                self.queue.put(item)  # Keeps its sequence number, so its place in line
+                break
+            batch.append(item)
+            size += len(item[3])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            texts = [text for item in batch for text in item[3]]
+            futures = [item[4] for item in batch]
+
+            try:
+                probs = np.asarray(self.score_fn(texts))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for item in batch:
+                item[4].set_result(probs[offset:offset + len(item[3])])
+                offset += len(item[3])
+
+            SCHEDULER_BATCH_SIZE.observe(len(texts))
+            for item in batch:
+                SCHEDULER_QUEUE_WAIT.observe(started - item[2])
+
+            with self.lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.texts += len(texts)
+                self.total_wait += sum(started - item[2] for item in batch)
+                self.batch_size_counts[len(texts)] = self.batch_size_counts.get(len(texts), 0) + 1
+
+    def stats(self):
+        """Queue depth and batch-size metrics"""
+        with self.lock:
+            batches, requests = self.batches, self.requests
+            return {
+                'queue_depth': self.queue.qsize(),
+                'batches': batches,
+                'requests': requests,
+                'texts': self.texts,
+                'avg_batch_size': self.texts / batches if batches else 0.0,
+                'avg_queue_wait_ms': 1000 * self.total_wait / requests if requests else 0.0,
+                'batch_size_counts': dict(sorted(self.batch_size_counts.items())),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000
+            }
@@ -0,0 +1,110 @@
+"""
+Analysis Jobs
+Background analysis jobs that publish partial results as they become available
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisJob:
+    """A single background analysis with an ordered event log"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.events = []
+        self.done = False
+        self.result = None
+        self.condition = threading.Condition()
+
+    def publish(self, event, data):
+        """
+        Append an event and wake up any waiting readers
+
+        Args:
+            event: Event name ('verdict', 'urls', 'explanation', 'complete', 'failed')
+            data: JSON-serializable payload
+        """
+        with self.condition:
+            self.events.append({'event': event, 'data': data})
+            if event in ('complete', 'failed'):
+                self.done = True
+                self.result = data
+            self.condition.notify_all()
+
+    def wait_for_events(self, after, timeout):
+        """
+        Block until there are events past index `after` or the job is done
+
+        Returns:
+            list: New events (may be empty on timeout)
+        """
+        with self.condition:
+            if len(self.events) <= after and not self.done:
+                self.condition.wait(timeout)
+            return self.events[after:]
+
+    @property
+    def status(self):
+        if not self.done:
+            return 'running'
+        return 'failed' if self.events[-1]['event'] == 'failed' else 'complete'
+
+
+class JobManager:
+    """Runs analysis jobs on a bounded pool and keeps them for a while"""
+
+    def __init__(self, max_workers=4, ttl=300):
+        """
+        Initialize job manager
+
+        Args:
+            max_workers: Jobs analyzed concurrently
+            ttl: Seconds a job is kept after it was created
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self.ttl = ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Start a job
+
+        Args:
+            func: Callable run as func(*args, emit=job.publish, **kwargs); its
+                  return value is published as the 'complete' event
+
+        Returns:
+            AnalysisJob
+        """
+        self._purge_expired()
+        job = AnalysisJob()
+        with self.lock:
+            self.jobs[job.id] = job
+
+        def run():
+            try:
+                job.publish('complete', func(*args, emit=job.publish, **kwargs))
+            except Exception as e:
+                logger.exception("Job %s failed: %s", job.id, e)
+                job.publish('failed', {'error': 'Analysis failed'})
+
+        self.executor.submit(run)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            expired = [job_id for job_id, job in self.jobs.items() if job.created_at < cutoff]
+            for job_id in expired:
+                del self.jobs[job_id]
@@ -0,0 +1,278 @@
+"""
+Near-Duplicate Index
+MinHash/LSH index of recently analyzed messages, to reuse verdicts across campaign variants
+
+Campaign variants differ only in a name, an amount, a tracking code or a
+link. Before shingling, messages are masked (URLs, e-mail addresses,
+tokens containing digits, and names after a greeting) and lowercased.
+Character 5-gram shingles are then MinHashed, and the signature is split
+into LSH bands. A lookup only compares against messages that share at
+least one band bucket.
+
+A new message whose estimated Jaccard similarity to an indexed one reaches
+the threshold reuses that message's model verdict and, when it still fits,
+its explanation. Matched variants are indexed as well, in the campaign
+cluster of the message they matched, so a cluster follows a campaign as its
+wording drifts; an unmatched message starts a new cluster.
+
+Memory is bounded by max_entries. Entries expire after ttl seconds in
+insertion order.
+"""
+import copy
+import itertools
+import logging
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from config import Config
+from telemetry import record_cache_lookup
+from url_extractor import mask_urls
+
+logger = logging.getLogger(__name__)
+
+NearDuplicate = namedtuple('NearDuplicate', ['similarity', 'campaign', 'payload', 'age_seconds'])
+
+SHINGLE_SIZE = 5
+_PRIME = (1 << 61) - 1
+
+_EMAIL = re.compile(r'\S+@\S+')
+_NAME = re.compile(r'\b((?i:dear|hi|hello|hey|mr|mrs|ms|miss|dr)\.?,?\s+)[A-Z][\w\'-]*')
+_DIGITS = re.compile(r'\w*\d[\w./:,-]*')
+_WORD = re.compile(r'\w+')
+
+
+def mask_message(message):
+    """Normalized message with the per-recipient parts replaced by placeholders"""
+    text = unicodedata.normalize('NFKC', message)
+    text = mask_urls(text)
+    text = _EMAIL.sub(' EMAIL ', text)
+    text = _NAME.sub(r'\1NAME', text)
+    text = _DIGITS.sub('0', text)
+    return ' '.join(text.lower().split())
+
+
+class _Entry:
+    def __init__(self, entry_id, signature, bands, campaign, payload, expires_at):
+        self.id = entry_id
+        self.signature = signature
+        self.bands = bands
+        self.campaign = campaign
+        self.payload = payload
+        self.created = time.time()
+        self.expires_at = expires_at
+
+
+class NearDuplicateIndex:
+    """Bounded, expiring MinHash/LSH index with campaign clustering"""
+
+    def __init__(self, threshold=0.8, ttl=3600, max_entries=20000, num_perm=64, bands=16):
+        """
+        Initialize index
+
+        Args:
+            threshold: Minimum estimated Jaccard similarity to count as a near-duplicate
+            ttl: Seconds an indexed message stays matchable
+            max_entries: Maximum indexed messages (oldest dropped first)
+            num_perm: MinHash permutations (signature length)
+            bands: LSH bands; num_perm must be a multiple
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        # (a * x + b) mod p with a, b, x < 2**32 never overflows uint64
+        rng = np.random.default_rng(1)
+        self.a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+
+        self.entries = OrderedDict()
+        self.buckets = {}
+        self.campaigns = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def signature(self, message):
+        """MinHash signature of the masked message's character shingles"""
+        text = mask_message(message)
+        if len(text) <= SHINGLE_SIZE:
+            shingles = {text}
+        else:
+            shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def lookup(self, message, signature=None):
+        """
+        Find the most similar indexed message at or above the threshold
+
+        Returns:
+            NearDuplicate or None
+        """
+        signature = self.signature(message) if signature is None else signature
+        now = time.time()
+        best, best_similarity = None, 0.0
+        with self.lock:
+            self._evict(now)
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self.buckets.get(key, ()))
+            for entry_id in candidates:
+                entry = self.entries[entry_id]
+                similarity = float(np.mean(entry.signature == signature))
+                if similarity > best_similarity:
+                    best, best_similarity = entry, similarity
+
+            hit = best is not None and best_similarity >= self.threshold
+            if hit:
+                self.hits += 1
+                campaign = self.campaigns[best.campaign]
+                campaign['hits'] += 1
+                campaign['last_seen'] = now
+            else:
+                self.misses += 1
+        record_cache_lookup('near_duplicate', hit)
+
+        if not hit:
+            return None
+        return NearDuplicate(round(best_similarity, 3), best.campaign, copy.deepcopy(best.payload), round(now - best.created, 1))
+
+    def add(self, message, payload, campaign=None, signature=None):
+        """
+        Index an analyzed message
+
+        Args:
+            message: Message text
+            payload: Data to hand back on a match (e.g. model verdict, explanation)
+            campaign: Campaign to join (defaults to a new one)
+
+        Returns:
+            int: Campaign id
+        """
+        signature = self.signature(message) if signature is None else signature
+        now = time.time()
+        with self.lock:
+            entry_id = next(self.ids)
+            campaign = campaign if campaign in self.campaigns else entry_id
+            entry = _Entry(entry_id, signature, self._band_keys(signature), campaign, copy.deepcopy(payload), now + self.ttl)
+            self.entries[entry_id] = entry
+            for key in entry.bands:
+                self.buckets.setdefault(key, set()).add(entry_id)
+
+            if campaign not in self.campaigns:
+                self.campaigns[campaign] = {
+                    'example': mask_message(message)[:160],
+                    'prediction': payload.get('model_result', {}).get('prediction'),
+                    'first_seen': now,
+                    'last_seen': now,
+                    'members': 0,
+                    'hits': 0
+                }
+            self.campaigns[campaign]['members'] += 1
+            self._evict(now)
+        return campaign
+
+    def _evict(self, now):
+        """Drop expired entries and the oldest beyond max_entries (caller holds the lock)"""
+        while self.entries:
+            entry = next(iter(self.entries.values()))
+            if entry.expires_at > now and len(self.entries) <= self.max_entries:
+                break
+            self._remove(entry)
+
+    def _remove(self, entry):
+        del self.entries[entry.id]
+        for key in entry.bands:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry.id)
+                if not bucket:
+                    del self.buckets[key]
+        campaign = self.campaigns[entry.campaign]
+        campaign['members'] -= 1
+        if campaign['members'] <= 0:
+            del self.campaigns[entry.campaign]
+
+    def top_campaigns(self, limit=20):
+        """
+        Largest live campaign clusters
+
+        Returns:
+            list: Dicts with campaign id, size (live indexed messages), masked example and verdict
+        """
+        with self.lock:
+            self._evict(time.time())
+            campaigns = [
+                {'campaign': campaign_id, 'size': info['members'], **info}
+                for campaign_id, info in self.campaigns.items()
+            ]
+        campaigns.sort(key=lambda campaign: campaign['size'], reverse=True)
+        return campaigns[:limit]
+
+    def stats(self):
+        """Hit/miss counters and index size"""
+        with self.lock:
+            hits, misses = self.hits, self.misses
+            size, campaigns = len(self.entries), len(self.campaigns)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0,
+            'size': size,
+            'campaigns': campaigns,
+            'threshold': self.threshold,
+            'ttl_seconds': self.ttl
+        }
+
+
+def adapt_explanation(explanation, message, prediction):
+    """
+    Reuse a near-duplicate's explanation for a new variant
+
+    Only words that also occur in the new message are kept, so names or
+    codes of the earlier recipient never leak into the response.
+
+    Returns:
+        dict or None: Explanation for message, or None when it does not fit
+    """
+    if not explanation or not explanation.get('explanation_available') or explanation.get('predicted_class') != prediction:
+        return None
+    words = set(_WORD.findall(message.lower()))
+    weights = {word: weight for word, weight in explanation['predicted_weights'].items() if word in words}
+    if not weights:
+        return None
+    return dict(explanation, predicted_weights=weights, max_weight=max(weights.values()), reused=True)
+
+
+def create_near_duplicate_index():
+    """
+    Build a NearDuplicateIndex from Config settings
+
+    Returns:
+        NearDuplicateIndex or None when disabled
+    """
+    if not Config.NEAR_DUPLICATE_ENABLED:
+        return None
+    return NearDuplicateIndex(
+        threshold=Config.NEAR_DUPLICATE_THRESHOLD,
+        ttl=Config.NEAR_DUPLICATE_TTL,
+        max_entries=Config.NEAR_DUPLICATE_MAX_ENTRIES,
+        num_perm=Config.NEAR_DUPLICATE_NUM_PERM,
+        bands=Config.NEAR_DUPLICATE_BANDS
+    )
@@ -0,0 +1,210 @@
+"""
+Reputation Index
+Local URL/domain blocklists and allowlists consulted before VirusTotal
+
+List files hold one entry per line: a domain (covers its subdomains), a
+URL, or a hosts-file line such as "0.0.0.0 evil.com". Blank lines and
+"#" comments are ignored.
+
+Each list is compiled once into a sorted array of 64-bit key hashes
+(cache/reputation/*.npy). The array is memory-mapped and searched by
+bisection, so a million entries take 8 MB that serve.py workers share
+through the page cache. When a list file changes it is recompiled and
+swapped in on the next lookup (checked at most every
+REPUTATION_RELOAD_INTERVAL seconds).
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from config import Config
+from telemetry import REPUTATION_LOOKUPS
+from url_extractor import normalize_url, url_host
+
+logger = logging.getLogger(__name__)
+
+ReputationHit = namedtuple('ReputationHit', ['verdict', 'match', 'source'])
+
+
+def key_hash(key):
+    """64-bit hash of an index key"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def url_key(url):
+    """URL entry key: normalized, without scheme, fragment or trailing slash"""
+    normalized = normalize_url(url).partition('#')[0]
+    if '://' in normalized:
+        normalized = normalized.split('://', 1)[1]
+    return 'u:' + normalized.rstrip('/')
+
+
+def entry_key(line):
+    """
+    Index key for one list line
+
+    Returns:
+        str: 'u:<url>' or 'd:<domain>', or None for blanks and comments
+    """
+    line = line.split('#', 1)[0].strip()
+    if not line:
+        return None
+    fields = line.split()
+    if len(fields) > 1 and fields[0] in ('0.0.0.0', '127.0.0.1', '::1'):
+        line = fields[1]  # hosts-file format
+    if '/' in line:
+        return url_key(line)
+    return 'd:' + url_host(line.lstrip('*.'))
+
+
+def lookup_keys(url):
+    """Keys to probe for a URL, most specific first"""
+    key = url_key(url)
+    keys = [key]
+    if '?' in key:
+        keys.append(key.partition('?')[0].rstrip('/'))
+    host = url_host(url)
+    while host:
+        keys.append('d:' + host)
+        host = host.partition('.')[2]
+    return keys
+
+
+class HashList:
+    """One list file compiled to a memory-mapped sorted hash array"""
+
+    def __init__(self, path, verdict, index_dir):
+        self.path = path
+        self.verdict = verdict
+        self.name = os.path.basename(path)
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:10]
+        self.index_path = os.path.join(index_dir, f"{self.name}-{digest}.npy")
+        self.mtime = None
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def changed(self):
+        try:
+            return os.stat(self.path).st_mtime != self.mtime
+        except FileNotFoundError:
+            return self.mtime is not None
+
+    def load(self):
+        """(Re)compile the list if needed and map its index"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            logger.warning("Reputation list missing", extra={'path': self.path})
+            self.mtime = None
+            self.hashes = np.empty(0, dtype=np.uint64)
+            return
+
+        if not os.path.exists(self.index_path) or os.stat(self.index_path).st_mtime < mtime:
+            self._compile()
+        self.hashes = np.load(self.index_path, mmap_mode='r')
+        self.mtime = mtime
+        logger.info("Reputation list loaded", extra={'list': self.name, 'verdict': self.verdict, 'entries': len(self.hashes)})
+
+    def _compile(self):
+        started = time.perf_counter()
+        with open(self.path, encoding='utf-8', errors='replace') as f:
+            keys = {key for key in map(entry_key, f) if key}
+        hashes = np.unique(np.fromiter((key_hash(key) for key in keys), dtype=np.uint64, count=len(keys)))
+
+        # Write under a temporary name so other workers never map a partial file
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, hashes)
+        os.replace(tmp_path, self.index_path)
+        logger.info("Reputation list compiled", extra={'list': self.name, 'entries': len(hashes), 'seconds': round(time.perf_counter() - started, 3)})
+
+    def __contains__(self, hashed):
+        hashes = self.hashes
+        index = np.searchsorted(hashes, hashed)
+        return index < len(hashes) and hashes[index] == hashed
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+class ReputationIndex:
+    """Blocklist/allowlist lookups with hot reload"""
+
+    def __init__(self, blocklists=(), allowlists=(), index_dir='cache/reputation', reload_interval=30):
+        """
+        Initialize index
+
+        Args:
+            blocklists: Paths of known-bad URL/domain lists
+            allowlists: Paths of trusted URL/domain lists
+            index_dir: Directory for the compiled hash arrays
+            reload_interval: Seconds between checks for changed list files (0 = never)
+        """
+        self.lists = [HashList(path, 'block', index_dir) for path in blocklists]
+        self.lists += [HashList(path, 'allow', index_dir) for path in allowlists]
+        self.reload_interval = reload_interval
+        self.checked_at = time.monotonic()
+        self.reload_lock = threading.Lock()
+        for hash_list in self.lists:
+            hash_list.load()
+
+    def lookup(self, url):
+        """
+        Look a URL up in the lists
+
+        The most specific entry wins (URL before domain, subdomain before
+        parent); at the same level a blocklist entry beats an allowlist one.
+
+        Returns:
+            ReputationHit or None
+        """
+        self._maybe_reload()
+        for key in lookup_keys(url):
+            hashed = np.uint64(key_hash(key))
+            hits = [hash_list for hash_list in self.lists if hashed in hash_list]
+            if hits:
+                hit = next((hash_list for hash_list in hits if hash_list.verdict == 'block'), hits[0])
+                REPUTATION_LOOKUPS.labels(hit.verdict).inc()
+                return ReputationHit(hit.verdict, key[2:], hit.name)
+        REPUTATION_LOOKUPS.labels('miss').inc()
+        return None
+
+    def _maybe_reload(self):
+        if not self.reload_interval or time.monotonic() - self.checked_at < self.reload_interval:
+            return
+        if not self.reload_lock.acquire(blocking=False):
+            return  # Another thread is already checking
+        try:
+            self.checked_at = time.monotonic()
+            for hash_list in self.lists:
+                if hash_list.changed():
+                    hash_list.load()
+        finally:
+            self.reload_lock.release()
+
+    def stats(self):
+        """Entries per list"""
+        return {hash_list.name: {'verdict': hash_list.verdict, 'entries': len(hash_list)} for hash_list in self.lists}
+
+
+def create_reputation_index():
+    """
+    Build a ReputationIndex from Config settings
+
+    Returns:
+        ReputationIndex or None when no lists are configured
+    """
+    blocklists = [path.strip() for path in Config.REPUTATION_BLOCKLISTS.split(',') if path.strip()]
+    allowlists = [path.strip() for path in Config.REPUTATION_ALLOWLISTS.split(',') if path.strip()]
+    if not blocklists and not allowlists:
+        return None
+    return ReputationIndex(
+        blocklists,
+        allowlists,
+        index_dir=Config.REPUTATION_INDEX_DIR,
+        reload_interval=Config.REPUTATION_RELOAD_INTERVAL
+    )
@@ -0,0 +1,258 @@
+"""
+Analysis Result Cache
+Content-addressed cache for /analyze responses with TTL and LRU eviction
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from config import Config
+from telemetry import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.time() + ttl, copy.deepcopy(value))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteCacheBackend:
+    """SQLite-backed cache that several worker processes can share"""
+
+    def __init__(self, path, max_entries=10000, table='analysis_cache'):
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self.local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_last_access"
+                f" ON {self.table} (last_access)"
+            )
+
+    def _connection(self):
+        """One connection per thread; WAL lets readers and a writer overlap"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at <= now:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+
+            conn.execute(
+                f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                (now, key)
+            )
+        return json.loads(value)
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now)
+            )
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY last_access DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        row = self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return row[0]
+
+
+class AnalysisCache:
+    """Cache of full analysis responses keyed on the normalized message"""
+
+    def __init__(self, backend, ttl=3600):
+        """
+        Initialize cache
+
+        Args:
+            backend: Storage backend (MemoryCacheBackend or SQLiteCacheBackend)
+            ttl: Seconds each entry stays valid
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(message):
+        """Normalize unicode form and whitespace so trivial variants share a key"""
+        message = unicodedata.normalize('NFKC', message)
+        return ' '.join(message.split())
+
+    def make_key(self, message, include_lime):
+        """
+        Build the cache key for a request
+
+        Args:
+            message: Raw message text
+            include_lime: Whether the response includes a LIME explanation
+
+        Returns:
+            str: SHA-256 hex digest
+        """
+        payload = f"{int(bool(include_lime))}\x00{self.normalize(message)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, message, include_lime):
+        """Return a cached response dict, or None on a miss"""
+        try:
+            value = self.backend.get(self.make_key(message, include_lime))
+        except Exception as e:
+            logger.warning("Cache read error: %s", e)
+            value = None
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache_lookup('analysis', value is not None)
+        return value
+
+    def set(self, message, include_lime, response):
+        """Store a response dict"""
+        try:
+            self.backend.set(self.make_key(message, include_lime), response, self.ttl)
+        except Exception as e:
+            logger.warning("Cache write error: %s", e)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        try:
+            size = len(self.backend)
+        except Exception:
+            size = None
+
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0,
+            'size': size,
+            'ttl_seconds': self.ttl
+        }
+
+
+def create_cache_backend(backend, max_entries, path, table='analysis_cache'):
+    """
+    Build a storage backend by name
+
+    Args:
+        backend: 'memory', 'sqlite' or 'none'
+        max_entries: LRU bound
+        path: SQLite file path (sqlite only)
+        table: SQLite table name, so several caches can share one file
+
+    Returns:
+        MemoryCacheBackend, SQLiteCacheBackend or None when disabled
+    """
+    backend = backend.lower()
+    if backend == 'memory':
+        return MemoryCacheBackend(max_entries)
+    if backend == 'sqlite':
+        return SQLiteCacheBackend(path, max_entries, table)
+    return None
+
+
+def create_analysis_cache(backend=None, ttl=None, max_entries=None, path=None):
+    """
+    Build an AnalysisCache from Config settings
+
+    Returns:
+        AnalysisCache or None when caching is disabled
+    """
+    storage = create_cache_backend(
+        backend or Config.RESULT_CACHE_BACKEND,
+        max_entries or Config.RESULT_CACHE_MAX_ENTRIES,
+        path or Config.RESULT_CACHE_PATH
+    )
+    if storage is None:
+        return None
+    return AnalysisCache(storage, ttl or Config.RESULT_CACHE_TTL)
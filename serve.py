@@ -0,0 +1,133 @@
+"""
+SmishGuard multi-process server
+Runs several worker processes that share one copy of the model weights
+
+The parent loads the DistilBERT weights (detector.preload), then forks the
+workers. Inference never writes to the weights, so copy-on-write keeps a
+single physical copy: N workers cost roughly the memory of one plus their
+own Python heaps. All workers accept connections on one listening socket,
+and each limits torch to its share of the cores.
+
+/metrics is answered by whichever worker takes the request. Set
+PROMETHEUS_MULTIPROC_DIR to an empty directory to aggregate counters and
+histograms across workers; the VirusTotal quota and queue gauges are
+summed over live workers.
+
+Usage:
+    python serve.py                          # WORKERS workers on HOST:PORT
+    python serve.py --workers 4 --threads 2  # 4 workers x 2 torch threads
+
+Only the model is built before fork. Everything that owns threads, sockets
+or SQLite connections (schedulers, thread pools, HTTP sessions, caches) is
+created inside each worker when it imports app.py. The parent never runs a
+forward pass, because OpenMP thread pools do not survive fork. ONNX
+backends build their sessions per worker.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+from config import Config
+from telemetry import configure_logging
+
+logger = logging.getLogger('serve')
+
+
+def worker_main(fd, host, port, threads):
+    """Entry point of a forked worker: set thread limits, build the app, serve"""
+    import torch
+    from werkzeug.serving import make_server
+
+    torch.set_num_threads(threads)
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+
+    from app import app
+    server = make_server(host, port, app, threaded=True, fd=fd)
+    logger.info("Worker serving", extra={'pid': os.getpid(), 'torch_threads': threads})
+    server.serve_forever()
+
+
+def spawn(fd, host, port, threads):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            worker_main(fd, host, port, threads)
+        except BaseException as e:
+            logger.error("Worker %d exited: %s", os.getpid(), e)
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve SmishGuard with several worker processes')
+    parser.add_argument('--workers', type=int, default=Config.WORKERS)
+    parser.add_argument('--threads', type=int, default=Config.TORCH_NUM_THREADS,
+                        help='Torch threads per worker (0 = cores / workers)')
+    parser.add_argument('--host', default=Config.HOST)
+    parser.add_argument('--port', type=int, default=Config.PORT)
+    args = parser.parse_args()
+    configure_logging(Config.LOG_LEVEL, Config.LOG_FORMAT)
+
+    workers = max(1, args.workers)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    logger.info("Preloading model", extra={'workers': workers, 'host': args.host, 'port': args.port})
+    import detector
+    detector.preload()
+
+    # Move everything allocated so far out of the collector's reach, so
+    # gc passes in the workers do not touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    children = {spawn(sock.fileno(), args.host, args.port, threads) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Supervise: replace workers that die until asked to stop
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(pid)
+        if not stopping:
+            logger.warning("Worker %d died (status %d) - restarting", pid, status)
+            children.add(spawn(sock.fileno(), args.host, args.port, threads))
+
+    sock.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Startup
+Lazy or background construction of heavy components, with readiness and timings
+
+Modes:
+    background  Build components on a thread right after import (default);
+                pages are served immediately and /ready turns 200 once done
+    eager       Build everything before the app finishes importing
+    lazy        Build each component on first use; /ready is always 200
+
+A component whose factory raises is rebuilt on a timer with exponential
+backoff, and its warmup runs once it succeeds. /ready reports 503 until then.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentUnavailable(Exception):
+    """A component is still loading (or failed to load)"""
+
+
+class Component:
+    """One named component and its load state"""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.instance = None
+        self.state = 'pending'
+        self.error = None
+        self.seconds = None
+        self.attempts = 0
+        self.loaded = threading.Event()
+
+
+class LazyComponent:
+    """Stand-in that forwards attribute access to the component once it is built"""
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attribute):
+        return getattr(self._registry.get(self._name), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._registry.get(self._name), attribute, value)
+
+
+class ComponentRegistry:
+    """Builds registered components in order and tracks readiness"""
+
+    def __init__(self, mode='background', warmup=True, wait_timeout=30, retry_delay=1.0, retry_max_delay=60.0):
+        """
+        Initialize registry
+
+        Args:
+            mode: 'background', 'eager' or 'lazy'
+            warmup: Run warmup steps after all components are built
+            wait_timeout: Seconds a request waits for a component still loading
+            retry_delay: Seconds before rebuilding a failed component (doubles per failure)
+            retry_max_delay: Cap on the retry delay
+        """
+        if mode not in ('background', 'eager', 'lazy'):
+            raise ValueError(f"Unknown startup mode '{mode}' (choose from background, eager, lazy)")
+        self.mode = mode
+        self.warmup_enabled = warmup and mode != 'lazy'
+        self.wait_timeout = wait_timeout
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.components = {}
+        self.warmups = []
+        self.warmup_timings = {}
+        self.lock = threading.Lock()
+        self.created_at = time.perf_counter()
+        self.ready_at = None
+        self.ready_event = threading.Event()
+
+    def register(self, name, factory):
+        """
+        Register a component
+
+        Args:
+            name: Component name
+            factory: Zero-argument callable that builds it (imports included)
+
+        Returns:
+            LazyComponent: Proxy usable in place of the component
+        """
+        self.components[name] = Component(name, factory)
+        return LazyComponent(self, name)
+
+    def add_warmup(self, name, func):
+        """Register a warmup step run once every component is built"""
+        self.warmups.append((name, func))
+
+    def start(self):
+        """Begin initialization according to the mode"""
+        if self.mode == 'eager':
+            self.initialize()
+        elif self.mode == 'background':
+            threading.Thread(target=self.initialize, name='startup', daemon=True).start()
+        else:
+            self._mark_ready()
+
+    def initialize(self):
+        """Build every component, then run the warmup steps"""
+        for component in self.components.values():
+            self._build(component)
+
+        for name, component in self.components.items():
+            if component.state == 'ready':
+                self._warm(name)
+
+        self._mark_ready()
+        self._log_timings()
+
+    def _warm(self, name):
+        """Run the warmup steps registered for one component"""
+        if not self.warmup_enabled:
+            return
+        for warmup_name, func in self.warmups:
+            if warmup_name != name:
+                continue
+            started = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                logger.warning("Warmup '%s' failed: %s", name, e)
+            self.warmup_timings[name] = time.perf_counter() - started
+
+    def _build(self, component):
+        with self.lock:
+            if component.state != 'pending':
+                return
+            component.state = 'loading'
+
+        started = time.perf_counter()
+        component.attempts += 1
+        try:
+            component.instance = component.factory()
+            component.error = None
+            component.state = 'ready'
+        except Exception as e:
+            delay = min(self.retry_max_delay, self.retry_delay * 2 ** (component.attempts - 1))
+            logger.error("Failed to initialize %s (attempt %d, retrying in %.1fs): %s", component.name, component.attempts, delay, e)
+            component.error = str(e)
+            component.state = 'failed'
+            retry = threading.Timer(delay, self._retry, (component,))
+            retry.daemon = True
+            retry.start()
+        component.seconds = time.perf_counter() - started
+        component.loaded.set()
+
+    def _retry(self, component):
+        """Rebuild a failed component; warm it up if startup already finished"""
+        with self.lock:
+            if component.state != 'failed':
+                return
+            component.state = 'pending'
+        self._build(component)
+        if component.state == 'ready' and self.ready_event.is_set():
+            self._warm(component.name)
+            logger.info("Startup component", extra={'component': component.name, 'state': component.state, 'attempts': component.attempts})
+
+    def _mark_ready(self):
+        self.ready_at = time.perf_counter()
+        self.ready_event.set()
+
+    def get(self, name):
+        """
+        Return a built component, building (lazy) or waiting (background) as needed
+
+        Raises:
+            ComponentUnavailable: Still loading after wait_timeout, or failed
+        """
+        component = self.components[name]
+        if component.instance is None:
+            if self.mode == 'lazy':
+                self._build(component)
+            component.loaded.wait(self.wait_timeout)
+
+        if component.instance is None:
+            if component.state == 'failed':
+                raise ComponentUnavailable(f"{name} failed to initialize: {component.error}")
+            raise ComponentUnavailable(f"{name} is still loading")
+        return component.instance
+
+    @property
+    def ready(self):
+        return self.ready_event.is_set() and not any(
+            component.state == 'failed' for component in self.components.values()
+        )
+
+    def status(self):
+        """Readiness and per-component startup timings"""
+        return {
+            'ready': self.ready,
+            'mode': self.mode,
+            'startup_seconds': self.ready_at - self.created_at if self.ready_at else None,
+            'uptime_seconds': time.perf_counter() - self.created_at,
+            'components': {
+                name: {
+                    'state': component.state,
+                    'seconds': component.seconds,
+                    **({'error': component.error, 'attempts': component.attempts} if component.error else {})
+                }
+                for name, component in self.components.items()
+            },
+            'warmup': self.warmup_timings
+        }
+
+    def _log_timings(self):
+        for name, component in self.components.items():
+            logger.info("Startup component", extra={'component': name, 'state': component.state, 'seconds': round(component.seconds, 3)})
+        for name, seconds in self.warmup_timings.items():
+            logger.info("Startup warmup", extra={'component': name, 'seconds': round(seconds, 3)})
+        logger.info("Startup complete", extra={'mode': self.mode, 'seconds': round(self.ready_at - self.created_at, 3)})
@@ -358,23 +358,15 @@ async function analyzeMessageML() {
     }
 
     try {
-        const response = await fetch('/analyze', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ 
-                message: message,
-                include_lime: true
-            })
-        });
-
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error || 'Analysis failed');
+        let analysis;
+        if (window.EventSource) {
+            // Render the verdict as soon as it arrives, then fill in URLs and LIME
+            analysis = await streamAnalysis(message, () => {
+                if (loading) loading.classList.add('hidden');
+            });
+        } else {
+            analysis = await fetchAnalysis(message);
         }
-
-        const analysis = await response.json();
         console.log('Analysis response:', analysis);
         displayMLResults(analysis);
         
@@ -408,6 +400,79 @@ async function analyzeMessageML() {
     }
 }
 
+// Analyze in a single blocking request
+async function fetchAnalysis(message) {
+    const response = await fetch('/analyze', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ 
+            message: message,
+            include_lime: true
+        })
+    });
+
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.error || 'Analysis failed');
+    }
+
+    return response.json();
+}
+
+// Start a background analysis job and render each partial result as it streams in
+async function streamAnalysis(message, onFirstResult) {
+    const response = await fetch('/analyze/jobs', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ 
+            message: message,
+            include_lime: true
+        })
+    });
+
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.error || 'Analysis failed');
+    }
+
+    const job = await response.json();
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(job.events_url);
+        let analysis = {};
+        let finished = false;
+
+        const render = (update) => {
+            if (!analysis.prediction) onFirstResult();
+            analysis = Object.assign({}, analysis, update);
+            displayMLResults(analysis);
+        };
+
+        source.addEventListener('verdict', (e) => render(JSON.parse(e.data)));
+        source.addEventListener('urls', (e) => render(Object.assign(JSON.parse(e.data), { urls_pending: false })));
+        source.addEventListener('explanation', (e) => render(Object.assign(JSON.parse(e.data), { explanation_pending: false })));
+        source.addEventListener('complete', (e) => {
+            finished = true;
+            source.close();
+            resolve(JSON.parse(e.data));
+        });
+        source.addEventListener('failed', (e) => {
+            finished = true;
+            source.close();
+            reject(new Error(JSON.parse(e.data).error || 'Analysis failed'));
+        });
+        source.onerror = () => {
+            if (finished) return;
+            source.close();
+            reject(new Error('Analysis failed'));
+        };
+    });
+}
+
 function displayMLResults(analysis) {
     const resultsPanel = document.getElementById('resultsPanel');
     const riskLevel = document.getElementById('riskLevel');
@@ -448,7 +513,13 @@ function displayMLResults(analysis) {
     if (explanation) {
         let virusTotalSection = '';
         
-        if (analysis.url_scan_results && analysis.url_scan_results.length > 0) {
+        if (analysis.urls_pending) {
+            virusTotalSection = `
+                <div style="margin-top: 1.5rem; padding: 1rem; background: #f8fafc; border-radius: 8px; border-left: 4px solid #3b82f6;">
+                    <p style="color: #1e40af; margin: 0; font-size: 0.95rem;">🔍 Scanning ${analysis.urls_found} URL(s) with VirusTotal...</p>
+                </div>
+            `;
+        } else if (analysis.url_scan_results && analysis.url_scan_results.length > 0) {
             virusTotalSection = `
                 <div style="margin-top: 1.5rem; padding: 1.25rem; background: #f8fafc; border-radius: 8px; border-left: 4px solid #3b82f6;">
                     <h4 style="color: #1e40af; margin-bottom: 1rem; font-size: 1.1rem; display: flex; align-items: center; gap: 0.5rem;">
@@ -524,6 +595,12 @@ function displayMLResults(analysis) {
                     analysis.prediction
                 );
             }
+        } else if (analysis.explanation_pending) {
+            limeSection = `
+                <div style="margin-top: 1.5rem; padding: 1rem; background: #fefce8; border-radius: 8px; border-left: 4px solid #eab308;">
+                    <p style="color: #854d0e; margin: 0; font-size: 0.95rem;">🔬 Generating AI explanation...</p>
+                </div>
+            `;
         }
         
         explanation.innerHTML = `
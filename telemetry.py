@@ -0,0 +1,213 @@
+"""
+Telemetry
+Structured logging, per-stage timing spans and Prometheus metrics
+
+Spans record into the smishguard_stage_duration_seconds histogram and,
+inside collect_timings(), into a per-request Timings block that /analyze
+can return. Work handed to thread pools keeps the request's block when it
+is submitted through submit_in_context().
+
+Gauges are set explicitly, never through set_function callbacks, so the
+multiprocess collector can export them; each declares how worker values
+combine. Cache hit ratios come from the lookup counter in the query:
+
+    sum by (cache) (rate(smishguard_cache_lookups_total{result="hit"}[5m]))
+      / sum by (cache) (rate(smishguard_cache_lookups_total[5m]))
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = Histogram(
+    'smishguard_stage_duration_seconds',
+    'Time spent in each analysis stage',
+    ['stage'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+CACHE_LOOKUPS = Counter(
+    'smishguard_cache_lookups_total',
+    'Cache lookups by cache and result',
+    ['cache', 'result']
+)
+VT_REQUESTS = Counter(
+    'smishguard_vt_requests_total',
+    'VirusTotal HTTP requests by call and status code',
+    ['call', 'status']
+)
+VT_RETRIES = Counter(
+    'smishguard_vt_retries_total',
+    'VirusTotal requests repeated after a 429/5xx or a pending analysis',
+    ['reason']
+)
+VT_QUOTA_USED = Counter(
+    'smishguard_vt_quota_used_total',
+    'VirusTotal rate-limit tokens spent'
+)
+VT_QUOTA_AVAILABLE = Gauge(
+    'smishguard_vt_quota_available',
+    'VirusTotal requests left in the minute bucket and the daily quota',
+    ['window'],
+    multiprocess_mode='livesum'
+)
+VT_QUEUE_DEPTH = Gauge(
+    'smishguard_vt_queue_depth',
+    'URL scans waiting in the VirusTotal scheduler',
+    multiprocess_mode='livesum'
+)
+VT_QUEUE_WAIT = Histogram(
+    'smishguard_vt_queue_wait_seconds',
+    'Time a URL scan waits in the VirusTotal scheduler queue',
+    ['priority'],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 15, 30, 60, 120)
+)
+VT_SCHEDULED = Counter(
+    'smishguard_vt_scheduled_total',
+    'URL scans by outcome (local, deduplicated, scanned, pending)',
+    ['outcome']
+)
+REPUTATION_LOOKUPS = Counter(
+    'smishguard_reputation_lookups_total',
+    'Local reputation index lookups by result (block, allow or miss)',
+    ['result']
+)
+CASCADE_DECISIONS = Counter(
+    'smishguard_cascade_decisions_total',
+    'Model verdicts by the cascade stage that decided (lexical or transformer)',
+    ['stage']
+)
+MODEL_BATCH_SIZE = Histogram(
+    'smishguard_model_batch_size',
+    'Texts per model forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+SCHEDULER_BATCH_SIZE = Histogram(
+    'smishguard_scheduler_batch_size',
+    'Texts scored per scheduler batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+SCHEDULER_QUEUE_WAIT = Histogram(
+    'smishguard_scheduler_queue_wait_seconds',
+    'Time a scoring request waits in the micro-batching queue',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+)
+
+_timings = contextvars.ContextVar('timings', default=None)
+
+
+class Timings:
+    """Milliseconds per stage for one request; repeated stages are summed"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds * 1000
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: {'total_ms', 'stages': {stage: ms}, 'counts': {stage: spans}}
+        """
+        with self.lock:
+            return {
+                'total_ms': round(1000 * (time.perf_counter() - self.started), 1),
+                'stages': {stage: round(ms, 1) for stage, ms in self.stages.items()},
+                'counts': dict(self.counts)
+            }
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Time a block into the stage histogram and the current request's Timings"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(stage, elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("span", extra={'stage': stage, 'ms': round(elapsed * 1000, 2)})
+
+
+@contextlib.contextmanager
+def collect_timings():
+    """Collect the spans of the enclosed block (and work submitted from it)"""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def submit_in_context(pool, func, *args):
+    """executor.submit that carries the caller's Timings into the worker thread"""
+    return pool.submit(contextvars.copy_context().run, func, *args)
+
+
+def record_cache_lookup(cache, hit):
+    """Count a cache hit or miss (the hit ratio is derived from this counter)"""
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+
+    reserved = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in self.reserved})
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain log lines with extra= fields appended as key=value"""
+
+    def format(self, record):
+        line = super().format(record)
+        extras = {key: value for key, value in vars(record).items() if key not in JsonFormatter.reserved}
+        if extras:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in extras.items())
+        return line
+
+
+def configure_logging(level='INFO', fmt='text'):
+    """
+    Configure the root logger once
+
+    Args:
+        level: Log level name
+        fmt: 'text' or 'json'
+    """
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
@@ -1,47 +1,203 @@
 """
 Message Translator Module
 Handles language detection and translation
+
+Engines:
+    google      Remote Google Translate through deep_translator (default)
+    marian      Local MarianMT-style seq2seq model on CPU (works offline)
 """
+import hashlib
+import logging
 import re
+import threading
+from concurrent.futures import Future
 from deep_translator import GoogleTranslator
+from config import Config
+from result_cache import create_cache_backend
+from telemetry import record_cache_lookup, span
+
+logger = logging.getLogger(__name__)
+
+
+class GoogleTranslateEngine:
+    """Remote Google Translate, one request per text"""
+
+    name = 'google'
+
+    def __init__(self):
+        # GoogleTranslator keeps request params on the instance, so each
+        # thread reuses its own client per language pair
+        self.local = threading.local()
+
+    def _client(self, source_lang, target_lang):
+        """Reusable GoogleTranslator for this thread and language pair"""
+        clients = getattr(self.local, 'clients', None)
+        if clients is None:
+            clients = self.local.clients = {}
+
+        client = clients.get((source_lang, target_lang))
+        if client is None:
+            client = clients[(source_lang, target_lang)] = GoogleTranslator(source=source_lang, target=target_lang)
+        return client
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        client = self._client(source_lang, target_lang)
+        return [client.translate(text) for text in texts]
+
+
+class MarianTranslateEngine:
+    """Local seq2seq translation model, loaded on first use"""
+
+    name = 'marian'
+
+    def __init__(self, model_path, source_lang='ar', target_lang='en', max_length=256, batch_size=16, num_beams=1):
+        """
+        Initialize engine (the model itself is loaded lazily)
+
+        Args:
+            model_path: Local directory or hub id of an ar->en seq2seq model
+            source_lang: Language the model translates from
+            target_lang: Language the model translates into
+            max_length: Cap on input and generated tokens per text
+            batch_size: Texts per generate() call
+            num_beams: Beam width (1 = greedy, fastest on CPU)
+        """
+        self.model_path = model_path
+        self.pair = (source_lang, target_lang)
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.num_beams = num_beams
+        self.model = None
+        self.tokenizer = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Load tokenizer and model once; later calls are no-ops"""
+        with self.lock:
+            if self.model is not None:
+                return
+
+            import torch
+            from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+            logger.info("Loading translation model from %s", self.model_path)
+            self.torch = torch
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_path)
+            self.model.eval()
+            logger.info("Translation model loaded")
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        if (source_lang, target_lang) != self.pair:
+            raise ValueError(f"Translation model only supports {self.pair[0]}->{self.pair[1]}")
+
+        self.load()
+
+        # Sort by length so each generate() call pads as little as possible
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        translated = [None] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            batch = self.tokenizer(
+                [texts[i] for i in indices],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors='pt'
+            )
+
+            # One generate() at a time; concurrent calls would only fight over the CPU
+            with self.lock, self.torch.inference_mode():
+                output = self.model.generate(**batch, max_new_tokens=self.max_length, num_beams=self.num_beams)
+
+            for i, text in zip(indices, self.tokenizer.batch_decode(output, skip_special_tokens=True)):
+                translated[i] = text
+
+        return translated
+
+
+TRANSLATION_ENGINES = {
+    engine.name: engine
+    for engine in (GoogleTranslateEngine, MarianTranslateEngine)
+}
+
+
+def create_translation_engine(name=None):
+    """
+    Build a translation engine from Config settings
+
+    Args:
+        name: One of TRANSLATION_ENGINES (default: Config.TRANSLATION_ENGINE)
+    """
+    name = name or Config.TRANSLATION_ENGINE
+    if name == 'marian':
+        return MarianTranslateEngine(
+            Config.TRANSLATION_MODEL_PATH,
+            max_length=Config.TRANSLATION_MAX_LENGTH,
+            batch_size=Config.TRANSLATION_BATCH_SIZE,
+            num_beams=Config.TRANSLATION_NUM_BEAMS
+        )
+    if name not in TRANSLATION_ENGINES:
+        raise ValueError(f"Unknown translation engine '{name}' (choose from {', '.join(TRANSLATION_ENGINES)})")
+    return TRANSLATION_ENGINES[name]()
 
 
 class MessageTranslator:
     """Handles message translation from Arabic to English"""
-    
-    def __init__(self, source='auto', target='en'):
+
+    def __init__(self, engine=None, cache_backend=None):
         """
         Initialize translator
-        
+
         Args:
-            source: Source language (default: 'auto' for auto-detect)
-            target: Target language (default: 'en' for English)
+            engine: Translation engine name or instance (default: Config.TRANSLATION_ENGINE)
+            cache_backend: Translation cache storage (default: from Config)
         """
-        self.translator = GoogleTranslator(source=source, target=target)
+        if engine is None or isinstance(engine, str):
+            engine = create_translation_engine(engine)
+        self.engine = engine
         self.arabic_pattern = re.compile(r'[\u0600-\u06FF]')
-    
+
+        if cache_backend is None:
+            cache_backend = create_cache_backend(
+                Config.TRANSLATION_CACHE_BACKEND,
+                Config.TRANSLATION_CACHE_MAX_ENTRIES,
+                Config.TRANSLATION_CACHE_PATH,
+                table='translation_cache'
+            )
+        self.cache = cache_backend
+        self.cache_ttl = Config.TRANSLATION_CACHE_TTL
+
+        # Translations currently running, keyed like the cache
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
     def detect_language(self, text):
         """
         Detect if text is Arabic or English
-        
+
         Args:
             text: Text to analyze
-            
+
         Returns:
             str: 'ar' for Arabic, 'en' for English
         """
         has_arabic = bool(self.arabic_pattern.search(text))
         return 'ar' if has_arabic else 'en'
-    
+
     def translate(self, text, source_lang='ar', target_lang='en'):
         """
         Translate text from source to target language
-        
+
         Args:
             text: Text to translate
             source_lang: Source language code
             target_lang: Target language code
-            
+
         Returns:
             dict: Translation result with original, translated text, and metadata
         """
@@ -52,16 +208,141 @@ class MessageTranslator:
                 'source_lang': 'en',
                 'needs_translation': False
             }
-        
+
+        key = self.make_key(text, source_lang, target_lang)
+        with span('translate'):
+            translated_text = self._cache_get(key)
+            cached = translated_text is not None
+
+            if not cached:
+                translated_text = self._translate_once(key, text, source_lang, target_lang)
+                if translated_text is None:
+                    return None
+
+        return self._result(text, translated_text, source_lang, cached)
+
+    def translate_batch(self, texts, source_lang='ar', target_lang='en'):
+        """
+        Translate several texts, sending only uncached ones to the engine in one batch
+
+        Returns:
+            list: Translation result dicts in input order (None where translation failed)
+        """
+        keys = [self.make_key(text, source_lang, target_lang) for text in texts]
+        translations = {key: self._cache_get(key) for key in set(keys)}
+        missing = {key: text for key, text in zip(keys, texts) if translations[key] is None}
+        cached = {key for key, value in translations.items() if value is not None}
+
+        if missing:
+            try:
+                with span('translate'):
+                    output = self.engine.translate_batch(list(missing.values()), source_lang, target_lang)
+            except Exception as e:
+                logger.error("Translation error: %s", e)
+                output = [None] * len(missing)
+
+            for key, translated_text in zip(missing, output):
+                translations[key] = translated_text
+                self._cache_set(key, translated_text)
+
+        return [
+            self._result(text, translations[key], source_lang, key in cached)
+            if translations[key] is not None else None
+            for key, text in zip(keys, texts)
+        ]
+
+    def warmup(self):
+        """Load a local engine's model and run one generation; remote engines are left alone"""
+        if hasattr(self.engine, 'load'):
+            self.engine.translate_batch(['مرحبا، تم شحن طلبك'], 'ar', 'en')
+
+    def _result(self, text, translated_text, source_lang, cached):
+        return {
+            'original': text,
+            'translated': translated_text,
+            'source_lang': source_lang,
+            'needs_translation': True,
+            'translation_engine': self.engine.name,
+            'translation_cached': cached
+        }
+
+    def make_key(self, text, source_lang, target_lang):
+        """SHA-256 of the engine, language pair and source text"""
+        payload = f"{self.engine.name}\x00{source_lang}\x00{target_lang}\x00{text}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _translate_once(self, key, text, source_lang, target_lang):
+        """
+        Translate text, sharing one remote call between concurrent callers
+
+        Returns:
+            str: Translated text, or None if the translation failed
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        translated_text = None
         try:
-            translated_text = GoogleTranslator(source='ar', target='en').translate(text)
-            
-            return {
-                'original': text,
-                'translated': translated_text,
-                'source_lang': source_lang,
-                'needs_translation': True
-            }
+            translated_text = self.engine.translate_batch([text], source_lang, target_lang)[0]
+            self._cache_set(key, translated_text)
         except Exception as e:
-            print(f"Translation error: {e}")
-            return None
\ No newline at end of file
+            logger.error("Translation error: %s", e)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_result(translated_text)
+
+        return translated_text
+
+    def _cache_get(self, key):
+        value = None
+        if self.cache is not None:
+            try:
+                value = self.cache.get(key)
+            except Exception as e:
+                logger.warning("Translation cache read error: %s", e)
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache_lookup('translation', value is not None)
+        return value
+
+    def _cache_set(self, key, translated_text):
+        if self.cache is None or translated_text is None:
+            return
+        try:
+            self.cache.set(key, translated_text, self.cache_ttl)
+        except Exception as e:
+            logger.warning("Translation cache write error: %s", e)
+
+    def stats(self):
+        """Translation cache and coalescing counters"""
+        with self.lock:
+            hits, misses, coalesced = self.hits, self.misses, self.coalesced
+        total = hits + misses
+        try:
+            size = len(self.cache) if self.cache is not None else 0
+        except Exception:
+            size = None
+
+        return {
+            'engine': self.engine.name,
+            'backend': type(self.cache).__name__ if self.cache is not None else None,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0,
+            'coalesced': coalesced,
+            'size': size,
+            'ttl_seconds': self.cache_ttl
+        }
@@ -0,0 +1,340 @@
+"""
+URL Extractor
+Fast, backtracking-safe URL extraction and normalization for SMS text
+
+Handles URLs with or without a scheme, www. hosts, IP literals, URL
+shorteners, internationalized domains and common defanging (hxxp://,
+example[.]com, [dot], [:]). Hosts are validated against a TLD table, so
+"Mr.Smith" or "file.txt" are not URLs.
+
+The candidate pattern is compiled once and can only start after a
+non-word character, and each label is bounded. A match attempt therefore
+costs at most one pass over its token, and extraction is linear in the
+message length. Run this module directly to benchmark it on adversarial
+input.
+
+Usage:
+    python url_extractor.py                 # microbenchmark vs the old regex
+    python url_extractor.py --sizes 1000,100000
+"""
+import argparse
+import re
+import sys
+import time
+from urllib.parse import urlsplit, urlunsplit
+from config import Config
+
+# ISO 3166 country-code TLDs plus the generic TLDs seen in SMS traffic
+COUNTRY_TLDS = (
+    'ac ad ae af ag ai al am ao aq ar as at au aw ax az ba bb bd be bf bg bh bi bj bm bn bo br bs bt bw by bz '
+    'ca cc cd cf cg ch ci ck cl cm cn co cr cu cv cw cx cy cz de dj dk dm do dz ec ee eg er es et eu fi fj fk '
+    'fm fo fr ga gd ge gf gg gh gi gl gm gn gp gq gr gs gt gu gw gy hk hm hn hr ht hu id ie il im in io iq ir '
+    'is it je jm jo jp ke kg kh ki km kn kp kr kw ky kz la lb lc li lk lr ls lt lu lv ly ma mc md me mg mh mk '
+    'ml mm mn mo mp mq mr ms mt mu mv mw mx my mz na nc ne nf ng ni nl no np nr nu nz om pa pe pf pg ph pk pl '
+    'pm pn pr ps pt pw py qa re ro rs ru rw sa sb sc sd se sg sh si sk sl sm sn so sr ss st su sv sx sy sz tc '
+    'td tf tg th tj tk tl tm tn to tr tt tv tw tz ua ug uk us uy uz va vc ve vg vi vn vu wf ws ye yt za zm zw'
+)
+GENERIC_TLDS = (
+    'com net org info biz edu gov mil int name pro mobi asia tel travel jobs aero coop museum cat post xxx '
+    'app dev page xyz top club online site website store shop live life icu buzz vip win bid loan work click '
+    'link fun space tech today world email cloud digital support help services center network solutions '
+    'group company business finance bank money cash pay credit capital financial insurance security '
+    'rest best monster cyou sbs cfd lol mom bond quest beauty hair skin makeup autos boats homes yachts '
+    'ltd gdn men review party date trade science faith racing download stream accountant cricket kim '
+    'country news blog media social chat one zone red pink blue plus fit tips guru agency express delivery '
+    'global inc llc game games casino bet poker gift gifts deals sale discount promo free codes coupons '
+    'wang ren xin tokyo moscow dubai arab'
+)
+# Arabic-script IDN TLDs (punycode): امارات السعودية مصر قطر الاردن المغرب الجزائر تونس عمان فلسطين عراق سورية
+IDN_TLDS = (
+    'xn--mgbaam7a8h xn--mgberp4a5d4ar xn--wgbh1c xn--wgbl6a xn--mgbayh7gpa xn--mgbc0a9azcg xn--lgbbat1ad8j '
+    'xn--pgbs0dh xn--mgb9awbf xn--ygbi2ammx xn--mgbtx2b xn--ogbpf8fl'
+)
+SHORTENERS = (
+    'bit.ly bitly.com t.co tinyurl.com goo.gl ow.ly is.gd v.gd buff.ly rebrand.ly cutt.ly shorturl.at '
+    'tiny.cc rb.gy t.ly s.id lnkd.in qrco.de shorturl.asia bl.ink short.io'
+)
+
+_DEFANGED = re.compile(r'\[\.\]|\(\.\)|\{\.\}|\[dot\]|\(dot\)|\[:\]|\[://\]|\bhxxp(?=s?(?::|\[:))', re.IGNORECASE)
+_REFANG = {'[.]': '.', '(.)': '.', '{.}': '.', '[dot]': '.', '(dot)': '.', '[:]': ':', '[://]': '://', 'hxxp': 'http'}
+
+# A start is only tried after a non-word, non-URL character (never inside a
+# token), labels are bounded and cannot contain '.', so there is no nested
+# ambiguity to backtrack over
+_URL = re.compile(
+    r'(?<![\w.@/-])'
+    r'(?:(?P<scheme>https?|ftp)://)?'
+    r'(?P<host>(?:\d{1,3}\.){3}\d{1,3}(?![\w.-])'
+    r'|(?:[^\W_][\w-]{0,62}\.)+(?P<tld>xn--[a-z0-9-]{1,59}|[^\W\d_]{2,63})(?![\w-]))'
+    r'(?P<port>:\d{1,5})?'
+    r'(?P<rest>[/?#][^\s<>"\'`{}|\\^]*)?',
+    re.IGNORECASE
+)
+_TRAILING = '.,;:!?\'"*'
+_DEFAULT_PORTS = {'http': '80', 'https': '443', 'ftp': '21'}
+
+# The previous per-call pattern, kept for the microbenchmark
+LEGACY_PATTERN = r'\b(?:(?:https?://)?(?:www\.)?)?[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?(?:[/?#][^\s]*)?\b'
+
+
+def refang(text):
+    """Undo common URL defanging: hxxp -> http, [.] / (.) / [dot] -> ., [:] -> :"""
+    if '[' not in text and '(' not in text and '{' not in text and 'xx' not in text.lower():
+        return text
+    return _DEFANGED.sub(lambda match: _REFANG[match.group(0).lower()], text)
+
+
+def mask_urls(text, token=' URL '):
+    """Replace every URL-like span (validated or not) with a placeholder token"""
+    return _URL.sub(token, refang(text))
+
+
+def _idna(host):
+    try:
+        return host.encode('idna').decode('ascii')
+    except UnicodeError:
+        return host
+
+
+def normalize_url(url):
+    """
+    Normalize a URL for use as a cache key
+
+    Refangs the URL and drops surrounding whitespace and trailing punctuation.
+    The scheme and host are lowercased, internationalized hosts are punycoded,
+    and a trailing dot on the host or a default port is removed. Path, query
+    and fragment are case-sensitive and kept as-is.
+    """
+    url = refang(url.strip()).rstrip(_TRAILING + ')')
+    has_scheme = '://' in url
+    parts = urlsplit(url if has_scheme else f"//{url}")
+    scheme = parts.scheme.lower()
+
+    userinfo, at, hostport = parts.netloc.rpartition('@')
+    host, colon, port = hostport.partition(':')
+    host = _idna(host.lower().rstrip('.'))
+    if port == _DEFAULT_PORTS.get(scheme):
+        port = ''
+    netloc = f"{userinfo}{at}{host}{':' + port if port else ''}"
+
+    normalized = urlunsplit((scheme, netloc, parts.path, parts.query, parts.fragment))
+    return normalized if has_scheme else normalized.lstrip('/')
+
+
+def url_host(url):
+    """Lowercased host of a URL found with or without a scheme"""
+    parts = urlsplit(url if '://' in url else f"//{url}")
+    return _idna((parts.hostname or '').rstrip('.'))
+
+
+def parse_domains(value):
+    """Comma- or whitespace-separated domain list from a config string"""
+    return [domain for domain in re.split(r'[,\s]+', value or '') if domain]
+
+
+class DomainSet:
+    """
+    Matches hosts against a domain list; a domain also covers its subdomains
+
+    A lookup walks the host's label suffixes (a.b.example.com, b.example.com,
+    example.com, com) through a frozenset, so the cost depends on the number
+    of labels, not on the size of the list.
+    """
+
+    def __init__(self, domains=()):
+        self.domains = frozenset(_idna(domain.strip().lower().strip('.')) for domain in domains if domain.strip())
+
+    def match(self, host):
+        """
+        Returns:
+            str: The listed domain covering host, or None
+        """
+        if not self.domains:
+            return None
+        host = host.lower().rstrip('.')
+        while host:
+            if host in self.domains:
+                return host
+            host = host.partition('.')[2]
+        return None
+
+    def __contains__(self, host):
+        return self.match(host) is not None
+
+    def __len__(self):
+        return len(self.domains)
+
+
+class URLExtractor:
+    """Extracts, validates and deduplicates URLs in message text"""
+
+    def __init__(self, skip_domains=None, allow_domains=None, extra_tlds=None):
+        """
+        Initialize extractor
+
+        Args:
+            skip_domains: Domains never extracted (placeholders such as example.com)
+            allow_domains: Trusted domains; extracted, but check_url skips VirusTotal
+            extra_tlds: TLDs accepted in addition to the built-in table
+        """
+        self.skip = DomainSet(parse_domains(Config.URL_SKIP_DOMAINS) if skip_domains is None else skip_domains)
+        self.allow = DomainSet(parse_domains(Config.URL_ALLOW_DOMAINS) if allow_domains is None else allow_domains)
+        self.shorteners = DomainSet(SHORTENERS.split())
+        self.tlds = frozenset(
+            (COUNTRY_TLDS + ' ' + GENERIC_TLDS + ' ' + IDN_TLDS).split()
+            + [tld.lower().lstrip('.') for tld in parse_domains(Config.URL_EXTRA_TLDS if extra_tlds is None else extra_tlds)]
+        )
+
+    def extract(self, text):
+        """
+        Extract URLs in order of appearance
+
+        URLs keep their original form (refanged, without trailing
+        punctuation); duplicates are detected on the normalized URL.
+
+        Returns:
+            list: Unique URLs found in text
+        """
+        if not text or ('.' not in text and '[dot]' not in text.lower() and '(dot)' not in text.lower()):
+            return []
+
+        urls = []
+        seen = set()
+        for match in _URL.finditer(refang(text)):
+            url = self._clean(match)
+            if url is None:
+                continue
+            key = normalize_url(url)
+            if key not in seen:
+                seen.add(key)
+                urls.append(url)
+        return urls
+
+    def extract_batch(self, texts):
+        """
+        Extract URLs from many texts, extracting each distinct text once
+
+        Returns:
+            list: One URL list per text
+        """
+        extracted = {}
+        results = []
+        for text in texts:
+            if text not in extracted:
+                extracted[text] = self.extract(text)
+            results.append(list(extracted[text]))
+        return results
+
+    def _clean(self, match):
+        """Validate one candidate and strip trailing punctuation; None if rejected"""
+        host = match.group('host').lower()
+        tld = match.group('tld')
+        if tld is not None:
+            if _idna(tld.lower()) not in self.tlds:
+                return None
+        elif not self._is_ip(host) or not (match.group('scheme') or match.group('port') or match.group('rest')):
+            # Bare dotted quads are usually version numbers or amounts
+            return None
+
+        if self.skip and _idna(host) in self.skip:
+            return None
+
+        url = match.group(0)
+        if match.group('rest'):
+            url = url.rstrip(_TRAILING)
+            # Keep a closing parenthesis only when the URL opened one
+            while url.endswith(')') and url.count(')') > url.count('('):
+                url = url[:-1].rstrip(_TRAILING)
+        return url if len(url) >= 4 else None
+
+    @staticmethod
+    def _is_ip(host):
+        return all(int(octet) <= 255 for octet in host.split('.'))
+
+    def is_allowed(self, url):
+        """Whether the URL's host is on the allow list"""
+        return bool(self.allow) and url_host(url) in self.allow
+
+    def is_shortener(self, url):
+        """Whether the URL points at a known link shortener"""
+        return url_host(url) in self.shorteners
+
+
+# =============================================================================
+# MICROBENCHMARK
+# =============================================================================
+
+def adversarial_inputs(size):
+    """Long inputs that make backtracking URL patterns go quadratic or worse"""
+    return {
+        'letters': 'a' * size,
+        'dotted_labels': 'a.' * (size // 2),
+        'hyphen_run': ('a-' * (size // 2)) + '.',
+        'dot_run': 'http://a' + '.' * size,
+        'spaced_words': 'aa.b ' * (size // 5),
+        'long_path': 'http://evil.com/' + 'a/' * (size // 2) + '!',
+        'defanged': 'hxxp://x[.]' * (size // 11),
+        'arabic': 'رابط.' * (size // 5),
+    }
+
+
+def _time(func, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_benchmark(sizes, repeat=3, include_legacy=True):
+    """
+    Time extraction on adversarial inputs of increasing size
+
+    Returns:
+        dict: {case: {'size': ..., 'seconds': ..., 'legacy_seconds': ...}} per size,
+              plus the growth factor between the two largest sizes
+    """
+    extractor = URLExtractor(skip_domains=[], allow_domains=[], extra_tlds='')
+    legacy = re.compile(LEGACY_PATTERN)
+    report = {}
+    for case in adversarial_inputs(sizes[0]):
+        rows = []
+        for size in sizes:
+            text = adversarial_inputs(size)[case]
+            row = {'size': len(text), 'seconds': _time(extractor.extract, text, repeat)}
+            if include_legacy:
+                row['legacy_seconds'] = _time(legacy.findall, text, repeat)
+            rows.append(row)
+        growth = rows[-1]['seconds'] / max(rows[-2]['seconds'], 1e-9) if len(rows) > 1 else None
+        report[case] = {'runs': rows, 'growth': growth}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark URL extraction on adversarial input')
+    parser.add_argument('--sizes', default='2000,20000', help='Comma-separated input lengths (characters)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-legacy', action='store_true', help='Skip the old pattern (slow on large sizes)')
+    parser.add_argument('--max-growth', type=float, default=3.0,
+                        help='Fail if time grows faster than this multiple of the size ratio')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = run_benchmark(sizes, args.repeat, not args.no_legacy)
+    size_ratio = sizes[-1] / sizes[-2] if len(sizes) > 1 else 1
+
+    failed = False
+    print(f"{'case':<14} {'chars':>9} {'extract ms':>11} {'legacy ms':>10}")
+    for case, result in report.items():
+        for row in result['runs']:
+            legacy = f"{row['legacy_seconds'] * 1000:10.2f}" if 'legacy_seconds' in row else f"{'-':>10}"
+            print(f"{case:<14} {row['size']:>9} {row['seconds'] * 1000:11.2f} {legacy}")
+        if result['growth'] is not None and result['growth'] > size_ratio * args.max_growth:
+            print(f"  !! {case}: time grew {result['growth']:.1f}x for {size_ratio:.0f}x input")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
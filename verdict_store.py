@@ -0,0 +1,205 @@
+"""
+VirusTotal Verdict Store
+Local SQLite store of URL scan results so repeated URLs skip the network
+
+Pending results (quota deferrals, analyses still running) are never stored:
+the analysis id in vt_pending lets the next check poll for the verdict.
+Expired rows are deleted from the write path every PURGE_INTERVAL seconds.
+"""
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from telemetry import record_cache_lookup
+from url_extractor import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+def vt_url_id(url):
+    """VirusTotal URL identifier (unpadded urlsafe base64 of the URL)"""
+    return base64.urlsafe_b64encode(url.encode()).decode().strip("=")
+
+
+class VerdictStore:
+    """SQLite-backed verdict store with per-status TTLs"""
+
+    PURGE_INTERVAL = 300
+
+    def __init__(self, path, harmful_ttl=86400, safe_ttl=21600, error_ttl=120, pending_ttl=600):
+        """
+        Initialize verdict store
+
+        Args:
+            path: SQLite file path (shared by all workers)
+            harmful_ttl: Seconds to keep HARMFUL verdicts
+            safe_ttl: Seconds to keep SAFE verdicts
+            error_ttl: Seconds to keep errors (negative caching)
+            pending_ttl: Seconds to keep the id of a submitted, uncollected analysis
+        """
+        self.path = path
+        self.ttls = {
+            'HARMFUL': harmful_ttl,
+            'SAFE': safe_ttl,
+            'ERROR': error_ttl
+        }
+        self.pending_ttl = pending_ttl
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.purged_at = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vt_verdicts ("
+                " url TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vt_pending ("
+                " url TEXT PRIMARY KEY,"
+                " analysis_id TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, url):
+        """
+        Look up a stored verdict
+
+        Args:
+            url: URL as extracted from the message
+
+        Returns:
+            dict: Stored check_url result, or None if missing/expired
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT result, expires_at FROM vt_verdicts WHERE url = ?",
+                (normalize_url(url),)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Verdict store read error: %s", e)
+            row = None
+
+        if row is None or row[1] <= time.time():
+            self.misses += 1
+            record_cache_lookup('vt_verdict', False)
+            return None
+
+        self.hits += 1
+        record_cache_lookup('vt_verdict', True)
+        result = json.loads(row[0])
+        result['url'] = url
+        result['verdict_cached'] = True
+        return result
+
+    def put(self, url, result):
+        """Store a check_url result with the TTL for its status (pending results are skipped)"""
+        if result.get('pending'):
+            return
+        status = 'ERROR' if 'error' in result else result.get('status', 'ERROR')
+        ttl = self.ttls.get(status, self.ttls['ERROR'])
+
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO vt_verdicts (url, status, result, expires_at) VALUES (?, ?, ?, ?)",
+                    (normalize_url(url), status, json.dumps(result), time.time() + ttl)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Verdict store write error: %s", e)
+        self._purge_if_due()
+
+    def get_pending(self, url):
+        """VirusTotal analysis id submitted for a URL and not yet collected, or None"""
+        try:
+            row = self._connection().execute(
+                "SELECT analysis_id FROM vt_pending WHERE url = ? AND expires_at > ?",
+                (normalize_url(url), time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Verdict store read error: %s", e)
+            row = None
+        return row[0] if row else None
+
+    def put_pending(self, url, analysis_id):
+        """Remember a submitted analysis so a retry polls it instead of resubmitting"""
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO vt_pending (url, analysis_id, expires_at) VALUES (?, ?, ?)",
+                    (normalize_url(url), analysis_id, time.time() + self.pending_ttl)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Verdict store write error: %s", e)
+        self._purge_if_due()
+
+    def clear_pending(self, url):
+        """Forget a collected analysis"""
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM vt_pending WHERE url = ?", (normalize_url(url),))
+        except sqlite3.Error as e:
+            logger.warning("Verdict store write error: %s", e)
+
+    def _purge_if_due(self):
+        """Run purge_expired at most once per PURGE_INTERVAL"""
+        now = time.time()
+        if now - self.purged_at >= self.PURGE_INTERVAL:
+            self.purged_at = now
+            self.purge_expired()
+
+    def purge_expired(self):
+        """Delete expired rows"""
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM vt_verdicts WHERE expires_at <= ?", (now,))
+                conn.execute("DELETE FROM vt_pending WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            logger.warning("Verdict store purge error: %s", e)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+def create_verdict_store():
+    """
+    Build a VerdictStore from Config settings
+
+    Returns:
+        VerdictStore or None when disabled
+    """
+    if not Config.VT_VERDICT_STORE_PATH:
+        return None
+    return VerdictStore(
+        Config.VT_VERDICT_STORE_PATH,
+        harmful_ttl=Config.VT_HARMFUL_TTL,
+        safe_ttl=Config.VT_SAFE_TTL,
+        error_ttl=Config.VT_ERROR_TTL,
+        pending_ttl=Config.VT_PENDING_TTL
+    )
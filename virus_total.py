@@ -2,140 +2,337 @@
 VirusTotal URL Checker
 Handles URL extraction and scanning via VirusTotal API
 """
-import re
-import base64
+import logging
+import random
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from telemetry import VT_REQUESTS, VT_RETRIES, span
+from reputation import ReputationHit, create_reputation_index
+from vt_scheduler import QuotaExhausted
+from url_extractor import URLExtractor, normalize_url, url_host
+from verdict_store import create_verdict_store, vt_url_id
+
+logger = logging.getLogger(__name__)
 
 
 class VirusTotalChecker:
     """Check URLs using VirusTotal API"""
     
-    def __init__(self, api_key):
-        """Initialize VirusTotal checker"""
+    def __init__(self, api_key, verdict_store=None, reputation=None, rate_limiter=None):
+        """
+        Initialize VirusTotal checker
+        
+        Args:
+            api_key: VirusTotal API key
+            verdict_store: VerdictStore (default: built from Config)
+            reputation: ReputationIndex (default: built from Config)
+            rate_limiter: TokenBucket every HTTP call draws from; when empty
+                          or after a 429, check_url returns a PENDING result
+        """
         self.api_key = api_key
+        self.rate_limiter = rate_limiter
         self.headers = {"x-apikey": api_key}
         
+        # Precompiled extractor with the skip/allow lists from Config
+        self.url_extractor = URLExtractor()
+        
+        # Local blocklists/allowlists, then the verdict store, before any HTTP call
+        self.reputation = reputation if reputation is not None else create_reputation_index()
+        self.verdict_store = verdict_store if verdict_store is not None else create_verdict_store()
+        
+        # Submitted analyses not yet collected, when there is no verdict store
+        self.pending_analyses = {}
+        
+        # One pooled keep-alive session for all VirusTotal calls
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.VT_SCAN_WORKERS)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
         # VirusTotal endpoints
-        self.url_scan_endpoint = "https://www.virustotal.com/api/v3/urls"
-        self.url_report_endpoint = "https://www.virustotal.com/api/v3/urls/{}"
+        base_url = Config.VIRUSTOTAL_BASE_URL.rstrip('/')
+        self.url_scan_endpoint = f"{base_url}/urls"
+        self.url_report_endpoint = f"{base_url}/urls/{{}}"
+        self.analysis_endpoint = f"{base_url}/analyses/{{}}"
         
         # Settings
         self.max_retries = 5
-        self.retry_delay = 3
+        self.backoff_base = 0.5
+        self.backoff_max = 8
+        self.report_max_age = Config.VT_REPORT_MAX_AGE
     
     def extract_urls(self, text):
         """Extract all URLs from text - preserve EXACT format as found"""
-        # Pattern to match URLs with or without protocol
-        url_pattern = r'\b(?:(?:https?://)?(?:www\.)?)?[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?(?:[/?#][^\s]*)?\b'
-        
-        urls = re.findall(url_pattern, text)
-        
-        # Clean up URLs but keep them EXACTLY as found
-        cleaned_urls = []
-        for url in urls:
-            url = url.strip()
-            
-            # Skip common test patterns
-            if any(skip in url.lower() for skip in ['example.com', 'test.com', 'localhost']):
-                continue
-            
-            # Skip if too short or invalid
-            if len(url) < 4 or '.' not in url:
-                continue
-            
-            cleaned_urls.append(url)
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_urls = []
-        for url in cleaned_urls:
-            if url.lower() not in seen:
-                seen.add(url.lower())
-                unique_urls.append(url)
-        
-        return unique_urls
+        with span('url_extract'):
+            return self.url_extractor.extract(text)
+    
+    def extract_urls_batch(self, texts):
+        """Extract URLs from many texts at once (one list per text)"""
+        with span('url_extract'):
+            return self.url_extractor.extract_batch(texts)
     
     def check_url(self, url):
         """
         Check URL using VirusTotal API
+        Listed URLs and stored verdicts are returned without a network call
+        """
+        with span('vt_check'):
+            local = self.local_verdict(url)
+            if local:
+                return local
+            
+            try:
+                result = self._scan_url(url)
+            except QuotaExhausted as e:
+                return self.pending_result(url, e.retry_after)
+            self._store_verdict(url, result)
+            return result
     
+    def local_verdict(self, url):
+        """Result from the reputation lists or the verdict store, or None (no network)"""
+        return self._reputation_verdict(url) or self._stored_verdict(url)
+    
+    def pending_result(self, url, retry_after):
+        """Result for a URL that could not be scanned within the request budget"""
+        return {
+            'url': url,
+            'is_harmful': False,
+            'status': 'PENDING',
+            'pending': True,
+            'retry_after': round(retry_after, 1),
+            'error': f'VirusTotal quota exhausted - scan deferred, retry in {retry_after:.0f}s'
+        }
+    
+    def in_progress_result(self, url):
+        """Result for a URL whose submitted analysis has not completed yet"""
+        return {
+            'url': url,
+            'is_harmful': False,
+            'status': 'PENDING',
+            'pending': True,
+            'error': 'Analysis in progress - retry in a moment'
+        }
+    
+    def _reputation_verdict(self, url):
+        """HARMFUL/SAFE result for a URL on a local blocklist or allowlist, if any"""
+        hit = self.reputation.lookup(url) if self.reputation is not None else None
+        if hit is None:
+            if not self.url_extractor.is_allowed(url):
+                return None
+            hit = ReputationHit('allow', url_host(url), 'URL_ALLOW_DOMAINS')
+        
+        blocked = hit.verdict == 'block'
+        result = self._build_result(url, {'malicious': 1} if blocked else {})
+        result['details'] = f"Listed in local {'blocklist' if blocked else 'allowlist'} {hit.source} ({hit.match}) - not sent to VirusTotal"
+        result['reputation'] = hit._asdict()
+        logger.debug("Reputation hit", extra={'url': url, 'verdict': hit.verdict, 'match': hit.match, 'source': hit.source})
+        return result
+    
+    def _stored_verdict(self, url):
+        """Return a non-expired verdict from the local store, if any"""
+        if self.verdict_store is None:
+            return None
+        
+        stored = self.verdict_store.get(url)
+        if stored:
+            logger.debug("Stored verdict", extra={'url': url, 'status': stored.get('status', 'ERROR')})
+        return stored
+    
+    def _store_verdict(self, url, result):
+        """Save a result in the local store with its status TTL"""
+        if self.verdict_store is not None and result:
+            self.verdict_store.put(url, result)
+    
+    def _pending_analysis(self, url):
+        """Id of an analysis submitted for the URL and not yet collected, or None"""
+        if self.verdict_store is not None:
+            return self.verdict_store.get_pending(url)
+        pending = self.pending_analyses.get(normalize_url(url))
+        if pending and pending[1] > time.time():
+            return pending[0]
+        return None
+    
+    def _set_pending_analysis(self, url, analysis_id):
+        """Remember (or with None, forget) the URL's submitted analysis"""
+        if self.verdict_store is not None:
+            if analysis_id:
+                self.verdict_store.put_pending(url, analysis_id)
+            else:
+                self.verdict_store.clear_pending(url)
+        elif analysis_id:
+            self.pending_analyses[normalize_url(url)] = (analysis_id, time.time() + Config.VT_PENDING_TTL)
+        else:
+            self.pending_analyses.pop(normalize_url(url), None)
+    
+    def _scan_url(self, url):
+        """
+        Lookup-first scan: reuse VirusTotal's existing report when it is
+        recent, and only submit a new analysis otherwise
+        
+        A submitted analysis is remembered until its result is collected, so
+        a scan cut short by the quota polls it on retry instead of submitting
+        the URL again.
         """
         try:
-            print(f"  Scanning: {url} (as-is)")
+            analysis_id = self._pending_analysis(url)
+            if analysis_id:
+                result = self._collect_analysis(url, analysis_id)
+                return result or self.in_progress_result(url)
+            
+            existing = self._lookup_existing(url)
+            if existing and self._is_recent(existing):
+                logger.debug("Existing report", extra={'url': url, 'status': existing['status'], 'malicious': existing['malicious_count'], 'suspicious': existing['suspicious_count']})
+                return existing
+            
+            logger.debug("Submitting URL for analysis", extra={'url': url})
             
             # Submit URL EXACTLY as found - VirusTotal accepts any format
-            scan_response = requests.post(
-                self.url_scan_endpoint,
-                headers=self.headers,
-                data={"url": url},  # Send EXACTLY as extracted
-                timeout=10
-            )
+            scan_response = self._request('post', self.url_scan_endpoint, call='submit', data={"url": url})
             
             if scan_response.status_code != 200:
-                # If exact URL fails, try with http:// prefix as fallback
-                if not url.startswith(('http://', 'https://')):
-                    print(f"  Retry with http:// prefix...")
-                    
+                if existing:
+                    return existing
                 return {
                     'error': f'VirusTotal API error: {scan_response.status_code}',
                     'url': url
                 }
             
-            scan_data = scan_response.json()
-            url_id = scan_data['data']['id']
-            
-            # Poll for results
-            for attempt in range(self.max_retries):
-                time.sleep(self.retry_delay)
-                report_url = self.url_report_endpoint.format(url_id)
-                report_response = requests.get(report_url, headers=self.headers, timeout=10)
-                
-                if report_response.status_code == 400:
-                    if attempt < self.max_retries - 1:
-                        continue
-                    else:
-                        # Try to get cached report
-                        return self.get_cached_report(url)
-                
-                if report_response.status_code != 200:
-                    if attempt < self.max_retries - 1:
-                        continue
-                    return {'error': 'Could not retrieve report', 'url': url}
-                
-                # Parse results
-                report_data = report_response.json()
-                stats = report_data['data']['attributes']['last_analysis_stats']
-                malicious = stats.get('malicious', 0)
-                suspicious = stats.get('suspicious', 0)
-                total_engines = sum(stats.values())
-                is_harmful = malicious > 0 or suspicious > 0
-                
-                result = {
-                    'url': url,  # Original URL exactly as found
-                    'is_harmful': is_harmful,
-                    'malicious_count': malicious,
-                    'suspicious_count': suspicious,
-                    'total_engines': total_engines,
-                    'status': 'HARMFUL' if is_harmful else 'SAFE',
-                    'details': f"{malicious} engines flagged as malicious, {suspicious} as suspicious",
-                    'exact_match': True  # Scanned exactly as found
-                }
-                
-                print(f"  Result: {result['status']} ({malicious}M/{suspicious}S)")
+            analysis_id = scan_response.json()['data']['id']
+            self._set_pending_analysis(url, analysis_id)
+            result = self._collect_analysis(url, analysis_id)
+            if result:
                 return result
-                
+            
+            # Analysis did not finish in time - fall back to any report we have
+            return existing or self.get_cached_report(url)
+            
+        except QuotaExhausted:
+            raise
         except Exception as e:
-            print(f"  Error: {str(e)}")
+            logger.warning("VirusTotal check failed", extra={'url': url, 'error': str(e)})
             return {'error': f'Error checking URL: {str(e)}', 'url': url}
     
+    def _collect_analysis(self, url, analysis_id):
+        """Poll a submitted analysis and forget it once it has completed"""
+        result = self._poll_analysis(url, analysis_id)
+        if result:
+            self._set_pending_analysis(url, None)
+            logger.debug("Analysis result", extra={'url': url, 'status': result['status'], 'malicious': result['malicious_count'], 'suspicious': result['suspicious_count']})
+        return result
+    
+    def _poll_analysis(self, url, analysis_id):
+        """Poll a submitted analysis with exponential backoff until it completes"""
+        response = None
+        for attempt in range(self.max_retries):
+            if attempt:
+                VT_RETRIES.labels('analysis_pending').inc()
+            time.sleep(self._backoff_delay(attempt, response))
+            response = self._request('get', self.analysis_endpoint.format(analysis_id), call='analysis', retry=False)
+            
+            if response.status_code != 200:
+                continue
+            
+            attributes = response.json()['data']['attributes']
+            if attributes.get('status') == 'completed':
+                return self._build_result(url, attributes.get('stats', {}))
+        
+        return None
     
+    def _backoff_delay(self, attempt, response=None):
+        """
+        Delay before the next attempt: the server's Retry-After when given,
+        otherwise exponential backoff with jitter
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+    
+    def _request(self, method, url, call='report', retry=True, **kwargs):
+        """
+        Send a request on the pooled session, retrying 429/5xx with backoff
+        
+        With a rate limiter every attempt takes a token, and a 429 pauses the
+        limiter instead of sleeping here
+        
+        Raises:
+            QuotaExhausted: No token left, or VirusTotal answered 429
+        """
+        attempts = self.max_retries if retry else 1
+        for attempt in range(attempts):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            response = self.session.request(method, url, timeout=10, **kwargs)
+            VT_REQUESTS.labels(call, str(response.status_code)).inc()
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if response.status_code == 429 and self.rate_limiter is not None:
+                delay = self._backoff_delay(attempt, response)
+                self.rate_limiter.pause(delay)
+                raise QuotaExhausted(delay)
+            if attempt < attempts - 1:
+                VT_RETRIES.labels('rate_limited' if response.status_code == 429 else 'server_error').inc()
+                time.sleep(self._backoff_delay(attempt, response))
+        return response
+    
+    def _is_recent(self, result):
+        """Whether an existing report is fresh enough to skip a rescan"""
+        analysis_date = result.get('last_analysis_date')
+        if not analysis_date:
+            return False
+        return time.time() - analysis_date <= self.report_max_age
+    
+    def _build_result(self, url, stats, cached=False, analysis_date=None):
+        """Build the check_url result dict from VirusTotal analysis stats"""
+        malicious = stats.get('malicious', 0)
+        suspicious = stats.get('suspicious', 0)
+        total_engines = sum(stats.values())
+        is_harmful = malicious > 0 or suspicious > 0
+        
+        result = {
+            'url': url,  # Original URL exactly as found
+            'is_harmful': is_harmful,
+            'malicious_count': malicious,
+            'suspicious_count': suspicious,
+            'total_engines': total_engines,
+            'status': 'HARMFUL' if is_harmful else 'SAFE',
+            'details': f"{malicious} engines flagged as malicious, {suspicious} as suspicious",
+            'exact_match': True  # Scanned exactly as found
+        }
+        if cached:
+            result['cached'] = True
+            result['details'] += " (cached)"
+        if analysis_date:
+            result['last_analysis_date'] = analysis_date
+        return result
     
     def get_cached_report(self, url):
         """
         Try to get cached report from VirusTotal
         First tries exact URL, then tries with http:// if needed
         """
+        stored = self._stored_verdict(url)
+        if stored:
+            return stored
+        
+        cached = self._lookup_existing(url)
+        if cached:
+            self._store_verdict(url, cached)
+            return cached
+        
+        return self.in_progress_result(url)
+    
+    def _lookup_existing(self, url):
+        """Look up VirusTotal's existing report for the exact URL, then with http://"""
         # Try exact URL first
         cached = self._try_cached_lookup(url)
         if cached:
@@ -151,33 +348,25 @@ class VirusTotalChecker:
                 cached['exact_match'] = False
                 return cached
         
-        return {'error': 'Analysis in progress - retry in a moment', 'url': url}
+        return None
     
     def _try_cached_lookup(self, url):
         """Internal method to try cached lookup for specific URL"""
         try:
-            url_id = base64.urlsafe_b64encode(url.encode()).decode().strip("=")
-            report_url = f"https://www.virustotal.com/api/v3/urls/{url_id}"
-            report_response = requests.get(report_url, headers=self.headers, timeout=10)
+            report_url = self.url_report_endpoint.format(vt_url_id(url))
+            report_response = self._request('get', report_url)
             
             if report_response.status_code == 200:
-                report_data = report_response.json()
-                stats = report_data['data']['attributes']['last_analysis_stats']
-                malicious = stats.get('malicious', 0)
-                suspicious = stats.get('suspicious', 0)
-                is_harmful = malicious > 0 or suspicious > 0
-                
-                return {
-                    'url': url,
-                    'is_harmful': is_harmful,
-                    'malicious_count': malicious,
-                    'suspicious_count': suspicious,
-                    'status': 'HARMFUL' if is_harmful else 'SAFE',
-                    'cached': True,
-                    'exact_match': True,
-                    'details': f"{malicious} engines flagged as malicious, {suspicious} as suspicious (cached)"
-                }
+                attributes = report_response.json()['data']['attributes']
+                return self._build_result(
+                    url,
+                    attributes.get('last_analysis_stats', {}),
+                    cached=True,
+                    analysis_date=attributes.get('last_analysis_date')
+                )
+        except QuotaExhausted:
+            raise
         except Exception:
             pass
         
-        return None
\ No newline at end of file
+        return None
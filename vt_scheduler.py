@@ -0,0 +1,380 @@
+"""
+VirusTotal Scheduler
+Quota-aware, deduplicating queue in front of VirusTotalChecker.check_url
+
+Every VirusTotal HTTP call takes a token from a TokenBucket sized to the
+API tier (per minute plus a daily cap). A scan starts once a token for its
+first lookup is reserved; the submit and polls that may follow take theirs
+as they happen, and run out to a PENDING result whose analysis is polled
+on retry. A 429 pauses the bucket instead of sleeping in the request
+thread.
+
+Scans wait in a priority queue, interactive before bulk. Concurrent
+requests for the same normalized URL share one in-flight future. URLs
+with a local verdict (reputation lists, verdict store) never enter the
+queue.
+
+When no token frees up before a request's queue timeout, the scan resolves
+to a PENDING result and no thread sleeps. Callers get a fresh answer on a
+later request.
+
+Limits apply per process; with serve.py divide the tier's rate by WORKERS.
+"""
+import contextvars
+import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from config import Config
+from telemetry import VT_QUEUE_DEPTH, VT_QUEUE_WAIT, VT_QUOTA_AVAILABLE, VT_QUOTA_USED, VT_SCHEDULED
+from url_extractor import normalize_url
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {'interactive': 0, 'bulk': 1}
+
+
+class QuotaExhausted(Exception):
+    """No VirusTotal request budget left right now"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"VirusTotal quota exhausted - retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Per-minute token bucket with an optional daily cap (UTC days)"""
+
+    def __init__(self, rate_per_minute, burst=None, daily_quota=0):
+        """
+        Initialize bucket
+
+        Args:
+            rate_per_minute: Sustained requests per minute
+            burst: Bucket size (defaults to rate_per_minute)
+            daily_quota: Requests per UTC day (0 = no cap)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or rate_per_minute)
+        self.tokens = self.capacity
+        self.daily_quota = daily_quota
+        self.used_today = 0
+        self.day = self._today()
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.listeners = []
+        self._publish()
+
+    @staticmethod
+    def _today():
+        return datetime.datetime.now(datetime.timezone.utc).date()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        today = self._today()
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+        self._publish()
+
+    def _publish(self):
+        """Set the quota gauges; caller holds the lock (or is __init__)"""
+        VT_QUOTA_AVAILABLE.labels('minute').set(self.tokens)
+        VT_QUOTA_AVAILABLE.labels('day').set(
+            self.daily_quota - self.used_today if self.daily_quota else float('inf')
+        )
+
+    def available(self):
+        """Tokens in the bucket right now"""
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+    def _wait_time(self, now):
+        """Seconds until a token is available (0 = now); caller holds the lock"""
+        self._refill(now)
+        if self.daily_quota and self.used_today >= self.daily_quota:
+            midnight = datetime.datetime.combine(self.day + datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc)
+            return (midnight - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def _take(self):
+        self.tokens -= 1
+        self.used_today += 1
+        self._publish()
+
+    def try_acquire(self):
+        """
+        Take a token without blocking
+
+        Returns:
+            float: 0 when a token was taken, otherwise seconds until one frees up
+        """
+        with self.lock:
+            wait = self._wait_time(time.monotonic())
+            if wait == 0:
+                self._take()
+            return wait
+
+    def reserve(self):
+        """try_acquire, keeping the token for this thread's next acquire()"""
+        wait = self.try_acquire()
+        if wait == 0:
+            self.local.credit = 1
+        return wait
+
+    def release(self):
+        """Return this thread's unused reservation and wake anyone waiting for it"""
+        credit = getattr(self.local, 'credit', 0)
+        if credit:
+            self.local.credit = 0
+            with self.lock:
+                self.tokens = min(self.capacity, self.tokens + credit)
+                self.used_today -= credit
+                self._publish()
+            for listener in self.listeners:
+                listener()
+
+    def add_listener(self, callback):
+        """
+        Call callback whenever tokens are handed back
+
+        Tokens that refill over time need no callback: _wait_time reports
+        exactly when the next one is due.
+        """
+        self.listeners.append(callback)
+
+    def acquire(self):
+        """
+        Take a token for one request
+
+        Only tokens spent here count as quota used; a reservation returned
+        by release() never does.
+
+        Raises:
+            QuotaExhausted: No token available now
+        """
+        if getattr(self.local, 'credit', 0):
+            self.local.credit -= 1
+        else:
+            wait = self.try_acquire()
+            if wait:
+                raise QuotaExhausted(wait)
+        VT_QUOTA_USED.inc()
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while (after a 429)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class _Scan:
+    """One queued URL and everyone waiting for it"""
+
+    def __init__(self, url, key, priority, deadline):
+        self.url = url
+        self.key = key
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.future = Future()
+        self.context = contextvars.copy_context()
+        self.started = False
+
+
+class VTScheduler:
+    """Priority queue of URL scans drained by worker threads within the rate limit"""
+
+    def __init__(self, checker, rate_limiter=None, workers=8, interactive_timeout=3.0, bulk_timeout=120.0):
+        """
+        Initialize scheduler
+
+        Args:
+            checker: VirusTotalChecker (or a lazy stand-in for one)
+            rate_limiter: TokenBucket shared with the checker, or None for no limit
+            workers: Scan threads
+            interactive_timeout: Seconds an interactive scan may wait for quota
+            bulk_timeout: Seconds a bulk scan may wait for quota
+        """
+        self.checker = checker
+        self.rate_limiter = rate_limiter
+        self.timeouts = {'interactive': interactive_timeout, 'bulk': bulk_timeout}
+        self.queue = []
+        self.queued = 0  # Scans waiting to start; the heap also holds stale entries of re-prioritized ones
+        self.in_flight = {}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.stopping = False
+
+        VT_QUEUE_DEPTH.set(0)
+        if rate_limiter is not None:
+            rate_limiter.add_listener(self._wake)
+        self.threads = [
+            threading.Thread(target=self._work, name=f'vt-scan-{index}', daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, url, priority='interactive'):
+        """
+        Schedule a check_url call
+
+        Args:
+            url: URL as found in the message
+            priority: 'interactive' or 'bulk'
+
+        Returns:
+            Future: Resolves to a check_url result (status PENDING when the
+                    quota ran out before the scan could run)
+        """
+        key = normalize_url(url)
+        with self.condition:
+            scan = self._join(key, priority)
+            if scan is not None:
+                return scan.future
+
+        local = self.checker.local_verdict(url)
+        if local is not None:
+            VT_SCHEDULED.labels('local').inc()
+            future = Future()
+            future.set_result(local)
+            return future
+
+        with self.condition:
+            scan = self._join(key, priority)
+            if scan is not None:
+                return scan.future
+            scan = _Scan(url, key, priority, time.monotonic() + self.timeouts[priority])
+            self.in_flight[key] = scan
+            heapq.heappush(self.queue, (PRIORITIES[priority], next(self.sequence), scan))
+            self.queued += 1
+            VT_QUEUE_DEPTH.set(self.queued)
+            self.condition.notify()
+        return scan.future
+
+    def _wake(self):
+        """Re-check the queue head (tokens were handed back)"""
+        with self.condition:
+            self.condition.notify_all()
+
+    def _join(self, key, priority):
+        """Share an in-flight scan, moving it up when a more urgent request joins"""
+        scan = self.in_flight.get(key)
+        if scan is None:
+            return None
+        VT_SCHEDULED.labels('deduplicated').inc()
+        if not scan.started and PRIORITIES[priority] < PRIORITIES[scan.priority]:
+            scan.priority = priority
+            scan.deadline = min(scan.deadline, time.monotonic() + self.timeouts[priority])
+            heapq.heappush(self.queue, (PRIORITIES[priority], next(self.sequence), scan))
+            self.condition.notify()
+        return scan
+
+    def _next(self):
+        """
+        Block until the head scan can run or has timed out
+
+        Returns:
+            (scan, retry_after): retry_after is None when a token was reserved
+        """
+        with self.condition:
+            while True:
+                if self.stopping:
+                    return None, None
+                if not self.queue:
+                    self.condition.wait()
+                    continue
+
+                scan = self.queue[0][2]
+                if scan.started:
+                    heapq.heappop(self.queue)  # Duplicate entry of a re-prioritized scan
+                    continue
+
+                now = time.monotonic()
+                wait = self.rate_limiter.reserve() if self.rate_limiter is not None else 0
+                if wait == 0 or now >= scan.deadline:
+                    heapq.heappop(self.queue)
+                    scan.started = True
+                    self.queued -= 1
+                    VT_QUEUE_DEPTH.set(self.queued)
+                    return scan, (wait or None)
+                self.condition.wait(min(wait, scan.deadline - now))
+
+    def _work(self):
+        while True:
+            scan, retry_after = self._next()
+            if scan is None:
+                return
+            VT_QUEUE_WAIT.labels(scan.priority).observe(time.monotonic() - scan.enqueued)
+
+            try:
+                if retry_after is None:
+                    try:
+                        result = scan.context.run(self.checker.check_url, scan.url)
+                    finally:
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.release()
+                else:
+                    result = self.checker.pending_result(scan.url, retry_after)
+            except Exception as e:
+                logger.warning("Scheduled scan failed", extra={'url': scan.url, 'error': str(e)})
+                result = {'error': f'Error checking URL: {str(e)}', 'url': scan.url}
+
+            with self.condition:
+                self.in_flight.pop(scan.key, None)
+            VT_SCHEDULED.labels('pending' if result.get('pending') else 'scanned').inc()
+            scan.future.set_result(result)
+
+    def stats(self):
+        """Queue depth, in-flight scans and remaining quota"""
+        with self.condition:
+            stats = {
+                'queued': self.queued,
+                'in_flight': len(self.in_flight)
+            }
+        if self.rate_limiter is not None:
+            with self.rate_limiter.lock:
+                stats['tokens'] = round(self.rate_limiter.tokens, 2)
+                stats['used_today'] = self.rate_limiter.used_today
+                stats['daily_quota'] = self.rate_limiter.daily_quota
+        return stats
+
+    def close(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+
+
+def create_rate_limiter():
+    """
+    Build the VirusTotal TokenBucket from Config settings
+
+    Returns:
+        TokenBucket or None when VT_RATE_PER_MINUTE is 0 (no limit)
+    """
+    if Config.VT_RATE_PER_MINUTE <= 0:
+        return None
+    return TokenBucket(Config.VT_RATE_PER_MINUTE, Config.VT_RATE_BURST, Config.VT_DAILY_QUOTA)
+
+
+def create_scheduler(checker, rate_limiter):
+    """Build a VTScheduler from Config settings"""
+    return VTScheduler(
+        checker,
+        rate_limiter,
+        workers=Config.VT_SCAN_WORKERS,
+        interactive_timeout=Config.VT_QUEUE_TIMEOUT_INTERACTIVE,
+        bulk_timeout=Config.VT_QUEUE_TIMEOUT_BULK
+    )